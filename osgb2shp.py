@@ -1,96 +1,75 @@
-import geopandas as gpd
-from shapely.geometry import Polygon
-from shapely.ops import unary_union
+import numpy as np
 import os
+import sys
 import argparse
-import xml.etree.ElementTree as ET
-import re
-
-
-def read_metadata_info(osgb_folder):
-    """
-    读取metadata.xml文件中的坐标系统和原点信息
-    """
-    metadata_path = os.path.join(osgb_folder, 'metadata.xml')
-    if not os.path.exists(metadata_path):
-        # 查找子目录中的metadata.xml
-        for root, dirs, files in os.walk(osgb_folder):
-            if 'metadata.xml' in files:
-                metadata_path = os.path.join(root, 'metadata.xml')
-                break
-    
-    if not os.path.exists(metadata_path):
-        return None, None
-    
-    try:
-        tree = ET.parse(metadata_path)
-        root = tree.getroot()
-        
-        # 读取坐标系统
-        epsg_code = None
-        for elem in root.iter():
-            if any(key in elem.tag.lower() for key in ['epsg', 'crs', 'srs']):
-                text = elem.text
-                if text:
-                    match = re.search(r'epsg:?(\d+)', text.lower())
-                    if match:
-                        epsg_code = int(match.group(1))
-                        break
-        
-        # 如果没有找到特定标签，检查所有元素的文本内容
-        if not epsg_code:
-            for elem in root.iter():
-                text = elem.text
-                if text:
-                    match = re.search(r'epsg:?(\d+)', text.lower())
-                    if match:
-                        epsg_code = int(match.group(1))
-                        break
-        
-        # 读取原点信息
-        srs_origin = None
-        for elem in root.iter():
-            if 'origin' in elem.tag.lower():
-                text = elem.text
-                if text:
-                    # 解析原点坐标
-                    coords = text.split(',')
-                    if len(coords) >= 2:
-                        try:
-                            x = float(coords[0].strip())
-                            y = float(coords[1].strip())
-                            srs_origin = (x, y)
-                        except ValueError:
-                            pass
-        
-        return epsg_code, srs_origin
-    except Exception:
-        return None, None
-
-
+from itertools import islice
 
+from osgb_tiles import tile_bounds, box_polygons, TILE_GEO_SIZE
+from osgb_catalog import (TileCatalog, TILE_HEADER_BOUNDS, TILE_ADDED, CATALOG_BATCH_SIZE, catalog_report,
+                          format_catalog_report, tile_stats_columns)
+from osgb_discovery import (iter_tile_entries, format_discovery_report, tile_storage_stats, tile_stats_report,
+                            merge_tile_stats_report, format_tile_stats_report)
+from osgb_metadata import read_metadata_info
+from osgb_header import read_tile_bounds
+from osgb_io import (output_format, write_geodataframe, read_geodataframe, format_write_report, merge_write_info,
+                     APPENDABLE_FORMATS)
+from osgb_manifest import manifest_path, hash_metadata, load_manifest, save_manifest, manifest_matches, diff_manifest
+from osgb_index import index_path, save_index, load_index, index_names
+from osgb_pyramid import mbtiles_path, build_pyramid_mbtiles, format_pyramid_report
+from osgb_profile import StageProfiler, ThrottledPrinter, format_profile_report, peak_rss_mb, write_json_report
 
 
-
-def extract_osgb_boundary(osgb_folder, output_path, epsg_id, output_epsg=None, origin_is_max=False):
+def extract_osgb_boundary(osgb_folder, output_path, epsg_id, output_epsg=None, origin_is_max=False,
+                          incremental=False, footprint_source='grid', header_workers=8, chunk_size=None,
+                          profile=False, spatial_index=False, mbtiles=False, tile_stats=False, stats_workers=16,
+                          return_catalog=False):
     """
     通过解析OSGB瓦片结构提取实际边界
     适用于有规则瓦片的OSGB数据
     
     参数:
     - osgb_folder: OSGB数据文件夹路径
-    - output_path: 输出Shapefile路径
+    - output_path: 输出文件路径，按扩展名确定格式（.shp / .gpkg / .fgb / .parquet）
     - epsg_id: 输入坐标系统EPSG代码
     - output_epsg: 输出坐标系统EPSG代码（可选）
     - origin_is_max: 是否将原点视为最大坐标（默认False，原点为最小坐标）
+    - incremental: 是否启用增量模式，根据输出旁的瓦片清单只处理新增或删除的瓦片
+      （增量模式下返回本次写出的GeoDataFrame，瓦片无变化时为None）
+    - footprint_source: 瓦片范围来源，'grid'按行列号计算（默认），'osgb'读取根节点OSGB文件中的包围球
+    - header_workers: 读取OSGB根节点文件的线程数
+    - chunk_size: 流式模式的分块大小，指定后边扫描边按分块创建多边形并追加写出，内存占用与瓦片总数无关
+      （流式模式下返回最后一个分块的GeoDataFrame，仅支持Shapefile与GeoPackage，不能与增量模式同时使用）
+    - profile: 是否记录各阶段的耗时与内存峰值，启用时在文本报告旁额外写出JSON报告（<输出名>_report.json）
+    - spatial_index: 是否在输出旁保存以瓦片文件夹名称为键的瓦片范围空间索引（<输出名>_tiles.idx），
+      供query子命令查询覆盖指定范围的瓦片
+    - mbtiles: 是否由瓦片行列号自底向上构建多分辨率范围金字塔，写出为MBTiles矢量瓦片（<输出名>.mbtiles），
+      供Web地图按缩放级别预览
+    - tile_stats: 是否在瓦片发现阶段统计每个瓦片文件夹的文件数、OSGB（LOD）文件数、总字节数、外部纹理字节数与
+      最深LOD层级，作为属性列（files、osgb_files、bytes、tex_bytes、max_lod）写出，总计写入报告
+    - stats_workers: 统计瓦片文件夹的线程数（有界线程池，按扫描顺序产出）
+    - return_catalog: 完整提取时是否返回瓦片目录而不是GeoDataFrame；瓦片在内部始终保存在紧凑的瓦片目录中，
+      默认在写出的同时保留各分块的GeoDataFrame并在返回时拼接，启用后不保留几何对象，内存占用只与目录大小相关
+
+    返回 (GeoDataFrame, 报告路径)；完整提取且return_catalog为True时返回 (TileCatalog, 报告路径)，
+    目录的crs与total_bounds属性为输出坐标系统与输出范围；没有可处理的瓦片时返回 (None, 报告路径)
     """
-    boundary_polygons = []
-    processed_tiles = 0
     tile_pixel_size = None
     tile_level = None
     tile_resolution = None
     
     print('正在初始化处理...')
+    profiler = StageProfiler(profile)
+    if chunk_size:
+        if chunk_size < 1:
+            raise ValueError(f'分块大小必须大于0: {chunk_size}')
+        if incremental:
+            raise ValueError('流式模式不能与增量模式同时使用')
+        if spatial_index:
+            raise ValueError('流式模式不能同时保存空间索引（需要保留所有瓦片范围）')
+        if mbtiles:
+            raise ValueError('流式模式不能同时构建范围金字塔（需要保留所有瓦片行列号）')
+        if output_format(output_path) not in APPENDABLE_FORMATS:
+            raise ValueError(f'流式模式需要逐块追加写出，{output_format(output_path)} 格式不支持追加，请使用 .shp 或 .gpkg')
     if origin_is_max:
         print('使用原点作为最大坐标的计算模式')
     else:
@@ -101,13 +80,20 @@ def extract_osgb_boundary(osgb_folder, output_path, epsg_id, output_epsg=None, o
     if os.path.exists(data_folder) and os.path.isdir(data_folder):
         tile_data_folder = data_folder
         print(f'检测到Data子文件夹: {tile_data_folder}')
+    elif os.path.isfile(osgb_folder):
+        # zip/tar压缩包：只读取包内目录，不解压
+        if footprint_source == 'osgb':
+            raise ValueError('压缩包输入只支持按行列号计算瓦片范围，请使用 --footprint-source grid')
+        tile_data_folder = osgb_folder
+        print(f'检测到压缩包输入，直接读取包内目录: {tile_data_folder}')
     else:
         tile_data_folder = osgb_folder
         print(f'使用输入目录作为瓦片数据目录: {tile_data_folder}')
     
     # 2. 尝试从metadata.xml读取坐标系统和原点信息
     print('正在读取坐标系统信息...')
-    metadata_epsg, srs_origin = read_metadata_info(osgb_folder)
+    with profiler.stage('metadata'):
+        metadata_epsg, srs_origin = read_metadata_info(osgb_folder)
     if metadata_epsg:
         input_crs = metadata_epsg
         crs_source = 'metadata.xml'
@@ -129,148 +115,604 @@ def extract_osgb_boundary(osgb_folder, output_path, epsg_id, output_epsg=None, o
         output_crs_source = 'same_as_input'
         print(f'使用与输入相同的输出坐标系统: EPSG:{output_crs}')
     
-    # 4. 遍历所有瓦片文件夹
-    print('正在遍历和处理瓦片文件夹...')
-    total_tiles = 0
-    tile_folders = []
+    # 设置默认瓦片大小（地理单位）
+    tile_geo_size = TILE_GEO_SIZE  # 1/3600度，约30米精度
+    print(f'使用固定瓦片大小: {tile_geo_size} 度')
     
-    for tile_folder in os.listdir(tile_data_folder):
-        if tile_folder.startswith('Tile_'):
-            tile_folders.append(tile_folder)
+    if chunk_size:
+        return _extract_streaming(tile_data_folder, output_path, {
+            'input_path': osgb_folder,
+            'tile_data_folder': tile_data_folder,
+            'input_crs': input_crs,
+            'crs_source': crs_source,
+            'output_crs': output_crs,
+            'output_crs_source': output_crs_source,
+            'tile_geo_size': tile_geo_size,
+        }, srs_origin, origin_is_max, footprint_source, header_workers, chunk_size, profiler, tile_stats,
+            stats_workers)
     
-    total_tiles = len(tile_folders)
+    # 4. 遍历所有瓦片文件夹，边扫描边解析行列号，存入紧凑的瓦片目录；启用存储统计时在线程池中同时统计各瓦片文件夹
+    print('正在遍历和处理瓦片文件夹...')
+    if tile_stats:
+        print(f'同时统计瓦片文件夹的文件数、字节数与LOD层级（{stats_workers} 个线程）...')
+    discovery_report = {}
+    with profiler.stage('discovery'):
+        catalog, _ = TileCatalog.from_entries(
+            _iter_entries(tile_data_folder, tile_stats, stats_workers, discovery_report), with_stats=tile_stats
+        )
+    total_tiles = discovery_report['tile_dirs']
     print(f'发现 {total_tiles} 个瓦片文件夹')
+    print(f'瓦片发现: {format_discovery_report(discovery_report)}')
+    print(f'瓦片目录: {format_catalog_report(catalog_report(catalog))}')
+    stats_info = tile_stats_report(catalog.stats) if tile_stats else None
+    if stats_info:
+        print(f'瓦片存储统计: {format_tile_stats_report(stats_info)}')
+    processed_tiles = len(catalog)
     
-    # 设置默认瓦片大小（地理单位）
-    tile_geo_size = 0.0002777777777777778  # 1/3600度，约30米精度
-    print(f'使用固定瓦片大小: {tile_geo_size} 度')
-    
-    # 6. 处理瓦片
-    for i, tile_folder in enumerate(tile_folders):
-        tile_path = os.path.join(tile_data_folder, tile_folder)
-        if os.path.isdir(tile_path):
-            # 解析行列号
-            tile_info = tile_folder.split('_')[1:]
-            if len(tile_info) == 2:
-                try:
-                    # 解析行列号，处理带+号的情况，将行列号减1使其从0开始
-                    col_str = tile_info[0].replace('+', '')
-                    row_str = tile_info[1].replace('+', '')
-                    col = int(col_str) - 1
-                    row = int(row_str) - 1
-                    
-                    # 计算实际地理坐标
-                    if srs_origin:
-                        if origin_is_max:
-                            # 原点作为最大坐标
-                            max_x = srs_origin[0] - col * tile_geo_size
-                            min_x = srs_origin[0] - (col + 1) * tile_geo_size
-                            max_y = srs_origin[1] - row * tile_geo_size
-                            min_y = srs_origin[1] - (row + 1) * tile_geo_size
-                        else:
-                            # 原点作为最小坐标
-                            min_x = srs_origin[0] + col * tile_geo_size
-                            max_x = srs_origin[0] + (col + 1) * tile_geo_size
-                            min_y = srs_origin[1] + row * tile_geo_size
-                            max_y = srs_origin[1] + (row + 1) * tile_geo_size
-                    else:
-                        # 不考虑原点偏移
-                        min_x = col * tile_geo_size
-                        max_x = (col + 1) * tile_geo_size
-                        min_y = row * tile_geo_size
-                        max_y = (row + 1) * tile_geo_size
-                        
-                        # 创建多边形
-                        polygon = Polygon([
-                            (min_x, min_y),
-                            (max_x, min_y),
-                            (max_x, max_y),
-                            (min_x, max_y)
-                        ])
-                        boundary_polygons.append(polygon)
-                        processed_tiles += 1
-                        
-                        # 每处理10个瓦片显示一次进度
-                        if (i + 1) % 10 == 0:
-                            print(f'已处理 {i + 1}/{total_tiles} 个瓦片')
-                except ValueError:
-                    pass
+    # 5. 确定输出路径，增量模式下读取上次运行的清单
+    output_folder = os.path.splitext(output_path)[0]
+    output_file = os.path.join(output_folder, os.path.basename(output_path))
+    report_path = os.path.join(output_folder, f'{os.path.splitext(os.path.basename(output_path))[0]}_report.txt')
+    crs_input = f'EPSG:{input_crs}'
+    # 提前检查输出格式，避免处理完所有瓦片后才发现扩展名不受支持
+    output_format(output_file)
+    incremental_info = None
+    write_info = None
+    pyramid_info = None
+    footprint_info = {'source': footprint_source, 'header_hits': 0, 'fallbacks': 0}
+    if incremental:
+        manifest_file = manifest_path(output_file)
+        manifest_params = {
+            'output_file': os.path.basename(output_file),
+            'tile_data_folder': os.path.abspath(tile_data_folder),
+            'input_crs': input_crs,
+            'output_crs': output_crs,
+            'origin_is_max': origin_is_max,
+            'srs_origin': list(srs_origin) if srs_origin else None,
+            'tile_geo_size': tile_geo_size,
+            'footprint_source': footprint_source,
+            'tile_stats': tile_stats,
+        }
+        with profiler.stage('manifest'):
+            metadata_hash = hash_metadata(osgb_folder)
+            manifest = load_manifest(manifest_file)
+        if (not manifest_matches(manifest, manifest_params, metadata_hash) or not os.path.exists(output_file)
+                or (spatial_index and not os.path.exists(index_path(output_file)))):
+            print('未找到可用的清单（或空间索引）或参数/元数据已变化，执行完整提取')
+            manifest = None
     
-    # 6. 直接使用所有多边形，不合并
-    if boundary_polygons:
+    if incremental and manifest is not None:
+        # 6. 增量更新：只为新增或删除的瓦片计算几何（瓦片全部被删除时重写为空的输出文件）
+        with profiler.stage('manifest'):
+            added, removed_ids, kept = diff_manifest(manifest, catalog.names())
+        print(f'增量比较完成: 新增 {len(added)} 个瓦片，删除 {len(removed_ids)} 个瓦片，未变化 {len(kept)} 个瓦片')
+        incremental_info = {'added': len(added), 'removed': len(removed_ids), 'unchanged': len(kept)}
+        catalog.flags[np.asarray(added, dtype=np.int64)] |= TILE_ADDED
+        added_catalog = catalog.take(np.flatnonzero(catalog.flags & TILE_ADDED))
+        added_cols, added_rows = _lattice_indices(added_catalog)
+        added_ids = np.arange(manifest['next_id'], manifest['next_id'] + len(added_catalog))
+        
+        gdf = None
+        bounds = manifest['bounds']
+        if len(added_catalog) or removed_ids:
+            with profiler.stage('footprints'):
+                added_footprints = tile_footprints(added_catalog, tile_data_folder, tile_geo_size, srs_origin,
+                                                    origin_is_max, footprint_source, header_workers, footprint_info)
+            added_lattice = (added_cols, added_rows, tile_geo_size, srs_origin, origin_is_max)
+            added_gdf = _build_tile_frame(added_ids, added_footprints, input_crs, output_crs,
+                                          added_lattice if footprint_source == 'grid' else None, profiler,
+                                          attributes=_stats_attributes(added_catalog))
+            if removed_ids or output_format(output_file) not in APPENDABLE_FORMATS:
+                # 删除要素或输出格式不支持追加时需要重写输出文件
+                import geopandas as gpd
+                import pandas as pd
+                with profiler.stage('read_existing'):
+                    existing = read_geodataframe(output_file)
+                    existing = existing[~existing['id'].isin(removed_ids)]
+                    if len(added_catalog):
+                        existing = pd.concat([existing, added_gdf.to_crs(existing.crs)], ignore_index=True)
+                    gdf = gpd.GeoDataFrame(existing, crs=existing.crs)
+                print(f'正在重写输出文件: {output_file}')
+                with profiler.stage('write'):
+                    write_info = write_geodataframe(gdf, output_file)
+                # 空图层的total_bounds为NaN，不写入清单与报告
+                bounds = gdf.total_bounds if len(gdf) else None
+            else:
+                gdf = added_gdf
+                print(f'正在追加到输出文件: {output_file}')
+                with profiler.stage('write'):
+                    write_info = write_geodataframe(gdf, output_file, append=True)
+                bounds = _merge_bounds(bounds, gdf.total_bounds)
+            if spatial_index:
+                with profiler.stage('index'):
+                    _update_spatial_index(index_path(output_file), removed_ids, added_catalog.names(),
+                                          added_ids, added_gdf.bounds.to_numpy(), output_crs,
+                                          os.path.abspath(tile_data_folder))
+                print(f'已更新空间索引: {index_path(output_file)}')
+        else:
+            print('瓦片无变化，跳过几何计算与写出')
+        
+        # 合并未变化与新增的瓦片，更新清单
+        names = list(kept) + added_catalog.names()
+        kept_values = list(kept.values())
+        all_cols = [v[0] for v in kept_values] + added_cols.tolist()
+        all_rows = [v[1] for v in kept_values] + added_rows.tolist()
+        with profiler.stage('manifest'):
+            save_manifest(manifest_file, manifest_params, metadata_hash, names, all_cols, all_rows,
+                          [v[2] for v in kept_values] + added_ids.tolist(),
+                          bounds)
+        polygon_count = len(names)
+        # 金字塔由完整的行列号重建，代价与写出相比很小；瓦片全部被删除时移除过期的金字塔
+        if mbtiles and names and (gdf is not None or not os.path.exists(mbtiles_path(output_file))):
+            pyramid_info = _build_pyramid(output_file, all_cols, all_rows, tile_geo_size, srs_origin, origin_is_max,
+                                          input_crs, profiler)
+        elif mbtiles and not names and os.path.exists(mbtiles_path(output_file)):
+            os.remove(mbtiles_path(output_file))
+            print(f'瓦片已全部删除，移除范围金字塔: {mbtiles_path(output_file)}')
+    elif processed_tiles:
+        # 6. 以数组运算计算所有瓦片的地理坐标，按分块创建多边形，直接使用所有多边形，不合并
         print(f'瓦片处理完成，共处理 {processed_tiles} 个瓦片')
         print('保留所有原始瓦片多边形...')
         
         # 7. 创建输出文件夹
         print('正在创建输出文件夹...')
-        output_folder = os.path.splitext(output_path)[0]
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
             print(f'创建输出文件夹: {output_folder}')
         
-        # 8. 创建并保存
+        # 8. 由瓦片目录按分块创建GeoDataFrame并保存，如果输出坐标系统不同，进行坐标转换
         print('正在创建并保存GeoDataFrame...')
-        output_file = os.path.join(output_folder, os.path.basename(output_path))
-        
-        # 确保坐标系统设置正确
-        crs_input = f'EPSG:{input_crs}'
         print(f'设置输入坐标系统: {crs_input}')
+        print(f'正在保存{output_format(output_file)}: {output_file}')
+        write_info, bounds, boxes, frame = _write_catalog(catalog, output_file, 1, tile_data_folder, tile_geo_size,
+                                                          srs_origin, origin_is_max, input_crs, output_crs,
+                                                          footprint_source, header_workers, footprint_info, profiler,
+                                                          collect_boxes=spatial_index, keep_frames=not return_catalog)
+        print(f'已处理 {processed_tiles}/{total_tiles} 个瓦片')
+        print(f'写出完成: {format_write_report(write_info)}')
+        polygon_count = processed_tiles
+        
+        # 9. 保存清单、空间索引与范围金字塔
+        ids = np.arange(1, processed_tiles + 1)
+        cols, rows = _lattice_indices(catalog)
+        if incremental:
+            with profiler.stage('manifest'):
+                save_manifest(manifest_file, manifest_params, metadata_hash, catalog.names(), cols, rows, ids,
+                              bounds)
+            print(f'已保存瓦片清单: {manifest_file}')
+        if spatial_index:
+            with profiler.stage('index'):
+                save_index(index_path(output_file), catalog.names(), ids, boxes, output_crs,
+                           os.path.abspath(tile_data_folder))
+            print(f'已保存空间索引: {index_path(output_file)}')
+        if mbtiles:
+            pyramid_info = _build_pyramid(output_file, cols, rows, tile_geo_size, srs_origin, origin_is_max,
+                                          input_crs, profiler)
+        if return_catalog:
+            # 调用方选择不保留全部多边形，返回瓦片目录
+            from osgb_reproject import get_crs
+            catalog.crs = get_crs(output_crs)
+            catalog.total_bounds = np.asarray(bounds, dtype=np.float64)
+            gdf = catalog
+        else:
+            gdf = frame
+    else:
+        # 没有可处理的瓦片：不写出图层，只生成报告
+        print('未发现可处理的瓦片')
+        os.makedirs(output_folder, exist_ok=True)
+        gdf = None
+        bounds = None
+        polygon_count = 0
+    
+    # 10. 生成报告
+    print('正在生成报告文件...')
+    _write_reports(report_path, profiler, {
+        'input_path': osgb_folder,
+        'tile_data_folder': tile_data_folder,
+        'output_file': output_file,
+        'input_crs': input_crs,
+        'crs_source': crs_source,
+        'output_crs': output_crs,
+        'output_crs_source': output_crs_source,
+        'processed_tiles': processed_tiles,
+        'polygon_count': polygon_count,
+        'tile_geo_size': tile_geo_size,
+        'discovery': discovery_report,
+        'catalog': catalog_report(catalog),
+        'tile_stats': stats_info,
+        'footprint': footprint_info,
+        'incremental': incremental_info,
+        'write': write_info,
+        'bounds': bounds,
+        'streaming': None,
+        'spatial_index': index_path(output_file) if spatial_index else None,
+        'pyramid': pyramid_info,
+    })
+    print('报告生成完成!')
+    return gdf, report_path
+
+
+def _extract_streaming(tile_data_folder, output_path, settings, srs_origin, origin_is_max,
+                       footprint_source, header_workers, chunk_size, profiler, tile_stats=False, stats_workers=16):
+    """
+    流式提取：瓦片发现作为生成器逐个产出，每凑满chunk_size个瓦片就解析行列号、创建多边形并追加到输出文件，
+    只保留累计的要素数与边界范围，内存峰值与瓦片总数无关
+    """
+    input_crs = settings['input_crs']
+    output_crs = settings['output_crs']
+    tile_geo_size = settings['tile_geo_size']
+    output_folder = os.path.splitext(output_path)[0]
+    output_file = os.path.join(output_folder, os.path.basename(output_path))
+    report_path = os.path.join(output_folder, f'{os.path.splitext(os.path.basename(output_path))[0]}_report.txt')
+    
+    # 4. 边扫描边按分块处理瓦片
+    print(f'正在以流式模式遍历和处理瓦片文件夹（分块大小: {chunk_size}）...')
+    os.makedirs(output_folder, exist_ok=True)
+    discovery_report = {}
+    entries_iter = _iter_entries(tile_data_folder, tile_stats, stats_workers, discovery_report)
+    stats_info = None
+    footprint_info = {'source': footprint_source, 'header_hits': 0, 'fallbacks': 0}
+    write_info = None
+    bounds = None
+    processed_tiles = 0
+    chunks = 0
+    gdf = None
+    progress = ThrottledPrinter()
+    while True:
+        with profiler.stage('discovery'):
+            chunk_entries = list(islice(entries_iter, chunk_size))
+            catalog, _ = TileCatalog.from_entries(chunk_entries, with_stats=tile_stats)
+        if not chunk_entries:
+            break
+        if not len(catalog):
+            continue
         
-        # 创建包含所有原始瓦片多边形的GeoDataFrame
+        # 5. 创建当前分块的多边形，编号在分块之间连续；第一个分块新建输出文件，之后的分块追加写出
+        chunk_write_info, chunk_bounds, _, gdf = _write_catalog(
+            catalog, output_file, processed_tiles + 1, tile_data_folder, tile_geo_size, srs_origin, origin_is_max,
+            input_crs, output_crs, footprint_source, header_workers, footprint_info, profiler,
+            append=chunks > 0, verbose=False)
+        write_info = merge_write_info(write_info, chunk_write_info)
+        bounds = _merge_bounds(bounds, chunk_bounds)
+        if tile_stats:
+            stats_info = merge_tile_stats_report(stats_info, tile_stats_report(catalog.stats))
+        processed_tiles += len(catalog)
+        chunks += 1
+        progress(f'已写出第 {chunks} 个分块，累计 {processed_tiles} 个瓦片')
+    
+    if chunks:
+        progress(f'已写出第 {chunks} 个分块，累计 {processed_tiles} 个瓦片', force=True)
+    print(f'发现 {discovery_report["tile_dirs"]} 个瓦片文件夹')
+    print(f'瓦片发现: {format_discovery_report(discovery_report)}')
+    if not processed_tiles:
+        print('未发现可处理的瓦片')
+    if stats_info:
+        print(f'瓦片存储统计: {format_tile_stats_report(stats_info)}')
+    if write_info:
+        print(f'写出完成: {format_write_report(write_info)}')
+    
+    # 6. 生成报告
+    print('正在生成报告文件...')
+    _write_reports(report_path, profiler, {
+        **settings,
+        'output_file': output_file,
+        'processed_tiles': processed_tiles,
+        'polygon_count': processed_tiles,
+        'discovery': discovery_report,
+        'catalog': None,
+        'tile_stats': stats_info,
+        'footprint': footprint_info,
+        'incremental': None,
+        'write': write_info,
+        'bounds': bounds,
+        'streaming': {'chunk_size': chunk_size, 'chunks': chunks, 'peak_rss_mb': peak_rss_mb()},
+        'spatial_index': None,
+        'pyramid': None,
+    })
+    print('报告生成完成!')
+    return gdf, report_path
+
+
+def _iter_entries(tile_data_folder, tile_stats, stats_workers, report):
+    """
+    瓦片发现：启用存储统计时在有界线程池中逐个统计瓦片文件夹（压缩包输入的统计直接取自成员头）
+    """
+    if tile_stats:
+        return iter_tile_entries(tile_data_folder, stat_func=tile_storage_stats, workers=stats_workers, report=report)
+    return iter_tile_entries(tile_data_folder, report=report)
+
+
+def _stats_attributes(catalog):
+    """
+    瓦片目录带有存储统计时返回对应的属性列，否则返回None
+    """
+    return tile_stats_columns(catalog.stats) if catalog.stats is not None else None
+
+
+def _lattice_indices(catalog):
+    """
+    瓦片目录中的行列号减1使其从0开始，返回int64的列号与行号数组
+    """
+    return catalog.cols.astype(np.int64) - 1, catalog.rows.astype(np.int64) - 1
+
+
+def _merge_bounds(bounds, other):
+    """
+    合并两个 (min_x, min_y, max_x, max_y) 范围，bounds为None时直接返回other
+    """
+    if bounds is None:
+        return other
+    return [min(bounds[0], other[0]), min(bounds[1], other[1]),
+            max(bounds[2], other[2]), max(bounds[3], other[3])]
+
+
+def tile_footprints(catalog, tile_data_folder, tile_geo_size, srs_origin, origin_is_max,
+                     footprint_source, header_workers, footprint_info):
+    """
+    计算瓦片范围：默认按行列号与固定瓦片大小计算；
+    footprint_source为'osgb'时读取根节点OSGB文件中的包围球，读取成功的瓦片在目录中标记TILE_HEADER_BOUNDS，
+    读取失败的瓦片回退到行列号计算结果
+    """
+    cols, rows = _lattice_indices(catalog)
+    min_x, min_y, max_x, max_y = tile_bounds(cols, rows, tile_geo_size, srs_origin, origin_is_max)
+    if footprint_source == 'osgb' and len(catalog):
+        print(f'正在读取瓦片根节点OSGB包围球（{header_workers} 个线程）...')
+        tile_paths = [os.path.join(tile_data_folder, tile_name) for tile_name in catalog.names()]
+        h_min_x, h_min_y, h_max_x, h_max_y, valid = read_tile_bounds(tile_paths, srs_origin, header_workers)
+        min_x = np.where(valid, h_min_x, min_x)
+        min_y = np.where(valid, h_min_y, min_y)
+        max_x = np.where(valid, h_max_x, max_x)
+        max_y = np.where(valid, h_max_y, max_y)
+        catalog.flags[valid] |= TILE_HEADER_BOUNDS
+        hits = int(valid.sum())
+        footprint_info['header_hits'] += hits
+        footprint_info['fallbacks'] += len(catalog) - hits
+        print(f'根节点包围球读取完成: 成功 {hits} 个，回退到行列号计算 {len(catalog) - hits} 个')
+    return min_x, min_y, max_x, max_y
+
+
+def _write_catalog(catalog, output_file, first_id, tile_data_folder, tile_geo_size, srs_origin, origin_is_max,
+                   input_crs, output_crs, footprint_source, header_workers, footprint_info, profiler,
+                   collect_boxes=False, append=False, verbose=True, keep_frames=False):
+    """
+    由瓦片目录创建多边形并写出，要素编号从first_id开始连续
+    输出格式支持追加时每CATALOG_BATCH_SIZE个瓦片创建一次几何对象并立即写出，几何对象的内存占用与瓦片总数无关；
+    其他格式需要一次写出，一次创建全部几何对象
+
+    返回 (写出统计, 输出范围, 输出坐标系统下的瓦片包围盒数组（collect_boxes为False时为None）, GeoDataFrame)，
+    keep_frames为True时GeoDataFrame为所有分块的拼接结果，否则为最后一块
+    """
+    if output_format(output_file) in APPENDABLE_FORMATS:
+        batch_size = CATALOG_BATCH_SIZE
+    else:
+        batch_size = max(len(catalog), 1)
+    write_info = None
+    bounds = None
+    boxes = []
+    gdf = None
+    frames = []
+    for start, batch in catalog.batches(batch_size):
+        ids = np.arange(first_id + start, first_id + start + len(batch))
+        with profiler.stage('footprints'):
+            footprint_bounds = tile_footprints(batch, tile_data_folder, tile_geo_size, srs_origin, origin_is_max,
+                                                footprint_source, header_workers, footprint_info)
+        lattice = (*_lattice_indices(batch), tile_geo_size, srs_origin, origin_is_max)
+        gdf = _build_tile_frame(ids, footprint_bounds, input_crs, output_crs,
+                                lattice if footprint_source == 'grid' else None, profiler,
+                                verbose=verbose and len(batch) == len(catalog), attributes=_stats_attributes(batch))
+        with profiler.stage('write'):
+            write_info = merge_write_info(write_info, write_geodataframe(gdf, output_file,
+                                                                         append=append or start > 0))
+        bounds = _merge_bounds(bounds, gdf.total_bounds)
+        if collect_boxes:
+            boxes.append(gdf.bounds.to_numpy())
+        if keep_frames:
+            frames.append(gdf)
+    if len(frames) > 1:
+        import pandas as pd
+        import geopandas as gpd
+        gdf = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=gdf.crs)
+    return write_info, bounds, np.concatenate(boxes) if collect_boxes else None, gdf
+
+
+def _build_tile_frame(ids, footprint_bounds, input_crs, output_crs, lattice=None, profiler=None, verbose=True,
+                      attributes=None):
+    """
+    根据瓦片范围批量创建多边形GeoDataFrame，并转换到输出坐标系统
+
+    - lattice: 瓦片范围完全由行列号计算时传入 (cols, rows, tile_geo_size, srs_origin, origin_is_max)，
+      坐标转换时只转换唯一的格网角点；否则逐顶点批量转换
+    - profiler: 可选的StageProfiler，坐标转换与多边形创建分别记录为reproject与geometry阶段
+    - verbose: 是否输出坐标转换前后的坐标范围（流式模式下每个分块都会调用，关闭以减少输出）
+    - attributes: 可选的附加属性列 {列名: 数组}，放在id与name之后（瓦片存储统计）
+    """
+    # 延迟导入，只计算范围（--bounds-only）时不需要加载geopandas与shapely
+    import geopandas as gpd
+    from osgb_reproject import get_crs, get_transformer, reproject_geometries, reproject_lattice_footprints
+    if profiler is None:
+        profiler = StageProfiler()
+    min_x, min_y, max_x, max_y = footprint_bounds
+    reproject = output_crs != input_crs and len(min_x)
+    if reproject:
+        if verbose:
+            print(f'正在进行坐标转换，从EPSG:{input_crs}到EPSG:{output_crs}...')
+            print(f'转换前坐标范围: {[min_x.min(), min_y.min(), max_x.max(), max_y.max()]}')
+        with profiler.stage('reproject'):
+            transformer = get_transformer(input_crs, output_crs)
+            if lattice is not None:
+                boundary_polygons = reproject_lattice_footprints(*lattice, transformer)
+            else:
+                boundary_polygons = reproject_geometries(box_polygons(min_x, min_y, max_x, max_y), transformer)
+        crs = get_crs(output_crs)
+    else:
+        with profiler.stage('geometry'):
+            boundary_polygons = box_polygons(min_x, min_y, max_x, max_y)
+        crs = get_crs(input_crs)
+    with profiler.stage('geometry'):
         gdf = gpd.GeoDataFrame(
-            {'id': range(1, len(boundary_polygons) + 1), 'name': ['tile'] * len(boundary_polygons)},
+            {'id': ids, 'name': ['tile'] * len(boundary_polygons), **(attributes or {})},
             geometry=boundary_polygons,
-            crs=crs_input
+            crs=crs
         )
-        
-        # 9. 如果输出坐标系统不同，进行坐标转换
-        if output_crs != input_crs:
-            crs_output = f'EPSG:{output_crs}'
-            print(f'正在进行坐标转换，从EPSG:{input_crs}到EPSG:{output_crs}...')
-            print(f'转换前坐标范围: {gdf.total_bounds}')
-            gdf = gdf.to_crs(crs_output)
-            print(f'转换后坐标范围: {gdf.total_bounds}')
-        
-        print(f'正在保存Shapefile: {output_file}')
-        gdf.to_file(output_file)
-        
-        # 10. 生成报告
-        print('正在生成报告文件...')
-        report_path = os.path.join(output_folder, f'{os.path.splitext(os.path.basename(output_path))[0]}_report.txt')
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write('OSGB边界提取报告\n')
-            f.write('=' * 50 + '\n')
-            f.write(f'输入路径: {osgb_folder}\n')
-            f.write(f'瓦片数据路径: {tile_data_folder}\n')
-            f.write(f'输出路径: {output_file}\n')
-            f.write(f'输入坐标系统: EPSG:{input_crs}\n')
-            f.write(f'输入坐标系统来源: {crs_source}\n')
-            f.write(f'输出坐标系统: EPSG:{output_crs}\n')
-            f.write(f'输出坐标系统来源: {output_crs_source}\n')
-            f.write(f'处理瓦片数: {processed_tiles}\n')
-            f.write(f'生成多边形数: {len(boundary_polygons)}\n')
-            f.write(f'瓦片大小: {tile_geo_size} 度\n')
-            f.write('\n边界范围:\n')
-            bounds = gdf.total_bounds
+    if reproject and verbose:
+        print(f'转换后坐标范围: {gdf.total_bounds}')
+    return gdf
+
+
+def _update_spatial_index(index_file, removed_ids, added_names, added_ids, added_boxes, epsg, tile_data_folder):
+    """
+    增量模式下更新空间索引：去掉已删除的瓦片，加入新增瓦片后重新打包
+    """
+    index = load_index(index_file)
+    positions = np.nonzero(~np.isin(index['ids'], removed_ids))[0]
+    names = index_names(index, positions) + list(added_names)
+    ids = np.concatenate([index['ids'][positions], added_ids])
+    boxes = np.concatenate([index['levels'][0][positions], np.asarray(added_boxes).reshape(-1, 4)])
+    # 释放内存映射后再替换索引文件
+    del index
+    save_index(index_file, names, ids, boxes, epsg, tile_data_folder)
+
+
+def _build_pyramid(output_file, cols, rows, tile_geo_size, srs_origin, origin_is_max, input_crs, profiler):
+    """
+    由瓦片行列号构建范围金字塔并写出MBTiles，返回统计信息（路径与瓦片数等）
+    """
+    pyramid_file = mbtiles_path(output_file)
+    print('正在构建范围金字塔...')
+    with profiler.stage('pyramid'):
+        pyramid_info = build_pyramid_mbtiles(pyramid_file, np.asarray(cols), np.asarray(rows), tile_geo_size,
+                                             srs_origin, origin_is_max, input_crs)
+    pyramid_info['path'] = pyramid_file
+    print(f'已保存范围金字塔: {pyramid_file}（{format_pyramid_report(pyramid_info)}）')
+    return pyramid_info
+
+
+def _write_reports(report_path, profiler, report):
+    """
+    写出文本报告；启用阶段统计时附加统计结果，并在文本报告旁写出同名的JSON报告
+    """
+    report['profile'] = profiler.summary(report['processed_tiles']) if profiler.enabled else None
+    if report['profile']:
+        print(f'阶段统计: {format_profile_report(report["profile"])}')
+    _write_report(report_path, report)
+    if report['profile']:
+        json_path = f'{os.path.splitext(report_path)[0]}.json'
+        write_json_report(json_path, report)
+        print(f'JSON报告: {json_path}')
+
+
+def _write_report(report_path, report):
+    """
+    写出文本格式的处理报告
+    """
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write('OSGB边界提取报告\n')
+        f.write('=' * 50 + '\n')
+        f.write(f'输入路径: {report["input_path"]}\n')
+        f.write(f'瓦片数据路径: {report["tile_data_folder"]}\n')
+        f.write(f'输出路径: {report["output_file"]}\n')
+        f.write(f'输入坐标系统: EPSG:{report["input_crs"]}\n')
+        f.write(f'输入坐标系统来源: {report["crs_source"]}\n')
+        f.write(f'输出坐标系统: EPSG:{report["output_crs"]}\n')
+        f.write(f'输出坐标系统来源: {report["output_crs_source"]}\n')
+        f.write(f'处理瓦片数: {report["processed_tiles"]}\n')
+        f.write(f'生成多边形数: {report["polygon_count"]}\n')
+        f.write(f'瓦片大小: {report["tile_geo_size"]} 度\n')
+        f.write(f'瓦片发现: {format_discovery_report(report["discovery"])}\n')
+        if report['catalog']:
+            f.write(f'瓦片目录: {format_catalog_report(report["catalog"])}\n')
+        if report['tile_stats']:
+            f.write(f'瓦片存储统计: {format_tile_stats_report(report["tile_stats"])}\n')
+        footprint_info = report['footprint']
+        if footprint_info['source'] == 'osgb':
+            f.write(f'瓦片范围来源: OSGB根节点包围球（成功 {footprint_info["header_hits"]} 个，'
+                    f'回退 {footprint_info["fallbacks"]} 个）\n')
+        else:
+            f.write('瓦片范围来源: 行列号与固定瓦片大小\n')
+        if report['incremental']:
+            incremental_info = report['incremental']
+            f.write(f'增量更新: 新增 {incremental_info["added"]} 个，删除 {incremental_info["removed"]} 个，'
+                    f'未变化 {incremental_info["unchanged"]} 个\n')
+        if report['streaming']:
+            streaming_info = report['streaming']
+            peak_rss = streaming_info['peak_rss_mb']
+            f.write(f'流式处理: 分块大小 {streaming_info["chunk_size"]}，共 {streaming_info["chunks"]} 个分块，'
+                    f'内存峰值 {f"{peak_rss:.1f} MB" if peak_rss is not None else "未知"}\n')
+        if report['spatial_index']:
+            f.write(f'空间索引: {report["spatial_index"]}\n')
+        if report['pyramid']:
+            f.write(f'范围金字塔: {report["pyramid"]["path"]}（{format_pyramid_report(report["pyramid"])}）\n')
+        if report['write']:
+            f.write(f'输出格式: {report["write"]["format"]}\n')
+            f.write(f'写出统计: {format_write_report(report["write"])}\n')
+        f.write('\n边界范围:\n')
+        bounds = report['bounds']
+        if bounds is None:
+            f.write('无（没有瓦片）\n')
+        else:
             f.write(f'最小X: {bounds[0]:.6f}\n')
             f.write(f'最小Y: {bounds[1]:.6f}\n')
             f.write(f'最大X: {bounds[2]:.6f}\n')
             f.write(f'最大Y: {bounds[3]:.6f}\n')
             f.write(f'宽度: {bounds[2] - bounds[0]:.6f}\n')
             f.write(f'高度: {bounds[3] - bounds[1]:.6f}\n')
-            f.write('\n提取完成!\n')
-        
-        print('报告生成完成!')
-        return gdf, report_path
+        if report.get('profile'):
+            f.write('\n阶段统计:\n')
+            f.write(format_profile_report(report['profile']) + '\n')
+        f.write('\n提取完成!\n')
 
 
 if __name__ == '__main__':
+    # 子命令：query 查询覆盖指定范围的瓦片文件夹
+    if len(sys.argv) > 1 and sys.argv[1] == 'query':
+        from osgb_index import query_main
+        query_main(sys.argv[2:])
+        raise SystemExit(0)
+    # 子命令：serve 常驻服务，监视数据集变化并通过本地HTTP接口提供边界、范围与瓦片查询
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        from osgb_service import serve_main
+        serve_main(sys.argv[2:])
+        raise SystemExit(0)
+    # 子命令：diff 比较两个交付版本（数据集或瓦片清单），只写出新增、删除与移动的瓦片范围
+    if len(sys.argv) > 1 and sys.argv[1] == 'diff':
+        from osgb_diff import diff_main
+        diff_main(sys.argv[2:])
+        raise SystemExit(0)
+    # 子命令：shard 分片提取超大数据集（可只运行一个分片）；reduce 合并各分片的部分结果
+    if len(sys.argv) > 1 and sys.argv[1] == 'shard':
+        from osgb_shard import shard_main
+        shard_main(sys.argv[2:])
+        raise SystemExit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == 'reduce':
+        from osgb_shard import reduce_main
+        reduce_main(sys.argv[2:])
+        raise SystemExit(0)
+    
     parser = argparse.ArgumentParser(description='OSGB边界提取工具')
     parser.add_argument('--input', '-i', default='Data', help='OSGB数据输入路径')
-    parser.add_argument('--output', '-o', default='osgb_boundary.shp', help='输出shapefile路径和名称')
+    parser.add_argument('--output', '-o', default='osgb_boundary.shp',
+                        help='输出文件路径和名称，按扩展名确定格式：.shp / .gpkg / .fgb / .parquet')
     parser.add_argument('--epsg', '-e', type=int, default=4326, help='输入坐标系统EPSG ID')
     parser.add_argument('--output-epsg', '-oe', type=int, help='输出坐标系统EPSG ID，默认使用输入坐标系统')
     parser.add_argument('--origin-is-max', '-om', action='store_true', help='将原点视为最大坐标（默认原点为最小坐标）')
+    parser.add_argument('--incremental', '-inc', action='store_true',
+                        help='增量模式：根据输出旁的瓦片清单只处理新增或删除的瓦片')
+    parser.add_argument('--footprint-source', '-fs', choices=['grid', 'osgb'], default='grid',
+                        help='瓦片范围来源：grid按行列号计算（默认），osgb读取根节点OSGB文件中的包围球')
+    parser.add_argument('--header-workers', '-hw', type=int, default=8, help='读取OSGB根节点文件的线程数')
+    parser.add_argument('--bounds-only', '-bo', action='store_true',
+                        help='只计算整体范围并写出<输出名>_bounds.geojson，不创建几何对象，不加载geopandas/shapely')
+    parser.add_argument('--spatial-index', '-si', action='store_true',
+                        help='在输出旁保存瓦片范围空间索引（<输出名>_tiles.idx），供query子命令查询')
+    parser.add_argument('--mbtiles', '-mb', action='store_true',
+                        help='构建多分辨率范围金字塔并写出MBTiles矢量瓦片（<输出名>.mbtiles），供Web地图预览')
+    parser.add_argument('--profile', '-p', action='store_true',
+                        help='记录各阶段的墙钟时间、CPU时间与内存峰值，并额外写出JSON报告')
+    parser.add_argument('--chunk-size', '-cs', type=int,
+                        help='流式模式的分块大小：按分块创建多边形并追加写出，内存占用与瓦片总数无关（仅.shp/.gpkg）')
+    parser.add_argument('--tile-stats', '-ts', action='store_true',
+                        help='统计每个瓦片文件夹的文件数、OSGB文件数、字节数、外部纹理字节数与最深LOD层级，作为属性列写出')
+    parser.add_argument('--stats-workers', '-sw', type=int, default=16, help='统计瓦片文件夹的线程数')
     args = parser.parse_args()
     
     print(f'开始提取OSGB边界...')
@@ -283,8 +725,19 @@ if __name__ == '__main__':
         print(f'输出坐标系统: 与输入相同')
     print(f'原点模式: {"最大坐标" if args.origin_is_max else "最小坐标"}')
     
-    gdf, report = extract_osgb_boundary(args.input, args.output, args.epsg, args.output_epsg, args.origin_is_max)
+    if args.bounds_only:
+        from osgb_bounds import extract_tile_extent
+        extract_tile_extent(args.input, args.output, args.epsg, args.output_epsg, args.origin_is_max, coords='grid')
+        raise SystemExit(0)
+    
+    # 命令行只需要报告路径，完整提取时返回瓦片目录，不保留全部多边形
+    result, report = extract_osgb_boundary(args.input, args.output, args.epsg, args.output_epsg, args.origin_is_max,
+                                      args.incremental, args.footprint_source, args.header_workers, args.chunk_size,
+                                      args.profile, args.spatial_index, args.mbtiles, args.tile_stats,
+                                      args.stats_workers, return_catalog=True)
     
+    if result is None:
+        print('\n未发现可处理的瓦片，只生成了报告')
     print('\n提取完成!')
     print(f'生成文件: {os.path.splitext(args.output)[0]} 文件夹')
     print(f'生成报告: {report}')
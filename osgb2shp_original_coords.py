@@ -1,101 +1,77 @@
-import geopandas as gpd
-from shapely.geometry import Polygon
-from shapely.ops import unary_union
+import numpy as np
 import os
 import argparse
-import xml.etree.ElementTree as ET
-import re
 
+from osgb_tiles import box_polygons
+from osgb_catalog import TileCatalog, TILE_HEADER_BOUNDS, TILE_STATS_DTYPE, catalog_report, format_catalog_report
+from osgb_bounds import shift_original_bounds, ORIGINAL_SCALE_FACTOR
+from osgb_discovery import (iter_tile_entries, format_discovery_report, tile_storage_stats, tile_stats_report,
+                            format_tile_stats_report)
+from osgb_metadata import read_metadata_info
+from osgb_header import read_tile_bounds
+from osgb_simplify import simplify_outlines, format_simplify_report
+from osgb_io import output_format, write_geodataframe, format_write_report
+from osgb_profile import StageProfiler, format_profile_report, write_json_report
 
-def read_metadata_info(osgb_folder):
-    """
-    读取metadata.xml文件中的坐标系统和原点信息
-    """
-    metadata_path = os.path.join(osgb_folder, 'metadata.xml')
-    if not os.path.exists(metadata_path):
-        # 查找子目录中的metadata.xml
-        for root, dirs, files in os.walk(osgb_folder):
-            if 'metadata.xml' in files:
-                metadata_path = os.path.join(root, 'metadata.xml')
-                break
-    
-    if not os.path.exists(metadata_path):
-        return None, None
-    
-    try:
-        tree = ET.parse(metadata_path)
-        root = tree.getroot()
-        
-        # 读取坐标系统
-        epsg_code = None
-        for elem in root.iter():
-            if any(key in elem.tag.lower() for key in ['epsg', 'crs', 'srs']):
-                text = elem.text
-                if text:
-                    match = re.search(r'epsg:?(\d+)', text.lower())
-                    if match:
-                        epsg_code = int(match.group(1))
-                        break
-        
-        # 如果没有找到特定标签，检查所有元素的文本内容
-        if not epsg_code:
-            for elem in root.iter():
-                text = elem.text
-                if text:
-                    match = re.search(r'epsg:?(\d+)', text.lower())
-                    if match:
-                        epsg_code = int(match.group(1))
-                        break
-        
-        # 读取原点信息
-        srs_origin = None
-        for elem in root.iter():
-            if 'origin' in elem.tag.lower():
-                text = elem.text
-                if text:
-                    # 解析原点坐标
-                    coords = text.split(',')
-                    if len(coords) >= 2:
-                        try:
-                            x = float(coords[0].strip())
-                            y = float(coords[1].strip())
-                            srs_origin = (x, y)
-                        except ValueError:
-                            pass
-        
-        return epsg_code, srs_origin
-    except Exception:
-        return None, None
 
-
-def extract_osgb_boundary_original_coords(osgb_folder, output_path, epsg_id, output_epsg=None):
+def extract_osgb_boundary_original_coords(osgb_folder, output_path, epsg_id, output_epsg=None, merge_engine='grid',
+                                          footprint_source='grid', header_workers=8, densify_max_error=None,
+                                          profile=False, blocks=False, connectivity=4, tile_stats=False,
+                                          stats_workers=16, simplify_tolerance=None, max_vertices=None):
     """
     使用原始坐标提取OSGB边界，然后基于XML原点进行移动
     适用于有规则瓦片的OSGB数据
     
     参数:
     - osgb_folder: OSGB数据文件夹路径
-    - output_path: 输出Shapefile路径
+    - output_path: 输出文件路径，按扩展名确定格式（.shp / .gpkg / .fgb / .parquet）
     - epsg_id: 输入坐标系统EPSG代码
     - output_epsg: 输出坐标系统EPSG代码（可选）
+    - merge_engine: 多边形合并引擎，'grid'为格网描边（默认），'shapely'为unary_union
+    - footprint_source: 瓦片范围来源，'grid'使用文件夹名称坐标（默认），'osgb'读取根节点OSGB文件中的包围球
+    - header_workers: 读取OSGB根节点文件的线程数
+    - densify_max_error: 坐标转换时边界加密的最大误差（输出坐标系统单位），为None时只转换原有顶点
+    - profile: 是否记录各阶段的耗时与内存峰值，启用时在文本报告旁额外写出JSON报告（<输出名>_report.json）
+    - blocks: 是否按连通块输出，每个互不相连的测区输出一个要素（含瓦片数、面积与范围），而不是合并为一个要素
+    - connectivity: 连通块的邻接方式，4为上下左右相邻，8时对角相接的瓦片也属于同一连通块
+    - tile_stats: 是否在瓦片发现阶段统计每个瓦片文件夹的文件数、OSGB（LOD）文件数、总字节数、外部纹理字节数与
+      最深LOD层级；合并输出时为全部瓦片的合计，按连通块输出时为每个连通块的合计（最深LOD层级取最大值）
+    - stats_workers: 统计瓦片文件夹的线程数（有界线程池，按扫描顺序产出）
+    - simplify_tolerance: 边界简化容差（输入坐标系统单位），为None时只精确删除共线顶点
+    - max_vertices: 输出边界的顶点总数上限，指定时自动增大简化容差直到满足上限（分块输出时为所有连通块的合计）
     """
-    boundary_polygons = []
-    processed_tiles = 0
+    # 延迟导入，只计算范围（--bounds-only）时不需要加载geopandas与shapely
+    import geopandas as gpd
+    import shapely
+    from shapely.geometry import Polygon
+    from shapely.ops import unary_union
+    from osgb_lattice import trace_lattice_outline, label_lattice_blocks, trace_lattice_blocks, union_lattice_blocks
+    from osgb_reproject import get_crs, get_transformer, reproject_geometries, reproject_densified
     
     print('正在初始化处理...')
+    profiler = StageProfiler(profile)
+    # 提前检查输出格式，避免处理完所有瓦片后才发现扩展名不受支持
+    output_format(output_path)
     
     # 1. 检查是否存在Data子文件夹
     data_folder = os.path.join(osgb_folder, 'Data')
     if os.path.exists(data_folder) and os.path.isdir(data_folder):
         tile_data_folder = data_folder
         print(f'检测到Data子文件夹: {tile_data_folder}')
+    elif os.path.isfile(osgb_folder):
+        # zip/tar压缩包：只读取包内目录，不解压
+        if footprint_source == 'osgb':
+            raise ValueError('压缩包输入只支持按行列号计算瓦片范围，请使用 --footprint-source grid')
+        tile_data_folder = osgb_folder
+        print(f'检测到压缩包输入，直接读取包内目录: {tile_data_folder}')
     else:
         tile_data_folder = osgb_folder
         print(f'使用输入目录作为瓦片数据目录: {tile_data_folder}')
     
     # 2. 尝试从metadata.xml读取坐标系统和原点信息
     print('正在读取坐标系统信息...')
-    metadata_epsg, srs_origin = read_metadata_info(osgb_folder)
+    with profiler.stage('metadata'):
+        metadata_epsg, srs_origin = read_metadata_info(osgb_folder)
     if metadata_epsg:
         input_crs = metadata_epsg
         crs_source = 'metadata.xml'
@@ -116,100 +92,109 @@ def extract_osgb_boundary_original_coords(osgb_folder, output_path, epsg_id, out
         print(f'使用与输入相同的输出坐标系统: EPSG:{output_crs}')
     
     # 4. 遍历所有瓦片文件夹
+    # 从瓦片文件夹名称中提取坐标信息，使用原始坐标，不计算行列号，格式可能为 Tile_+xxx_+yyy
     print('正在遍历和处理瓦片文件夹...')
-    total_tiles = 0
-    tile_folders = []
-    
-    for tile_folder in os.listdir(tile_data_folder):
-        if tile_folder.startswith('Tile_'):
-            tile_folders.append(tile_folder)
-    
-    total_tiles = len(tile_folders)
-    print(f'发现 {total_tiles} 个瓦片文件夹')
-    
-    # 5. 处理瓦片 - 使用原始坐标，不计算行列号
-    # 从瓦片文件夹名称中提取坐标信息
     print('从瓦片文件夹名称提取原始坐标...')
+    discovery_report = {}
+    if tile_stats:
+        print(f'同时统计瓦片文件夹的文件数、字节数与LOD层级（{stats_workers} 个线程）...')
+        entries = iter_tile_entries(tile_data_folder, stat_func=tile_storage_stats, workers=stats_workers,
+                                    report=discovery_report)
+    else:
+        entries = iter_tile_entries(tile_data_folder, report=discovery_report)
+    with profiler.stage('discovery'):
+        catalog, skipped = TileCatalog.from_entries(entries, exact_pairs=False, with_stats=tile_stats)
+    total_tiles = discovery_report['tile_dirs']
+    print(f'发现 {total_tiles} 个瓦片文件夹')
+    print(f'瓦片发现: {format_discovery_report(discovery_report)}')
+    print(f'瓦片目录: {format_catalog_report(catalog_report(catalog))}')
+    for tile_folder, e in skipped:
+        print(f'处理瓦片文件夹 {tile_folder} 时出错: {e}')
+    stats_info = tile_stats_report(catalog.stats) if tile_stats else None
+    if stats_info:
+        print(f'瓦片存储统计: {format_tile_stats_report(stats_info)}')
+    processed_tiles = len(catalog)
+    original_xs = catalog.cols.astype(np.int64)
+    original_ys = catalog.rows.astype(np.int64)
     
-
-    
-    for i, tile_folder in enumerate(tile_folders):
-        tile_path = os.path.join(tile_data_folder, tile_folder)
-        if os.path.isdir(tile_path):
-            try:
-                # 直接从瓦片文件夹名称提取原始坐标信息
-                # 解析瓦片文件夹名称，格式可能为 Tile_+xxx_+yyy
-                tile_info = tile_folder.split('_')[1:]
-                if len(tile_info) >= 2:
-                    # 提取原始坐标值
-                    x_str = tile_info[0].replace('+', '')
-                    y_str = tile_info[1].replace('+', '')
-                    
-                    # 转换为整数作为原始坐标
-                    original_x = int(x_str)
-                    original_y = int(y_str)
-                    
-                    # 创建基于原始坐标的瓦片多边形
-                    # 这里不使用单位距离，而是直接使用原始坐标作为偏移量
-                    # 假设瓦片大小为固定值（根据实际数据调整）
-                    tile_size = 1000.0  # 调整为更大的瓦片大小
-                    
-                    min_x = original_x
-                    min_y = original_y
-                    max_x = original_x + 1
-                    max_y = original_y + 1
-                    
-                    # 创建多边形
-                    polygon = Polygon([
-                        (min_x, min_y),
-                        (max_x, min_y),
-                        (max_x, max_y),
-                        (min_x, max_y)
-                    ])
-                    
-                    boundary_polygons.append(polygon)
-                    processed_tiles += 1
-                    
-                    # 每处理10个瓦片显示一次进度
-                    if (i + 1) % 10 == 0:
-                        print(f'已处理 {i + 1}/{total_tiles} 个瓦片')
-            except ValueError as e:
-                print(f'处理瓦片文件夹 {tile_folder} 时出错: {e}')
-                pass
-    
-    # 6. 使用所有多边形
-    if boundary_polygons:
+    # 5. 使用所有瓦片
+    if processed_tiles:
         print(f'瓦片处理完成，共处理 {processed_tiles} 个瓦片')
         
-        # 7. 合并所有多边形为一个
-        print('正在合并所有多边形为一个...')
-        merged_polygon = unary_union(boundary_polygons)
+        # 6. 可选：读取瓦片根节点OSGB文件中的包围球作为真实瓦片范围
+        header_footprints = None
+        footprint_info = {'source': footprint_source, 'header_hits': 0, 'fallbacks': 0}
+        if footprint_source == 'osgb':
+            print(f'正在读取瓦片根节点OSGB包围球（{header_workers} 个线程）...')
+            tile_paths = [os.path.join(tile_data_folder, tile_name) for tile_name in catalog.names()]
+            with profiler.stage('footprints'):
+                h_min_x, h_min_y, h_max_x, h_max_y, valid = read_tile_bounds(tile_paths, srs_origin, header_workers)
+            catalog.flags[valid] |= TILE_HEADER_BOUNDS
+            footprint_info['header_hits'] = int(valid.sum())
+            if valid.all():
+                header_footprints = box_polygons(h_min_x, h_min_y, h_max_x, h_max_y)
+                print(f'根节点包围球读取完成: {processed_tiles} 个瓦片')
+            else:
+                # 真实坐标与原始编号坐标无法混用，任意瓦片读取失败时整体回退
+                footprint_info['fallbacks'] = processed_tiles
+                print(f'有 {int((~valid).sum())} 个瓦片无法读取根节点包围球，回退到文件夹名称坐标')
+        
+        # 7. 合并所有瓦片为一个多边形；分块模式下先在行列号上标记连通块，再将每个连通块合并为一个多边形
+        if blocks:
+            print(f'正在标记连通块（{connectivity}邻接）...')
+            with profiler.stage('blocks'):
+                block_labels, block_count = label_lattice_blocks(original_xs, original_ys, connectivity)
+            print(f'发现 {block_count} 个连通块')
+            print(f'正在按连通块合并多边形（合并引擎: {merge_engine}）...')
+        else:
+            print(f'正在合并所有多边形为一个（合并引擎: {merge_engine}）...')
+        with profiler.stage('merge'):
+            if blocks:
+                if header_footprints is not None:
+                    block_polygons = union_lattice_blocks(header_footprints, block_labels, block_count)
+                elif merge_engine == 'grid':
+                    # 整个格网只描边一次，再把各个多边形归入所属连通块
+                    block_polygons = trace_lattice_blocks(original_xs, original_ys, block_labels, block_count)
+                else:
+                    block_polygons = union_lattice_blocks(
+                        box_polygons(original_xs, original_ys, original_xs + 1, original_ys + 1),
+                        block_labels, block_count)
+            elif header_footprints is not None:
+                # 包围球范围不在整数格网上，使用通用的多边形合并
+                merged_polygon = unary_union(header_footprints)
+            elif merge_engine == 'grid':
+                # 瓦片位于整数格网上，直接对占用位图描边
+                merged_polygon = trace_lattice_outline(original_xs, original_ys)
+            else:
+                # 以原始坐标创建单位瓦片多边形，再执行通用的多边形合并
+                boundary_polygons = box_polygons(original_xs, original_ys, original_xs + 1, original_ys + 1)
+                merged_polygon = unary_union(boundary_polygons)
         print('多边形合并完成!')
         
-        # 8. 基于XML原点进行坐标移动
-        if srs_origin:
+        # 8. 基于XML原点进行坐标移动（包围球范围已经是实际坐标，无需移动）
+        if header_footprints is not None:
+            print('瓦片范围来自OSGB根节点包围球，已按原点偏移到实际坐标')
+        elif srs_origin and blocks:
+            print(f'从metadata.xml读取到原点坐标: {srs_origin}')
+            print('基于原点坐标移动各连通块的边界...')
+            # 保留每个连通块的形状，所有顶点按与shift_original_bounds相同的缩放因子换算后移动到原点位置
+            origin = np.asarray(srs_origin[:2], dtype=np.float64)
+            block_polygons = shapely.transform(block_polygons, lambda coords: origin + coords * ORIGINAL_SCALE_FACTOR)
+            print('边界移动完成!')
+        elif srs_origin:
             print(f'从metadata.xml读取到原点坐标: {srs_origin}')
             print('基于原点坐标进行边界移动...')
             
-            # 计算合并后多边形的边界框
-            min_x, min_y, max_x, max_y = merged_polygon.bounds
-            
-            # 计算移动偏移量
-            # 将边界移动到原点位置，使用原始坐标作为偏移量
-            # 这里假设原始坐标是从0开始的索引，需要乘以一个缩放因子
-            scale_factor = 100.0  # 缩放因子，根据实际数据调整
-            
-            offset_x = srs_origin[0] + (min_x * scale_factor)
-            offset_y = srs_origin[1] + (min_y * scale_factor)
-            boundary_width = (max_x - min_x) * scale_factor
-            boundary_height = (max_y - min_y) * scale_factor
+            # 计算合并后多边形的边界框，并按缩放因子移动到原点位置
+            # 这里假设原始坐标是从0开始的索引，需要乘以一个缩放因子（见osgb_bounds.ORIGINAL_SCALE_FACTOR）
+            min_x, min_y, max_x, max_y = shift_original_bounds(merged_polygon.bounds, srs_origin)
             
             # 创建移动后的多边形
             moved_polygon = Polygon([
-                (offset_x, offset_y),
-                (offset_x + boundary_width, offset_y),
-                (offset_x + boundary_width, offset_y + boundary_height),
-                (offset_x, offset_y + boundary_height)
+                (min_x, min_y),
+                (max_x, min_y),
+                (max_x, max_y),
+                (min_x, max_y)
             ])
             
             merged_polygon = moved_polygon
@@ -217,14 +202,24 @@ def extract_osgb_boundary_original_coords(osgb_folder, output_path, epsg_id, out
         else:
             print('未找到metadata.xml中的原点坐标，使用原始坐标...')
         
-        # 9. 创建输出文件夹
+        # 9. 简化边界：先精确删除格网描边留下的共线顶点，再可选地按容差或顶点数上限做保持拓扑的简化
+        # 在输入坐标系统中、坐标转换与加密之前进行，分块输出时所有连通块一起简化，互不相交
+        with profiler.stage('simplify'):
+            if blocks:
+                block_polygons, simplify_info = simplify_outlines(block_polygons, simplify_tolerance, max_vertices)
+            else:
+                simplified, simplify_info = simplify_outlines([merged_polygon], simplify_tolerance, max_vertices)
+                merged_polygon = simplified[0]
+        print(f'边界简化: {format_simplify_report(simplify_info)}')
+        
+        # 10. 创建输出文件夹
         print('正在创建输出文件夹...')
         output_folder = os.path.splitext(output_path)[0]
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
             print(f'创建输出文件夹: {output_folder}')
         
-        # 10. 创建并保存
+        # 11. 创建并保存
         print('正在创建并保存GeoDataFrame...')
         output_file = os.path.join(output_folder, os.path.basename(output_path))
         
@@ -232,26 +227,76 @@ def extract_osgb_boundary_original_coords(osgb_folder, output_path, epsg_id, out
         crs_input = f'EPSG:{input_crs}'
         print(f'设置输入坐标系统: {crs_input}')
         
-        # 创建包含合并多边形的GeoDataFrame
-        gdf = gpd.GeoDataFrame(
-            {'id': [1], 'name': ['merged_boundary']},
-            geometry=[merged_polygon],
-            crs=crs_input
-        )
+        if blocks:
+            # 每个连通块一个要素，按瓦片数从多到少编号
+            block_tiles = np.bincount(block_labels, minlength=block_count)
+            rank = np.argsort(-block_tiles, kind='stable')
+            gdf = gpd.GeoDataFrame(
+                {'id': np.arange(1, block_count + 1), 'name': ['block'] * block_count, 'tiles': block_tiles[rank]},
+                geometry=block_polygons[rank],
+                crs=get_crs(input_crs)
+            )
+        else:
+            # 创建包含合并多边形的GeoDataFrame
+            gdf = gpd.GeoDataFrame(
+                {'id': [1], 'name': ['merged_boundary']},
+                geometry=[merged_polygon],
+                crs=get_crs(input_crs)
+            )
         
-        # 10. 如果输出坐标系统不同，进行坐标转换
+        # 12. 如果输出坐标系统不同，使用缓存的Transformer进行坐标转换
         if output_crs != input_crs:
-            crs_output = f'EPSG:{output_crs}'
             print(f'正在进行坐标转换，从EPSG:{input_crs}到EPSG:{output_crs}...')
             print(f'转换前坐标范围: {gdf.total_bounds}')
-            gdf = gdf.to_crs(crs_output)
+            geometries = np.asarray(gdf.geometry.array)
+            with profiler.stage('reproject'):
+                transformer = get_transformer(input_crs, output_crs)
+                if densify_max_error:
+                    # 合并后的边界范围较大，按最大误差加密边界后再转换，避免直边变形
+                    reprojected = np.empty(len(geometries), dtype=object)
+                    for i, geometry in enumerate(geometries):
+                        reprojected[i] = reproject_densified(geometry, transformer, densify_max_error)
+                else:
+                    reprojected = reproject_geometries(geometries, transformer)
+            if densify_max_error:
+                print(f'边界加密: {shapely.get_num_coordinates(geometries).sum()} -> '
+                      f'{shapely.get_num_coordinates(reprojected).sum()} 个顶点（最大误差 {densify_max_error}）')
+            gdf = gpd.GeoDataFrame(gdf.drop(columns='geometry'), geometry=reprojected, crs=get_crs(output_crs))
             print(f'转换后坐标范围: {gdf.total_bounds}')
         
-        print(f'正在保存Shapefile: {output_file}')
-        gdf.to_file(output_file)
+        if blocks:
+            # 面积与范围按输出坐标系统计算
+            geometries = np.asarray(gdf.geometry.array)
+            block_bounds = shapely.bounds(geometries)
+            gdf.insert(3, 'area', shapely.area(geometries))
+            for i, column in enumerate(['min_x', 'min_y', 'max_x', 'max_y']):
+                gdf.insert(4 + i, column, block_bounds[:, i])
+        
+        if tile_stats:
+            # 存储统计按要素合计：合并输出为全部瓦片，分块输出为各连通块（与要素相同的排序）
+            labels = block_labels if blocks else np.zeros(processed_tiles, dtype=np.int64)
+            feature_count = block_count if blocks else 1
+            feature_order = rank if blocks else np.arange(1)
+            for field in TILE_STATS_DTYPE.names:
+                values = catalog.stats[field].astype(np.int64)
+                if field == 'max_lod':
+                    totals = np.full(feature_count, -1, dtype=np.int64)
+                    np.maximum.at(totals, labels, values)
+                else:
+                    totals = np.zeros(feature_count, dtype=np.int64)
+                    np.add.at(totals, labels, values)
+                gdf.insert(gdf.columns.get_loc('geometry'), field, totals[feature_order])
         
-        # 11. 生成报告
+        print(f'正在保存{output_format(output_file)}: {output_file}')
+        with profiler.stage('write'):
+            write_info = write_geodataframe(gdf, output_file)
+        print(f'写出完成: {format_write_report(write_info)}')
+        
+        # 13. 生成报告
         print('正在生成报告文件...')
+        profile_summary = profiler.summary(processed_tiles) if profile else None
+        if profile_summary:
+            print(f'阶段统计: {format_profile_report(profile_summary)}')
         report_path = os.path.join(output_folder, f'{os.path.splitext(os.path.basename(output_path))[0]}_report.txt')
         with open(report_path, 'w', encoding='utf-8') as f:
             f.write('OSGB边界提取报告\n')
@@ -264,10 +309,29 @@ def extract_osgb_boundary_original_coords(osgb_folder, output_path, epsg_id, out
             f.write(f'输出坐标系统: EPSG:{output_crs}\n')
             f.write(f'输出坐标系统来源: {output_crs_source}\n')
             f.write(f'处理瓦片数: {processed_tiles}\n')
-            f.write(f'合并前多边形数: {len(boundary_polygons)}\n')
-            f.write(f'合并后多边形数: 1\n')
+            f.write(f'合并前多边形数: {processed_tiles}\n')
+            f.write(f'合并引擎: {merge_engine}\n')
+            if header_footprints is not None:
+                f.write('瓦片范围来源: OSGB根节点包围球\n')
+            elif footprint_source == 'osgb':
+                f.write(f'瓦片范围来源: 瓦片文件夹名称（{processed_tiles - footprint_info["header_hits"]} 个瓦片'
+                        f'无法读取根节点包围球，{footprint_info["fallbacks"]} 个瓦片整体回退）\n')
+            else:
+                f.write('瓦片范围来源: 瓦片文件夹名称\n')
+            f.write(f'瓦片发现: {format_discovery_report(discovery_report)}\n')
+            f.write(f'瓦片目录: {format_catalog_report(catalog_report(catalog))}\n')
+            if stats_info:
+                f.write(f'瓦片存储统计: {format_tile_stats_report(stats_info)}\n')
+            if blocks:
+                f.write(f'连通块: {block_count} 个（{connectivity}邻接）\n')
+            f.write(f'合并后多边形数: {len(gdf)}\n')
+            f.write(f'边界简化: {format_simplify_report(simplify_info)}\n')
             if srs_origin:
                 f.write(f'使用的原点坐标: {srs_origin}\n')
+            if output_crs != input_crs:
+                f.write(f'边界加密最大误差: {densify_max_error if densify_max_error else "未加密"}\n')
+            f.write(f'输出格式: {write_info["format"]}\n')
+            f.write(f'写出统计: {format_write_report(write_info)}\n')
             f.write('\n边界范围:\n')
             bounds = gdf.total_bounds
             f.write(f'最小X: {bounds[0]:.6f}\n')
@@ -276,8 +340,38 @@ def extract_osgb_boundary_original_coords(osgb_folder, output_path, epsg_id, out
             f.write(f'最大Y: {bounds[3]:.6f}\n')
             f.write(f'宽度: {bounds[2] - bounds[0]:.6f}\n')
             f.write(f'高度: {bounds[3] - bounds[1]:.6f}\n')
+            if profile_summary:
+                f.write('\n阶段统计:\n')
+                f.write(format_profile_report(profile_summary) + '\n')
             f.write('\n提取完成!\n')
         
+        if profile_summary:
+            json_path = f'{os.path.splitext(report_path)[0]}.json'
+            write_json_report(json_path, {
+                'input_path': osgb_folder,
+                'tile_data_folder': tile_data_folder,
+                'output_file': output_file,
+                'input_crs': input_crs,
+                'crs_source': crs_source,
+                'output_crs': output_crs,
+                'output_crs_source': output_crs_source,
+                'processed_tiles': processed_tiles,
+                'polygon_count': len(gdf),
+                'blocks': {'count': block_count, 'connectivity': connectivity} if blocks else None,
+                'merge_engine': merge_engine,
+                'footprint_source': 'osgb' if header_footprints is not None else 'grid',
+                'footprint': footprint_info,
+                'discovery': discovery_report,
+                'catalog': catalog_report(catalog),
+                'tile_stats': stats_info,
+                'srs_origin': srs_origin,
+                'simplify': simplify_info,
+                'densify_max_error': densify_max_error,
+                'write': write_info,
+                'bounds': gdf.total_bounds,
+                'profile': profile_summary,
+            })
+            print(f'JSON报告: {json_path}')
         print('报告生成完成!')
         return gdf, report_path
 
@@ -285,9 +379,32 @@ def extract_osgb_boundary_original_coords(osgb_folder, output_path, epsg_id, out
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='OSGB边界提取工具（使用原始坐标）')
     parser.add_argument('--input', '-i', default='Data', help='OSGB数据输入路径')
-    parser.add_argument('--output', '-o', default='osgb_boundary_original.shp', help='输出shapefile路径和名称')
+    parser.add_argument('--output', '-o', default='osgb_boundary_original.shp',
+                        help='输出文件路径和名称，按扩展名确定格式：.shp / .gpkg / .fgb / .parquet')
     parser.add_argument('--epsg', '-e', type=int, default=4326, help='输入坐标系统EPSG ID')
     parser.add_argument('--output-epsg', '-oe', type=int, help='输出坐标系统EPSG ID，默认使用输入坐标系统')
+    parser.add_argument('--merge-engine', '-me', choices=['shapely', 'grid'], default='grid',
+                        help='多边形合并引擎：grid为格网描边（默认），shapely为unary_union')
+    parser.add_argument('--footprint-source', '-fs', choices=['grid', 'osgb'], default='grid',
+                        help='瓦片范围来源：grid使用文件夹名称坐标（默认），osgb读取根节点OSGB文件中的包围球')
+    parser.add_argument('--header-workers', '-hw', type=int, default=8, help='读取OSGB根节点文件的线程数')
+    parser.add_argument('--bounds-only', '-bo', action='store_true',
+                        help='只计算整体范围并写出<输出名>_bounds.geojson，不创建几何对象，不加载geopandas/shapely')
+    parser.add_argument('--profile', '-p', action='store_true',
+                        help='记录各阶段的墙钟时间、CPU时间与内存峰值，并额外写出JSON报告')
+    parser.add_argument('--densify-max-error', '-dme', type=float,
+                        help='坐标转换时按最大误差（输出坐标系统单位）加密边界，默认不加密')
+    parser.add_argument('--blocks', '-bk', action='store_true',
+                        help='按连通块输出：每个互不相连的测区一个要素，包含瓦片数、面积与范围')
+    parser.add_argument('--connectivity', '-cn', type=int, choices=[4, 8], default=4,
+                        help='连通块的邻接方式：4为上下左右相邻（默认），8时对角相接也算连通')
+    parser.add_argument('--tile-stats', '-ts', action='store_true',
+                        help='统计瓦片文件夹的文件数、OSGB文件数、字节数、外部纹理字节数与最深LOD层级，按要素合计写出')
+    parser.add_argument('--stats-workers', '-sw', type=int, default=16, help='统计瓦片文件夹的线程数')
+    parser.add_argument('--simplify-tolerance', '-st', type=float,
+                        help='边界简化容差（输入坐标系统单位，保持拓扑），默认只精确删除共线顶点')
+    parser.add_argument('--max-vertices', '-mv', type=int,
+                        help='输出边界的顶点总数上限，自动增大简化容差直到满足上限')
     args = parser.parse_args()
     
     print(f'开始提取OSGB边界...')
@@ -299,7 +416,18 @@ if __name__ == '__main__':
     else:
         print(f'输出坐标系统: 与输入相同')
     
-    gdf, report = extract_osgb_boundary_original_coords(args.input, args.output, args.epsg, args.output_epsg)
+    if args.bounds_only:
+        from osgb_bounds import extract_tile_extent
+        extract_tile_extent(args.input, args.output, args.epsg, args.output_epsg, coords='original')
+        raise SystemExit(0)
+    
+    print(f'合并引擎: {args.merge_engine}')
+    
+    gdf, report = extract_osgb_boundary_original_coords(args.input, args.output, args.epsg, args.output_epsg,
+                                                        args.merge_engine, args.footprint_source, args.header_workers,
+                                                        args.densify_max_error, args.profile, args.blocks,
+                                                        args.connectivity, args.tile_stats, args.stats_workers,
+                                                        args.simplify_tolerance, args.max_vertices)
     
     print('\n提取完成!')
     print(f'生成文件: {os.path.splitext(args.output)[0]} 文件夹')
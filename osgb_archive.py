@@ -0,0 +1,210 @@
+import io
+import os
+import tarfile
+import time
+import zipfile
+from collections import OrderedDict, namedtuple
+
+from osgb_tiles import TILE_PREFIX
+from osgb_discovery import TileEntry, empty_tile_stats, count_tile_file
+from osgb_metadata import METADATA_NAME, parse_metadata
+
+
+# 支持的压缩包扩展名
+ZIP_SUFFIXES = ('.zip',)
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# 压缩包目录：类型、瓦片数据目录在包内的路径、瓦片统计（名称 -> tile_storage_stats相同的字段，按包内顺序）、
+# 扫描的成员数、非文件夹的Tile_*成员数、metadata.xml在包内的路径与内容、扫描耗时
+ArchiveListing = namedtuple('ArchiveListing', ['path', 'kind', 'data_prefix', 'tiles', 'entries', 'skipped',
+                                               'metadata_member', 'metadata_bytes', 'elapsed'])
+
+# 扫描结果缓存：{绝对路径: ((mtime_ns, size), 目录)}，按最近使用顺序最多保留LISTING_CACHE_SIZE个压缩包，
+# 批量处理大量压缩包时不会保留所有目录
+LISTING_CACHE_SIZE = 4
+_listing_cache = OrderedDict()
+
+
+def archive_kind(path):
+    """
+    按扩展名判断压缩包类型，返回'zip'、'tar'，不是压缩包文件时返回None
+    """
+    lowered = path.lower()
+    if not os.path.isfile(path):
+        return None
+    if lowered.endswith(ZIP_SUFFIXES):
+        return 'zip'
+    if lowered.endswith(TAR_SUFFIXES):
+        return 'tar'
+    return None
+
+
+def strip_archive_suffix(name):
+    """
+    去掉压缩包扩展名，用于生成输出名称
+    """
+    lowered = name.lower()
+    for suffix in sorted(ZIP_SUFFIXES + TAR_SUFFIXES, key=len, reverse=True):
+        if lowered.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+class _ListingBuilder:
+    """
+    逐个接收成员路径，按路径中第一个Tile_*部分归入其上级目录，并记录最浅的metadata.xml
+    """
+
+    def __init__(self):
+        self.groups = {}
+        self.entries = 0
+        self.skipped = 0
+        self.metadata_member = None
+        self.metadata_depth = None
+
+    def add(self, name, size, is_dir):
+        """
+        记录一个成员；是比当前更浅的metadata.xml时返回True，调用方应读取其内容
+        """
+        self.entries += 1
+        parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+        for i, part in enumerate(parts):
+            if part.startswith(TILE_PREFIX):
+                if i == len(parts) - 1 and not is_dir:
+                    # 与目录扫描一致：名称以Tile_开头的文件不是瓦片
+                    self.skipped += 1
+                    return False
+                tiles = self.groups.setdefault('/'.join(parts[:i]), {})
+                stats = tiles.get(part)
+                if stats is None:
+                    stats = tiles[part] = empty_tile_stats()
+                if not is_dir:
+                    count_tile_file(stats, parts[-1], size)
+                return False
+        if parts and parts[-1] == METADATA_NAME and not is_dir:
+            if self.metadata_depth is None or len(parts) < self.metadata_depth:
+                self.metadata_member = name
+                self.metadata_depth = len(parts)
+                return True
+        return False
+
+    def data_prefix(self):
+        """
+        瓦片最多的上级目录作为瓦片数据目录
+        """
+        if not self.groups:
+            return None
+        return max(self.groups, key=lambda prefix: len(self.groups[prefix]))
+
+
+def _scan_zip(path, builder):
+    """
+    只读取zip的中央目录列出成员，metadata.xml按成员偏移直接读取，不解压其他任何文件
+    """
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            builder.add(info.filename, info.file_size, info.is_dir())
+        if builder.metadata_member is None:
+            return None
+        return zf.read(builder.metadata_member)
+
+
+def _scan_tar(path, builder):
+    """
+    单次顺序读取tar的成员头，成员数据通过seek跳过（压缩的tar只能顺序解压，但同样只读取一遍）
+    metadata.xml在经过时直接从包内读取
+    """
+    metadata_bytes = None
+    with tarfile.open(path, 'r:*') as tf:
+        while True:
+            member = tf.next()
+            if member is None:
+                break
+            if builder.add(member.name, member.size, member.isdir()) and member.isfile():
+                metadata_bytes = tf.extractfile(member).read()
+            _forget_tar_members(tf)
+    return metadata_bytes
+
+
+def _forget_tar_members(tf):
+    """
+    丢弃TarFile已读取的成员信息，使顺序扫描的内存占用与成员数无关
+
+    依赖CPython的实现细节：next()把每个成员追加到members列表，下一个成员的读取位置由offset记录，与该列表无关；
+    清空后getmembers()/getmember()与链接成员的解析不再可用，扫描过程中只对普通文件调用extractfile，不受影响。
+    members不是列表时（其他实现）保持不变，只是内存占用随成员数增长
+    """
+    members = getattr(tf, 'members', None)
+    if isinstance(members, list):
+        members.clear()
+
+
+def read_archive_listing(path):
+    """
+    扫描压缩包，返回ArchiveListing；结果按路径、修改时间与文件大小缓存，同一进程中发现瓦片与读取metadata只扫描一次
+    """
+    st = os.stat(path)
+    key = os.path.abspath(path)
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _listing_cache.get(key)
+    if cached and cached[0] == signature:
+        _listing_cache.move_to_end(key)
+        return cached[1]
+
+    start = time.perf_counter()
+    kind = archive_kind(path)
+    builder = _ListingBuilder()
+    if kind == 'zip':
+        metadata_bytes = _scan_zip(path, builder)
+    elif kind == 'tar':
+        metadata_bytes = _scan_tar(path, builder)
+    else:
+        raise ValueError(f'不支持的压缩包格式: {path}')
+    data_prefix = builder.data_prefix()
+    listing = ArchiveListing(
+        path=path,
+        kind=kind,
+        data_prefix=data_prefix,
+        tiles=builder.groups.get(data_prefix, {}),
+        entries=builder.entries,
+        skipped=builder.skipped,
+        metadata_member=builder.metadata_member,
+        metadata_bytes=metadata_bytes,
+        elapsed=time.perf_counter() - start,
+    )
+    _listing_cache[key] = (signature, listing)
+    _listing_cache.move_to_end(key)
+    while len(_listing_cache) > LISTING_CACHE_SIZE:
+        _listing_cache.popitem(last=False)
+    return listing
+
+
+def iter_archive_entries(path, prefix=TILE_PREFIX, report=None):
+    """
+    按包内顺序产出压缩包中的瓦片记录，字段与iter_tile_entries相同
+    路径为压缩包路径加包内路径（只用于显示与输出），统计信息取自成员头中的文件大小
+    """
+    listing = read_archive_listing(path)
+    if report is not None:
+        report.update({'entries': listing.entries, 'tile_dirs': 0, 'skipped': listing.skipped, 'workers': 0,
+                       'elapsed': listing.elapsed, 'archive': listing.kind})
+    base = os.path.join(path, *listing.data_prefix.split('/')) if listing.data_prefix else path
+    for name, stats in listing.tiles.items():
+        if name.startswith(prefix):
+            if report is not None:
+                report['tile_dirs'] += 1
+            yield TileEntry(name, os.path.join(base, name), dict(stats))
+
+
+def read_archive_metadata(path):
+    """
+    从压缩包内的metadata.xml直接解析坐标系统与原点信息，不解压到磁盘
+    没有metadata.xml或解析失败时返回None
+    """
+    listing = read_archive_listing(path)
+    if listing.metadata_bytes is None:
+        return None
+    try:
+        return parse_metadata(io.BytesIO(listing.metadata_bytes))
+    except Exception:
+        return None
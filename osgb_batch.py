@@ -0,0 +1,255 @@
+import argparse
+import contextlib
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import geopandas as gpd
+import pandas as pd
+from shapely.geometry import box
+
+from osgb_archive import archive_kind, strip_archive_suffix
+from osgb_io import write_geodataframe
+from osgb_metadata import METADATA_NAME
+from osgb_tiles import TILE_PREFIX
+
+
+def is_osgb_project(folder):
+    """
+    判断文件夹是否为OSGB项目：包含Data子文件夹或metadata.xml，或者是zip/tar压缩包
+    """
+    return (archive_kind(folder) is not None
+            or os.path.isdir(os.path.join(folder, 'Data'))
+            or os.path.isfile(os.path.join(folder, METADATA_NAME)))
+
+
+def find_projects(root):
+    """
+    在根目录下查找所有OSGB项目，找到项目后不再进入其子目录，并跳过瓦片文件夹
+    """
+    if is_osgb_project(root):
+        return [root]
+    projects = []
+    pending = [root]
+    while pending:
+        folder = pending.pop()
+        try:
+            with os.scandir(folder) as it:
+                subfolders = sorted(entry.path for entry in it
+                                    if (entry.is_dir() and not entry.name.startswith(TILE_PREFIX))
+                                    or (entry.is_file() and archive_kind(entry.path)))
+        except OSError:
+            continue
+        for subfolder in subfolders:
+            if is_osgb_project(subfolder):
+                projects.append(subfolder)
+            elif os.path.isdir(subfolder):
+                pending.append(subfolder)
+    return sorted(projects)
+
+
+def read_project_list(list_file):
+    """
+    读取项目列表文件，每行一个项目路径，忽略空行和#开头的注释行
+    """
+    projects = []
+    with open(list_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                projects.append(line)
+    return projects
+
+
+def project_name(project, root=None):
+    """
+    由项目路径生成唯一的输出名称：相对根目录的路径，路径分隔符替换为下划线
+    """
+    project = os.path.abspath(project)
+    if root and project != os.path.abspath(root):
+        name = os.path.relpath(project, os.path.abspath(root))
+    else:
+        name = os.path.basename(project.rstrip(os.sep))
+    return strip_archive_suffix(name).replace(os.sep, '_').replace('/', '_') or 'project'
+
+
+def _run_project(task):
+    """
+    在工作进程中处理单个项目，输出重定向到项目自己的日志文件
+    任何异常都被捕获并作为失败结果返回，不影响其他项目
+    """
+    name, project, output_dir, mode, options = task
+    start = time.perf_counter()
+    result = {'project': name, 'input': project, 'status': 'failed', 'error': None,
+              'output_file': None, 'report': None, 'features': 0, 'bounds': None, 'crs': None}
+    project_folder = os.path.join(output_dir, name)
+    os.makedirs(project_folder, exist_ok=True)
+    output_path = os.path.join(output_dir, f'{name}.{options["output_ext"]}')
+    log_path = os.path.join(project_folder, f'{name}_log.txt')
+    try:
+        with open(log_path, 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+            if mode == 'original':
+                from osgb2shp_original_coords import extract_osgb_boundary_original_coords
+                extracted = extract_osgb_boundary_original_coords(project, output_path, options['epsg'],
+                                                                  options['output_epsg'])
+            else:
+                from osgb2shp import extract_osgb_boundary
+                # 只使用要素数、范围与坐标系统，返回瓦片目录，不保留全部多边形
+                extracted = extract_osgb_boundary(project, output_path, options['epsg'], options['output_epsg'],
+                                                  options['origin_is_max'], return_catalog=True)
+        if extracted is None or extracted[0] is None:
+            result['error'] = '未发现可处理的瓦片'
+        else:
+            gdf, report_path = extracted
+            result.update({
+                'status': 'ok',
+                'output_file': os.path.join(project_folder, os.path.basename(output_path)),
+                'report': report_path,
+                'features': len(gdf),
+                'bounds': [float(v) for v in gdf.total_bounds],
+                'crs': gdf.crs.to_wkt() if gdf.crs else None,
+            })
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+        with open(log_path, 'a', encoding='utf-8') as log:
+            log.write(traceback.format_exc())
+    result['log'] = log_path
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_batch(projects, output_dir, mode='grid', workers=None, epsg_id=4326, output_epsg=None,
+              origin_is_max=False, summary_epsg=4326, root=None, output_ext='shp'):
+    """
+    使用进程池批量提取多个OSGB项目，每个工作进程只导入一次geopandas
+
+    参数:
+    - projects: 项目路径列表
+    - output_dir: 输出根目录，每个项目输出到其中的同名子文件夹
+    - mode: 'grid'使用extract_osgb_boundary，'original'使用extract_osgb_boundary_original_coords
+    - workers: 进程数，默认使用CPU核数
+    - summary_epsg: 汇总图层的坐标系统EPSG代码
+    - output_ext: 各项目输出文件的扩展名（shp / gpkg / fgb / parquet），汇总图层使用相同格式
+
+    返回 (结果列表, 汇总图层路径, 汇总报告路径)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    options = {'epsg': epsg_id, 'output_epsg': output_epsg, 'origin_is_max': origin_is_max, 'output_ext': output_ext}
+    used_names = set()
+    tasks = []
+    for project in projects:
+        name = project_name(project, root)
+        # 名称重复时追加序号
+        unique_name = name
+        suffix = 2
+        while unique_name in used_names:
+            unique_name = f'{name}_{suffix}'
+            suffix += 1
+        used_names.add(unique_name)
+        tasks.append((unique_name, project, output_dir, mode, options))
+
+    print(f'共 {len(tasks)} 个项目，使用 {workers or os.cpu_count()} 个进程处理...')
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_run_project, task): task for task in tasks}
+        for future in as_completed(futures):
+            name, project = futures[future][0], futures[future][1]
+            try:
+                result = future.result()
+            except Exception as e:
+                # 工作进程异常退出时同样只记录该项目失败
+                result = {'project': name, 'input': project, 'status': 'failed',
+                          'error': f'{type(e).__name__}: {e}', 'features': 0, 'bounds': None,
+                          'crs': None, 'output_file': None, 'report': None, 'log': None, 'seconds': 0.0}
+            results.append(result)
+            state = '完成' if result['status'] == 'ok' else f'失败（{result["error"]}）'
+            print(f'[{len(results)}/{len(tasks)}] {name}: {state}')
+    elapsed = time.perf_counter() - start
+    results.sort(key=lambda r: r['project'])
+
+    summary_path, report_path = _write_summary(results, output_dir, summary_epsg, mode, elapsed, output_ext)
+    return results, summary_path, report_path
+
+
+def _write_summary(results, output_dir, summary_epsg, mode, elapsed, output_ext):
+    """
+    写出汇总图层（每个成功项目一个范围多边形，统一转换到summary_epsg）与汇总报告
+    """
+    summary_path = os.path.join(output_dir, f'batch_summary.{output_ext}')
+    frames = []
+    for result in results:
+        if result['status'] != 'ok' or result['bounds'] is None:
+            continue
+        frame = gpd.GeoDataFrame(
+            {'project': [result['project']], 'features': [result['features']],
+             'seconds': [round(result['seconds'], 3)]},
+            geometry=[box(*result['bounds'])],
+            crs=result['crs']
+        )
+        frames.append(frame.to_crs(f'EPSG:{summary_epsg}'))
+    if frames:
+        summary = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=f'EPSG:{summary_epsg}')
+        write_geodataframe(summary, summary_path)
+    else:
+        summary_path = None
+
+    succeeded = sum(1 for r in results if r['status'] == 'ok')
+    report_path = os.path.join(output_dir, 'batch_summary_report.txt')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write('OSGB批量边界提取报告\n')
+        f.write('=' * 50 + '\n')
+        f.write(f'提取模式: {mode}\n')
+        f.write(f'项目总数: {len(results)}\n')
+        f.write(f'成功: {succeeded}\n')
+        f.write(f'失败: {len(results) - succeeded}\n')
+        f.write(f'总耗时: {elapsed:.3f} 秒\n')
+        f.write(f'汇总图层: {summary_path or "无"}\n')
+        f.write(f'汇总图层坐标系统: EPSG:{summary_epsg}\n')
+        f.write('\n项目明细:\n')
+        for result in results:
+            if result['status'] == 'ok':
+                f.write(f'[成功] {result["project"]}: {result["input"]} -> {result["output_file"]}，'
+                        f'{result["features"]} 个要素，耗时 {result["seconds"]:.3f} 秒\n')
+            else:
+                f.write(f'[失败] {result["project"]}: {result["input"]}，{result["error"]}，'
+                        f'日志: {result["log"]}\n')
+        f.write('\n提取完成!\n')
+    return summary_path, report_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='OSGB边界批量提取工具')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--root', '-r', help='包含多个OSGB项目的根目录（自动查找含Data或metadata.xml的文件夹）')
+    source.add_argument('--list', '-l', help='项目列表文件，每行一个项目路径')
+    parser.add_argument('--output-dir', '-o', default='osgb_batch_output', help='输出根目录')
+    parser.add_argument('--mode', '-m', choices=['grid', 'original'], default='grid',
+                        help='提取模式：grid为标准版（行列号计算），original为原始坐标版')
+    parser.add_argument('--workers', '-w', type=int, help='进程数，默认使用CPU核数')
+    parser.add_argument('--epsg', '-e', type=int, default=4326, help='输入坐标系统EPSG ID')
+    parser.add_argument('--output-epsg', '-oe', type=int, help='输出坐标系统EPSG ID，默认使用输入坐标系统')
+    parser.add_argument('--origin-is-max', '-om', action='store_true', help='将原点视为最大坐标（仅标准版）')
+    parser.add_argument('--summary-epsg', '-se', type=int, default=4326, help='汇总图层坐标系统EPSG ID')
+    parser.add_argument('--format', '-f', choices=['shp', 'gpkg', 'fgb', 'parquet'], default='shp',
+                        help='输出格式（各项目输出与汇总图层）')
+    args = parser.parse_args()
+
+    if args.root:
+        print(f'正在查找OSGB项目: {args.root}')
+        projects = find_projects(args.root)
+    else:
+        projects = read_project_list(args.list)
+    print(f'发现 {len(projects)} 个OSGB项目')
+
+    results, summary_path, report_path = run_batch(projects, args.output_dir, args.mode, args.workers, args.epsg,
+                                                   args.output_epsg, args.origin_is_max, args.summary_epsg,
+                                                   root=args.root, output_ext=args.format)
+
+    print('\n批量提取完成!')
+    print(f'成功 {sum(1 for r in results if r["status"] == "ok")} 个，'
+          f'失败 {sum(1 for r in results if r["status"] != "ok")} 个')
+    if summary_path:
+        print(f'汇总图层: {summary_path}')
+    print(f'汇总报告: {report_path}')
@@ -0,0 +1,238 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.ops import unary_union
+
+from osgb_tiles import parse_tile_names, tile_bounds, box_polygons, TILE_GEO_SIZE
+from osgb_lattice import trace_lattice_outline
+from osgb_discovery import iter_tile_entries
+from osgb_metadata import locate_metadata, parse_metadata
+from osgb_reproject import get_crs, get_transformer, reproject_lattice_footprints
+from osgb_io import write_geodataframe
+from osgb_synthetic import LAYOUTS, METADATA_VARIANTS, DEFAULT_EPSG, generate_dataset
+
+
+# 基准测试结果格式版本，结果结构变化时递增
+BENCHMARK_VERSION = 1
+
+
+def _timed(func, repeat):
+    """
+    重复执行func，返回 (最后一次的结果, 每次耗时列表)
+    """
+    runs = []
+    result = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - start)
+    return result, runs
+
+
+def _stage_result(runs, items):
+    """
+    单个阶段的统计：最短耗时、中位数、每次耗时与吞吐量（按最短耗时计算）
+    """
+    best = min(runs)
+    return {
+        'seconds': best,
+        'median': statistics.median(runs),
+        'runs': runs,
+        'items': items,
+        'items_per_second': items / best if best > 0 else None,
+    }
+
+
+def benchmark_dataset(dataset_root, output_dir, epsg_id=DEFAULT_EPSG, output_epsg=4326,
+                      formats=('gpkg',), merge_engines=('grid',), repeat=3, end_to_end=True):
+    """
+    分阶段测量单个数据集的处理耗时
+
+    阶段:
+    - discovery: 扫描瓦片文件夹并解析行列号
+    - metadata: 查找并解析metadata.xml（绕过缓存）
+    - geometry: 计算瓦片范围并批量创建多边形
+    - merge_<引擎>: 合并瓦片为整体边界（grid为格网描边，shapely为unary_union）
+    - reproject: 瓦片格网角点坐标转换
+    - write_<格式>: 写出瓦片多边形
+    - extract_grid / extract_original: 两个工具的端到端耗时（end_to_end为True时）
+    """
+    data_folder = os.path.join(dataset_root, 'Data')
+    stages = {}
+
+    # 1. 瓦片发现
+    (names, xs, ys, _), runs = _timed(
+        lambda: parse_tile_names(entry.name for entry in iter_tile_entries(data_folder)), repeat)
+    tiles = len(names)
+    stages['discovery'] = _stage_result(runs, tiles)
+
+    # 2. metadata.xml
+    def read_metadata_uncached():
+        metadata_path = locate_metadata(dataset_root)
+        return parse_metadata(metadata_path) if metadata_path else None
+    metadata, runs = _timed(read_metadata_uncached, repeat)
+    stages['metadata'] = _stage_result(runs, 1)
+    input_crs = metadata['epsg'] if metadata and metadata['epsg'] else epsg_id
+    srs_origin = metadata['origin'] if metadata else None
+
+    # 3. 瓦片多边形
+    cols = xs - 1
+    rows = ys - 1
+    polygons, runs = _timed(
+        lambda: box_polygons(*tile_bounds(cols, rows, TILE_GEO_SIZE, srs_origin)), repeat)
+    stages['geometry'] = _stage_result(runs, tiles)
+
+    # 4. 合并
+    for engine in merge_engines:
+        if engine == 'grid':
+            _, runs = _timed(lambda: trace_lattice_outline(xs, ys), repeat)
+        else:
+            _, runs = _timed(lambda: unary_union(box_polygons(xs, ys, xs + 1, ys + 1)), repeat)
+        stages[f'merge_{engine}'] = _stage_result(runs, tiles)
+
+    # 5. 坐标转换
+    if output_epsg and output_epsg != input_crs:
+        transformer = get_transformer(input_crs, output_epsg)
+        _, runs = _timed(lambda: reproject_lattice_footprints(cols, rows, TILE_GEO_SIZE, srs_origin, False,
+                                                              transformer), repeat)
+        stages['reproject'] = _stage_result(runs, tiles)
+
+    # 6. 写出
+    gdf = gpd.GeoDataFrame({'id': np.arange(1, tiles + 1), 'name': ['tile'] * tiles},
+                           geometry=polygons, crs=get_crs(input_crs))
+    for fmt in formats:
+        output_file = os.path.join(output_dir, f'benchmark.{fmt}')
+        write_infos, runs = _timed(lambda: write_geodataframe(gdf, output_file), repeat)
+        stages[f'write_{fmt}'] = _stage_result(runs, tiles)
+        stages[f'write_{fmt}']['bytes'] = write_infos['bytes']
+
+    # 7. 端到端
+    if end_to_end:
+        from osgb2shp import extract_osgb_boundary
+        from osgb2shp_original_coords import extract_osgb_boundary_original_coords
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, runs = _timed(lambda: extract_osgb_boundary(dataset_root, os.path.join(output_dir, 'grid.gpkg'),
+                                                           epsg_id, output_epsg, return_catalog=True), repeat)
+            stages['extract_grid'] = _stage_result(runs, tiles)
+            _, runs = _timed(lambda: extract_osgb_boundary_original_coords(
+                dataset_root, os.path.join(output_dir, 'original.gpkg'), epsg_id, output_epsg), repeat)
+            stages['extract_original'] = _stage_result(runs, tiles)
+
+    return {'tiles': tiles, 'input_crs': input_crs, 'origin': list(srs_origin) if srs_origin else None,
+            'stages': stages}
+
+
+def _environment():
+    """
+    运行环境信息：Python与主要依赖的版本、当前代码的git提交
+    """
+    import pyogrio
+    import pyproj
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': commit,
+        'versions': {
+            'numpy': np.__version__,
+            'shapely': shapely.__version__,
+            'geopandas': gpd.__version__,
+            'pyogrio': pyogrio.__version__,
+            'pyproj': pyproj.__version__,
+        },
+    }
+
+
+def run_benchmark(tile_counts=(1000, 10000), layouts=('dense',), signs=('plus',), metadata_variants=('epsg',),
+                  work_dir=None, keep=False, seed=0, **options):
+    """
+    按(瓦片数, 布局, 编号符号, metadata.xml变体)的所有组合生成合成数据集并分阶段测量
+
+    其余参数传递给benchmark_dataset；work_dir为None时使用临时目录，keep为False时测量后删除数据集
+    返回可直接写出为JSON的结果字典
+    """
+    temp_dir = None
+    if work_dir is None:
+        work_dir = temp_dir = tempfile.mkdtemp(prefix='osgb_benchmark_')
+    cases = []
+    try:
+        for tiles, layout, sign, variant in itertools.product(tile_counts, layouts, signs, metadata_variants):
+            name = f'{layout}_{sign}_{variant}_{tiles}'
+            case_dir = os.path.join(work_dir, name)
+            if os.path.exists(case_dir):
+                shutil.rmtree(case_dir)
+            output_dir = os.path.join(case_dir, 'output')
+            os.makedirs(output_dir)
+            print(f'[{len(cases) + 1}] 正在生成数据集: {name}')
+            start = time.perf_counter()
+            generate_dataset(os.path.join(case_dir, 'project'), tiles, layout, sign == 'mixed', variant, seed=seed)
+            generate_seconds = time.perf_counter() - start
+            print(f'[{len(cases) + 1}] 正在测量: {name}')
+            result = benchmark_dataset(os.path.join(case_dir, 'project'), output_dir, **options)
+            result.update({'name': name, 'layout': layout, 'sign': sign, 'metadata': variant,
+                           'generate_seconds': generate_seconds})
+            cases.append(result)
+            for stage, stage_result in result['stages'].items():
+                print(f'    {stage}: {stage_result["seconds"]:.4f} 秒')
+            if not keep:
+                shutil.rmtree(case_dir, ignore_errors=True)
+    finally:
+        if temp_dir and not keep:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return {
+        'benchmark_version': BENCHMARK_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': _environment(),
+        'repeat': options.get('repeat', 3),
+        'cases': cases,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='OSGB边界提取分阶段基准测试')
+    parser.add_argument('--tiles', '-n', type=int, nargs='+', default=[1000, 10000], help='瓦片数（可指定多个）')
+    parser.add_argument('--layouts', '-l', nargs='+', choices=LAYOUTS, default=['dense'], help='瓦片布局')
+    parser.add_argument('--signs', '-s', nargs='+', choices=['plus', 'mixed'], default=['plus'],
+                        help='编号符号：plus为全部+编号，mixed为以0为中心的+/-编号')
+    parser.add_argument('--metadata', '-m', nargs='+', choices=METADATA_VARIANTS, default=['epsg'],
+                        help='metadata.xml变体')
+    parser.add_argument('--formats', '-f', nargs='+', choices=['shp', 'gpkg', 'fgb', 'parquet'], default=['gpkg'],
+                        help='写出阶段测量的输出格式')
+    parser.add_argument('--merge-engines', '-me', nargs='+', choices=['grid', 'shapely'], default=['grid'],
+                        help='合并阶段测量的合并引擎')
+    parser.add_argument('--epsg', '-e', type=int, default=DEFAULT_EPSG, help='metadata.xml缺失时使用的输入坐标系统')
+    parser.add_argument('--output-epsg', '-oe', type=int, default=4326, help='坐标转换阶段的输出坐标系统')
+    parser.add_argument('--repeat', '-r', type=int, default=3, help='每个阶段的重复次数（取最短耗时）')
+    parser.add_argument('--no-end-to-end', action='store_true', help='不测量两个工具的端到端耗时')
+    parser.add_argument('--work-dir', '-w', help='数据集生成目录，默认使用临时目录')
+    parser.add_argument('--keep', action='store_true', help='保留生成的数据集')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--output', '-o', default='benchmark.json', help='JSON结果输出路径')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.tiles, args.layouts, args.signs, args.metadata, args.work_dir, args.keep, args.seed,
+                            epsg_id=args.epsg, output_epsg=args.output_epsg, formats=args.formats,
+                            merge_engines=args.merge_engines, repeat=args.repeat,
+                            end_to_end=not args.no_end_to_end)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f'\n基准测试完成，结果已写入: {args.output}')
@@ -0,0 +1,208 @@
+import json
+import os
+
+import numpy as np
+
+from osgb_tiles import parse_tile_name, tile_bounds, TILE_GEO_SIZE
+from osgb_discovery import iter_tile_entries, format_discovery_report
+from osgb_metadata import read_metadata_info
+
+
+# 原始坐标版将瓦片编号换算为实际坐标的缩放因子
+ORIGINAL_SCALE_FACTOR = 100.0
+
+
+def grid_extent(cols, rows, tile_size=TILE_GEO_SIZE, srs_origin=None, origin_is_max=False):
+    """
+    只用行列号的最小/最大值计算所有瓦片的整体范围
+    使用与tile_bounds相同的浮点运算，结果与所有瓦片多边形的并集范围逐位相同
+
+    返回 (min_x, min_y, max_x, max_y)，没有瓦片时返回None
+    """
+    if len(cols) == 0:
+        return None
+    col_range = [int(cols.min()), int(cols.max())]
+    row_range = [int(rows.min()), int(rows.max())]
+    min_x, min_y, max_x, max_y = tile_bounds(col_range, row_range, tile_size, srs_origin, origin_is_max)
+    return float(min_x.min()), float(min_y.min()), float(max_x.max()), float(max_y.max())
+
+
+def fold_tile_range(tile_names, exact_pairs=True):
+    """
+    边读取边解析瓦片文件夹名称，只保留行列号的累计最小/最大值（整数运算），内存占用与瓦片数无关
+
+    返回 (瓦片数, 解析失败数, [最小列号, 最大列号], [最小行号, 最大行号])，没有瓦片时两个范围为None
+    """
+    count = 0
+    skipped = 0
+    min_x = max_x = min_y = max_y = None
+    for tile_name in tile_names:
+        try:
+            parsed = parse_tile_name(tile_name, exact_pairs)
+        except ValueError:
+            skipped += 1
+            continue
+        if parsed is None:
+            continue
+        x, y = parsed
+        if count:
+            min_x = min(min_x, x)
+            max_x = max(max_x, x)
+            min_y = min(min_y, y)
+            max_y = max(max_y, y)
+        else:
+            min_x = max_x = x
+            min_y = max_y = y
+        count += 1
+    if not count:
+        return 0, skipped, None, None
+    return count, skipped, [min_x, max_x], [min_y, max_y]
+
+
+def shift_original_bounds(bounds, srs_origin, scale_factor=ORIGINAL_SCALE_FACTOR):
+    """
+    原始坐标版的原点移动：将原始编号坐标下的范围按缩放因子换算后移动到原点位置
+    """
+    min_x, min_y, max_x, max_y = bounds
+    offset_x = srs_origin[0] + (min_x * scale_factor)
+    offset_y = srs_origin[1] + (min_y * scale_factor)
+    boundary_width = (max_x - min_x) * scale_factor
+    boundary_height = (max_y - min_y) * scale_factor
+    return offset_x, offset_y, offset_x + boundary_width, offset_y + boundary_height
+
+
+def original_extent(xs, ys, srs_origin=None):
+    """
+    原始坐标版的整体范围：单位瓦片并集的外包矩形，有原点时按shift_original_bounds移动
+
+    返回 (min_x, min_y, max_x, max_y)，没有瓦片时返回None
+    """
+    if len(xs) == 0:
+        return None
+    bounds = (int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1)
+    if srs_origin:
+        return shift_original_bounds(bounds, srs_origin)
+    return tuple(float(v) for v in bounds)
+
+
+def extract_tile_extent(osgb_folder, output_path, epsg_id, output_epsg=None, origin_is_max=False, coords='grid'):
+    """
+    只计算OSGB数据的整体范围，不创建任何几何对象，也不导入geopandas/shapely
+
+    瓦片名称解析与原点处理与完整提取相同：
+    - coords为'grid'时与extract_osgb_boundary一致（行列号减1，按固定瓦片大小与原点模式计算）
+    - coords为'original'时与extract_osgb_boundary_original_coords一致（原始编号坐标，按原点移动）
+
+    在输出文件夹中写出 <输出名>_bounds.geojson（一个矩形要素）与 <输出名>_bounds_report.txt
+    返回 (范围信息字典, GeoJSON路径)，没有可处理的瓦片时返回None
+    """
+    print('正在以仅计算范围模式处理...')
+
+    # 1. 检查是否存在Data子文件夹
+    data_folder = os.path.join(osgb_folder, 'Data')
+    if os.path.isdir(data_folder):
+        tile_data_folder = data_folder
+    else:
+        # 输入为zip/tar压缩包时直接读取包内目录
+        tile_data_folder = osgb_folder
+    print(f'瓦片数据目录: {tile_data_folder}')
+
+    # 2. 读取坐标系统和原点信息
+    metadata_epsg, srs_origin = read_metadata_info(osgb_folder)
+    input_crs = metadata_epsg or epsg_id
+    output_crs = output_epsg or input_crs
+    print(f'输入坐标系统: EPSG:{input_crs}（{"metadata.xml" if metadata_epsg else "用户指定"}）')
+    if srs_origin:
+        print(f'原点坐标: {srs_origin}')
+
+    # 3. 边扫描边解析瓦片名称，只累计行列号的最小/最大值，不保存名称与行列号数组
+    discovery_report = {}
+    tiles, skipped, col_range, row_range = fold_tile_range(
+        (entry.name for entry in iter_tile_entries(tile_data_folder, report=discovery_report)),
+        exact_pairs=coords == 'grid'
+    )
+    print(f'瓦片发现: {format_discovery_report(discovery_report)}')
+    if not tiles:
+        print('未发现可处理的瓦片')
+        return None
+    if coords == 'grid':
+        col_range = [col_range[0] - 1, col_range[1] - 1]
+        row_range = [row_range[0] - 1, row_range[1] - 1]
+    # 整体范围只取决于行列号的最小/最大值，用两个元素的数组复用完整提取的范围计算
+    xs = np.array(col_range, dtype=np.int64)
+    ys = np.array(row_range, dtype=np.int64)
+    if coords == 'grid':
+        bounds = grid_extent(xs, ys, TILE_GEO_SIZE, srs_origin, origin_is_max)
+    else:
+        bounds = original_extent(xs, ys, srs_origin)
+
+    # 4. 如果输出坐标系统不同，只转换范围（延迟导入pyproj）
+    if output_crs != input_crs:
+        from osgb_reproject import get_transformer, transform_extent
+        print(f'正在转换范围，从EPSG:{input_crs}到EPSG:{output_crs}...')
+        bounds = transform_extent(bounds, get_transformer(input_crs, output_crs))
+
+    info = {
+        'input_path': osgb_folder,
+        'tile_data_folder': tile_data_folder,
+        'coords': coords,
+        'input_crs': input_crs,
+        'output_crs': output_crs,
+        'srs_origin': list(srs_origin) if srs_origin else None,
+        'origin_is_max': origin_is_max,
+        'tiles': tiles,
+        'skipped': skipped,
+        'col_range': col_range,
+        'row_range': row_range,
+        'bounds': list(bounds),
+    }
+    print(f'整体范围: {info["bounds"]}')
+
+    # 5. 写出GeoJSON与报告
+    output_folder = os.path.splitext(output_path)[0]
+    os.makedirs(output_folder, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(output_path))[0]
+    geojson_path = os.path.join(output_folder, f'{stem}_bounds.geojson')
+    min_x, min_y, max_x, max_y = bounds
+    feature_collection = {
+        'type': 'FeatureCollection',
+        'crs': {'type': 'name', 'properties': {'name': f'urn:ogc:def:crs:EPSG::{output_crs}'}},
+        'features': [{
+            'type': 'Feature',
+            'properties': {key: info[key] for key in ('tiles', 'coords', 'input_crs', 'output_crs')},
+            'geometry': {
+                'type': 'Polygon',
+                'coordinates': [[[min_x, min_y], [max_x, min_y], [max_x, max_y], [min_x, max_y], [min_x, min_y]]],
+            },
+        }],
+    }
+    with open(geojson_path, 'w', encoding='utf-8') as f:
+        json.dump(feature_collection, f, ensure_ascii=False)
+
+    report_path = os.path.join(output_folder, f'{stem}_bounds_report.txt')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write('OSGB范围计算报告\n')
+        f.write('=' * 50 + '\n')
+        f.write(f'输入路径: {osgb_folder}\n')
+        f.write(f'瓦片数据路径: {tile_data_folder}\n')
+        f.write(f'输出路径: {geojson_path}\n')
+        f.write(f'坐标模式: {coords}\n')
+        f.write(f'输入坐标系统: EPSG:{input_crs}\n')
+        f.write(f'输出坐标系统: EPSG:{output_crs}\n')
+        if srs_origin:
+            f.write(f'使用的原点坐标: {srs_origin}\n')
+        f.write(f'处理瓦片数: {info["tiles"]}\n')
+        f.write(f'列号范围: {info["col_range"][0]} ~ {info["col_range"][1]}\n')
+        f.write(f'行号范围: {info["row_range"][0]} ~ {info["row_range"][1]}\n')
+        f.write(f'瓦片发现: {format_discovery_report(discovery_report)}\n')
+        f.write('\n边界范围:\n')
+        f.write(f'最小X: {min_x:.6f}\n')
+        f.write(f'最小Y: {min_y:.6f}\n')
+        f.write(f'最大X: {max_x:.6f}\n')
+        f.write(f'最大Y: {max_y:.6f}\n')
+        f.write(f'宽度: {max_x - min_x:.6f}\n')
+        f.write(f'高度: {max_y - min_y:.6f}\n')
+        f.write('\n计算完成!\n')
+    print(f'范围文件: {geojson_path}')
+    print(f'生成报告: {report_path}')
+    return info, geojson_path
@@ -0,0 +1,202 @@
+from array import array
+
+import numpy as np
+
+from osgb_tiles import parse_tile_name
+
+
+# 瓦片状态标记（按位组合）
+TILE_HEADER_BOUNDS = 1  # 瓦片范围取自根节点OSGB文件中的包围球
+TILE_ADDED = 2  # 增量模式下本次新增的瓦片
+
+# 每个瓦片一条记录：文件夹名称中的两段编号与状态标记，共9字节
+CATALOG_DTYPE = np.dtype([('col', np.int32), ('row', np.int32), ('flags', np.uint8)])
+# 编号超出int32范围时使用的记录类型
+WIDE_CATALOG_DTYPE = np.dtype([('col', np.int64), ('row', np.int64), ('flags', np.uint8)])
+
+# 可选的瓦片存储统计（与osgb_discovery.TILE_STATS_FIELDS一致），共26字节
+TILE_STATS_DTYPE = np.dtype([('files', np.uint32), ('osgb_files', np.uint32), ('bytes', np.uint64),
+                             ('tex_bytes', np.uint64), ('max_lod', np.int16)])
+
+# 按分块创建几何对象时每块的瓦片数
+CATALOG_BATCH_SIZE = 65536
+
+_INT32 = np.iinfo(np.int32)
+
+
+class TileCatalog:
+    """
+    紧凑的瓦片目录：结构化数组保存每个瓦片的行列号与状态标记，瓦片文件夹名称以UTF-8连续存放在一个字节块中，
+    按偏移量取出，不为每个瓦片保留Python字符串或多边形对象；几何对象只在写出时按分块创建
+
+    - tiles: CATALOG_DTYPE结构化数组（col、row、flags）
+    - names_blob: 名称字节块（uint8数组）
+    - name_offsets: 第i个名称为 names_blob[name_offsets[i]:name_offsets[i + 1]]
+    - stats: 可选的TILE_STATS_DTYPE结构化数组，与tiles一一对应，未统计时为None
+    - crs / total_bounds: 写出后由提取函数设置的输出坐标系统（pyproj CRS）与输出范围，与GeoDataFrame的同名属性一致
+    """
+
+    def __init__(self, tiles, names_blob, name_offsets, stats=None):
+        self.tiles = tiles
+        self.names_blob = names_blob
+        self.name_offsets = name_offsets
+        self.stats = stats
+        self.crs = None
+        self.total_bounds = None
+
+    @classmethod
+    def from_names(cls, tile_names, exact_pairs=True):
+        """
+        边读取边解析瓦片文件夹名称，规则与parse_tile_names相同
+
+        返回 (目录, 解析失败的(名称, 错误)列表)
+        """
+        return cls._from_records(((tile_name, None) for tile_name in tile_names), exact_pairs, False)
+
+    @classmethod
+    def from_entries(cls, entries, exact_pairs=True, with_stats=False):
+        """
+        由iter_tile_entries产出的瓦片记录创建目录；with_stats为True时同时保存记录中的存储统计
+
+        返回 (目录, 解析失败的(名称, 错误)列表)
+        """
+        return cls._from_records(((entry.name, entry.stats) for entry in entries), exact_pairs, with_stats)
+
+    @classmethod
+    def _from_records(cls, records, exact_pairs, with_stats):
+        blob = bytearray()
+        offsets = array('Q', [0])
+        xs = array('q')
+        ys = array('q')
+        skipped = []
+        stats = []
+        for tile_name, tile_stats in records:
+            try:
+                parsed = parse_tile_name(tile_name, exact_pairs)
+            except ValueError as e:
+                skipped.append((tile_name, e))
+                continue
+            if parsed is None:
+                continue
+            blob += tile_name.encode('utf-8')
+            offsets.append(len(blob))
+            xs.append(parsed[0])
+            ys.append(parsed[1])
+            if with_stats:
+                stats.append(tuple(tile_stats[field] for field in TILE_STATS_DTYPE.names))
+
+        xs = np.frombuffer(xs, dtype=np.int64) if xs else np.empty(0, dtype=np.int64)
+        ys = np.frombuffer(ys, dtype=np.int64) if ys else np.empty(0, dtype=np.int64)
+        fits = not len(xs) or (_INT32.min <= min(xs.min(), ys.min()) and max(xs.max(), ys.max()) <= _INT32.max)
+        tiles = np.zeros(len(xs), dtype=CATALOG_DTYPE if fits else WIDE_CATALOG_DTYPE)
+        tiles['col'] = xs
+        tiles['row'] = ys
+        offset_dtype = np.uint32 if len(blob) <= np.iinfo(np.uint32).max else np.uint64
+        return cls(tiles, np.frombuffer(bytes(blob), dtype=np.uint8),
+                   np.frombuffer(offsets, dtype=np.uint64).astype(offset_dtype),
+                   np.array(stats, dtype=TILE_STATS_DTYPE) if with_stats else None), skipped
+
+    @classmethod
+    def concat(cls, catalogs):
+        """
+        按顺序拼接多个目录（例如各分片的部分结果），名称字节块首尾相接，偏移量依次平移
+        """
+        catalogs = list(catalogs)
+        if not catalogs:
+            return cls.from_names([])[0]
+        wide = any(catalog.tiles.dtype == WIDE_CATALOG_DTYPE for catalog in catalogs)
+        dtype = WIDE_CATALOG_DTYPE if wide else CATALOG_DTYPE
+        tiles = np.concatenate([catalog.tiles.astype(dtype) for catalog in catalogs])
+        blob = np.concatenate([catalog.names_blob[int(catalog.name_offsets[0]):int(catalog.name_offsets[-1])]
+                               for catalog in catalogs])
+        offsets = np.zeros(len(tiles) + 1, dtype=np.uint32 if len(blob) <= np.iinfo(np.uint32).max else np.uint64)
+        start = 0
+        base = 0
+        for catalog in catalogs:
+            catalog_offsets = catalog.name_offsets.astype(np.int64)
+            offsets[start + 1:start + len(catalog) + 1] = catalog_offsets[1:] - catalog_offsets[0] + base
+            start += len(catalog)
+            base += int(catalog_offsets[-1] - catalog_offsets[0])
+        stats = None
+        if all(catalog.stats is not None for catalog in catalogs):
+            stats = np.concatenate([catalog.stats for catalog in catalogs])
+        return cls(tiles, blob, offsets, stats)
+
+    def __len__(self):
+        return len(self.tiles)
+
+    @property
+    def cols(self):
+        return self.tiles['col']
+
+    @property
+    def rows(self):
+        return self.tiles['row']
+
+    @property
+    def flags(self):
+        return self.tiles['flags']
+
+    @property
+    def nbytes(self):
+        """
+        目录占用的字节数（记录、名称、偏移量与存储统计）
+        """
+        stats_bytes = self.stats.nbytes if self.stats is not None else 0
+        return self.tiles.nbytes + self.names_blob.nbytes + self.name_offsets.nbytes + stats_bytes
+
+    def name(self, i):
+        return self.names_blob[self.name_offsets[i]:self.name_offsets[i + 1]].tobytes().decode('utf-8')
+
+    def names(self):
+        """
+        解码所有瓦片名称为字符串列表（只在需要按名称比较或保存时调用）
+        """
+        data = self.names_blob.tobytes()
+        offsets = self.name_offsets.tolist()
+        return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(self.tiles))]
+
+    def take(self, positions):
+        """
+        按下标数组取出部分瓦片，返回名称重新紧凑存放的新目录
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = self.name_offsets[positions].astype(np.int64)
+        lengths = self.name_offsets[positions + 1].astype(np.int64) - starts
+        offsets = np.zeros(len(positions) + 1, dtype=self.name_offsets.dtype)
+        offsets[1:] = np.cumsum(lengths)
+        gather = np.repeat(starts - offsets[:-1].astype(np.int64), lengths) + np.arange(int(offsets[-1]))
+        stats = self.stats[positions] if self.stats is not None else None
+        return TileCatalog(self.tiles[positions], self.names_blob[gather], offsets, stats)
+
+    def batches(self, batch_size=CATALOG_BATCH_SIZE):
+        """
+        按顺序产出 (起始下标, 子目录)，子目录是原目录的视图，不复制记录与名称，修改其状态标记会写回原目录
+        """
+        for start in range(0, len(self.tiles), batch_size):
+            stop = min(start + batch_size, len(self.tiles))
+            stats = self.stats[start:stop] if self.stats is not None else None
+            yield start, TileCatalog(self.tiles[start:stop], self.names_blob, self.name_offsets[start:stop + 1],
+                                     stats)
+
+
+def tile_stats_columns(stats):
+    """
+    存储统计数组转换为输出属性列（int64，Shapefile/GeoPackage不支持无符号64位整数）
+    """
+    return {field: stats[field].astype(np.int64) for field in TILE_STATS_DTYPE.names}
+
+
+def catalog_report(catalog):
+    """
+    瓦片目录的瓦片数与内存占用，写入报告
+    """
+    return {'tiles': len(catalog), 'bytes': catalog.nbytes}
+
+
+def format_catalog_report(report):
+    """
+    将瓦片目录的统计信息格式化为一行文本
+    """
+    return (f'{report["tiles"]} 个瓦片，{report["bytes"] / 1024 / 1024:.2f} MB，'
+            f'{report["bytes"] / max(report["tiles"], 1):.1f} 字节/瓦片')
@@ -0,0 +1,268 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from osgb_tiles import tile_bounds, box_polygons, TILE_GEO_SIZE
+from osgb_catalog import TileCatalog, catalog_report, format_catalog_report
+from osgb_discovery import iter_tile_entries, format_discovery_report
+from osgb_metadata import read_metadata_info
+from osgb_manifest import load_manifest
+from osgb_io import output_format, write_geodataframe, format_write_report
+
+
+# 共同瓦片在两个版本中的范围相差超过该值（输出坐标系统单位）时视为已移动
+MOVE_TOLERANCE = 1e-6
+
+
+def load_version(path, epsg_id=4326, origin_is_max=False):
+    """
+    读取一个数据集版本的瓦片目录与坐标参考信息
+
+    - path为数据集根目录或zip/tar压缩包时，与标准版提取相同：扫描瓦片文件夹，从metadata.xml读取坐标系统与原点
+    - path为标准版增量模式保存的瓦片清单（<输出名>_manifest.json）时，直接使用清单中的瓦片名称与运行参数，
+      不访问数据目录
+
+    返回字典 {'path', 'source', 'catalog', 'input_crs', 'srs_origin', 'origin_is_max', 'tile_size', 'discovery'}
+    """
+    if path.lower().endswith('.json') and os.path.isfile(path):
+        manifest = load_manifest(path)
+        if manifest is None:
+            raise ValueError(f'不是有效的瓦片清单或版本不受支持: {path}')
+        params = manifest['params']
+        catalog, _ = TileCatalog.from_names(manifest['tiles']['names'])
+        return {
+            'path': path,
+            'source': 'manifest',
+            'catalog': catalog,
+            'input_crs': params['input_crs'],
+            'srs_origin': tuple(params['srs_origin']) if params['srs_origin'] else None,
+            'origin_is_max': params['origin_is_max'],
+            'tile_size': params['tile_geo_size'],
+            'discovery': None,
+        }
+
+    data_folder = os.path.join(path, 'Data')
+    tile_data_folder = data_folder if os.path.isdir(data_folder) else path
+    metadata_epsg, srs_origin = read_metadata_info(path)
+    discovery_report = {}
+    catalog, _ = TileCatalog.from_names(
+        entry.name for entry in iter_tile_entries(tile_data_folder, report=discovery_report)
+    )
+    return {
+        'path': path,
+        'source': 'dataset',
+        'catalog': catalog,
+        'input_crs': metadata_epsg or epsg_id,
+        'srs_origin': srs_origin,
+        'origin_is_max': origin_is_max,
+        'tile_size': TILE_GEO_SIZE,
+        'discovery': discovery_report,
+    }
+
+
+def diff_lattices(old_cols, old_rows, new_cols, new_rows):
+    """
+    以排序数组的集合运算比较两个版本的(列号, 行号)，不创建任何几何对象
+    行列号先编码为同一个int64键空间，再分别排序去重后求交集与差集
+
+    返回:
+    - added: 新版本中新增瓦片的下标
+    - removed: 旧版本中已删除瓦片的下标
+    - common_old, common_new: 两个版本都存在的瓦片在各自版本中的下标（一一对应）
+    """
+    old_cols = np.asarray(old_cols, dtype=np.int64)
+    old_rows = np.asarray(old_rows, dtype=np.int64)
+    new_cols = np.asarray(new_cols, dtype=np.int64)
+    new_rows = np.asarray(new_rows, dtype=np.int64)
+    all_cols = np.concatenate([old_cols, new_cols])
+    all_rows = np.concatenate([old_rows, new_rows])
+    if len(all_cols) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    col_min = int(all_cols.min())
+    row_min = int(all_rows.min())
+    span = int(all_rows.max()) - row_min + 1
+    old_keys, old_first = np.unique((old_cols - col_min) * span + (old_rows - row_min), return_index=True)
+    new_keys, new_first = np.unique((new_cols - col_min) * span + (new_rows - row_min), return_index=True)
+
+    _, old_common, new_common = np.intersect1d(old_keys, new_keys, assume_unique=True, return_indices=True)
+    old_only = np.ones(len(old_keys), dtype=bool)
+    old_only[old_common] = False
+    new_only = np.ones(len(new_keys), dtype=bool)
+    new_only[new_common] = False
+    return new_first[new_only], old_first[old_only], old_first[old_common], new_first[new_common]
+
+
+def _version_bounds(version, cols, rows, output_crs):
+    """
+    按版本自身的坐标参考信息计算瓦片范围，并转换到输出坐标系统（只转换两个角点，用于比较是否移动）
+    """
+    min_x, min_y, max_x, max_y = tile_bounds(cols, rows, version['tile_size'], version['srs_origin'],
+                                             version['origin_is_max'])
+    if version['input_crs'] != output_crs:
+        from osgb_reproject import get_transformer
+        transformer = get_transformer(version['input_crs'], output_crs)
+        min_x, min_y = transformer.transform(min_x, min_y)
+        max_x, max_y = transformer.transform(max_x, max_y)
+    return np.column_stack([min_x, min_y, max_x, max_y])
+
+
+def _georeference(version):
+    return version['input_crs'], version['srs_origin'], version['origin_is_max'], version['tile_size']
+
+
+def _footprint_frame(version, positions, change, output_crs):
+    """
+    为一个版本中指定下标的瓦片创建范围多边形（坐标转换时只转换唯一的格网角点），并标记变化类型
+    """
+    import geopandas as gpd
+    from osgb_reproject import get_crs, get_transformer, reproject_lattice_footprints
+
+    catalog = version['catalog'].take(positions)
+    cols = catalog.cols.astype(np.int64) - 1
+    rows = catalog.rows.astype(np.int64) - 1
+    if version['input_crs'] != output_crs:
+        polygons = reproject_lattice_footprints(cols, rows, version['tile_size'], version['srs_origin'],
+                                                version['origin_is_max'],
+                                                get_transformer(version['input_crs'], output_crs))
+    else:
+        polygons = box_polygons(*tile_bounds(cols, rows, version['tile_size'], version['srs_origin'],
+                                             version['origin_is_max']))
+    return gpd.GeoDataFrame(
+        {'change': [change] * len(catalog), 'tile': catalog.names(), 'col': cols, 'row': rows},
+        geometry=polygons,
+        crs=get_crs(output_crs)
+    )
+
+
+def diff_versions(old_path, new_path, output_path, epsg_id=4326, output_epsg=None, origin_is_max=False):
+    """
+    比较同一项目的两个交付版本，只写出发生变化的瓦片范围
+
+    参数:
+    - old_path / new_path: 旧版本与新版本，可以是数据集根目录、zip/tar压缩包或标准版保存的瓦片清单
+    - output_path: 输出文件路径，按扩展名确定格式；与提取工具相同，写在<输出名>文件夹中
+    - epsg_id: metadata.xml中没有坐标系统时使用的输入坐标系统
+    - output_epsg: 输出坐标系统，默认使用新版本的输入坐标系统
+    - origin_is_max: 数据集版本是否将原点视为最大坐标（瓦片清单使用其中保存的参数）
+
+    变化类型:
+    - added: 只在新版本中存在的瓦片（新版本中的范围）
+    - removed: 只在旧版本中存在的瓦片（旧版本中的范围）
+    - moved: 两个版本都存在，但因坐标系统、原点或原点模式变化，范围相差超过MOVE_TOLERANCE（新版本中的范围）
+
+    返回 (差异统计字典, 报告路径)
+    """
+    start = time.perf_counter()
+    output_format(output_path)
+
+    # 1. 读取两个版本的瓦片目录
+    versions = []
+    for label, path in (('旧版本', old_path), ('新版本', new_path)):
+        print(f'正在读取{label}: {path}')
+        version = load_version(path, epsg_id, origin_is_max)
+        if version['discovery'] is not None:
+            print(f'瓦片发现: {format_discovery_report(version["discovery"])}')
+        print(f'瓦片目录: {format_catalog_report(catalog_report(version["catalog"]))}，'
+              f'坐标系统 EPSG:{version["input_crs"]}')
+        versions.append(version)
+    old, new = versions
+    output_crs = output_epsg or new['input_crs']
+
+    # 2. 在行列号上做集合运算
+    old_cols = old['catalog'].cols.astype(np.int64) - 1
+    old_rows = old['catalog'].rows.astype(np.int64) - 1
+    new_cols = new['catalog'].cols.astype(np.int64) - 1
+    new_rows = new['catalog'].rows.astype(np.int64) - 1
+    compare_start = time.perf_counter()
+    added, removed, common_old, common_new = diff_lattices(old_cols, old_rows, new_cols, new_rows)
+
+    # 3. 坐标参考信息不同时，比较共同瓦片在两个版本中的范围
+    moved = np.empty(0, dtype=np.int64)
+    if _georeference(old) != _georeference(new) and len(common_new):
+        old_boxes = _version_bounds(old, old_cols[common_old], old_rows[common_old], output_crs)
+        new_boxes = _version_bounds(new, new_cols[common_new], new_rows[common_new], output_crs)
+        moved = common_new[np.any(np.abs(old_boxes - new_boxes) > MOVE_TOLERANCE, axis=1)]
+    compare_seconds = time.perf_counter() - compare_start
+    summary = {
+        'old_path': old_path,
+        'new_path': new_path,
+        'old_tiles': len(old['catalog']),
+        'new_tiles': len(new['catalog']),
+        'added': len(added),
+        'removed': len(removed),
+        'moved': len(moved),
+        'unchanged': len(common_new) - len(moved),
+        'output_crs': output_crs,
+        'compare_seconds': compare_seconds,
+    }
+    print(f'比较完成: 新增 {len(added)} 个，删除 {len(removed)} 个，移动 {len(moved)} 个，'
+          f'未变化 {summary["unchanged"]} 个，比较耗时 {compare_seconds * 1000:.1f} 毫秒')
+
+    # 4. 只为发生变化的瓦片创建范围多边形并写出
+    output_folder = os.path.splitext(output_path)[0]
+    os.makedirs(output_folder, exist_ok=True)
+    output_file = os.path.join(output_folder, os.path.basename(output_path))
+    write_info = None
+    if len(added) or len(removed) or len(moved):
+        import pandas as pd
+        import geopandas as gpd
+        frames = [_footprint_frame(new, np.sort(added), 'added', output_crs),
+                  _footprint_frame(old, np.sort(removed), 'removed', output_crs),
+                  _footprint_frame(new, np.sort(moved), 'moved', output_crs)]
+        gdf = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=frames[0].crs)
+        gdf.insert(0, 'id', np.arange(1, len(gdf) + 1))
+        print(f'正在保存{output_format(output_file)}: {output_file}')
+        write_info = write_geodataframe(gdf, output_file)
+        print(f'写出完成: {format_write_report(write_info)}')
+    else:
+        print('两个版本的瓦片完全相同，不写出差异文件')
+    summary['output_file'] = output_file if write_info else None
+    summary['seconds'] = time.perf_counter() - start
+
+    # 5. 生成报告
+    report_path = os.path.join(output_folder, f'{os.path.splitext(os.path.basename(output_path))[0]}_report.txt')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write('OSGB版本差异报告\n')
+        f.write('=' * 50 + '\n')
+        for label, version in (('旧版本', old), ('新版本', new)):
+            f.write(f'{label}: {version["path"]}（{"瓦片清单" if version["source"] == "manifest" else "数据集"}）\n')
+            f.write(f'{label}瓦片数: {len(version["catalog"])}\n')
+            f.write(f'{label}坐标系统: EPSG:{version["input_crs"]}\n')
+            if version['srs_origin']:
+                f.write(f'{label}原点坐标: {version["srs_origin"]}\n')
+        f.write(f'输出坐标系统: EPSG:{output_crs}\n')
+        f.write(f'输出路径: {summary["output_file"] or "无变化，未写出"}\n')
+        f.write(f'新增瓦片: {summary["added"]}\n')
+        f.write(f'删除瓦片: {summary["removed"]}\n')
+        f.write(f'移动瓦片: {summary["moved"]}\n')
+        f.write(f'未变化瓦片: {summary["unchanged"]}\n')
+        if write_info:
+            f.write(f'写出统计: {format_write_report(write_info)}\n')
+        f.write(f'比较耗时: {compare_seconds:.3f} 秒\n')
+        f.write(f'总耗时: {summary["seconds"]:.3f} 秒\n')
+        f.write('\n比较完成!\n')
+    print(f'生成报告: {report_path}')
+    return summary, report_path
+
+
+def diff_main(argv=None):
+    """
+    diff子命令：比较两个交付版本，写出新增、删除与移动的瓦片范围
+    """
+    parser = argparse.ArgumentParser(prog='osgb2shp.py diff', description='比较OSGB数据集两个版本的瓦片差异')
+    parser.add_argument('old', help='旧版本：数据集路径（目录或zip/tar压缩包）或瓦片清单（<输出名>_manifest.json）')
+    parser.add_argument('new', help='新版本：数据集路径（目录或zip/tar压缩包）或瓦片清单')
+    parser.add_argument('--output', '-o', default='osgb_diff.shp',
+                        help='差异文件路径和名称，按扩展名确定格式：.shp / .gpkg / .fgb / .parquet')
+    parser.add_argument('--epsg', '-e', type=int, default=4326, help='输入坐标系统EPSG ID（metadata.xml优先）')
+    parser.add_argument('--output-epsg', '-oe', type=int, help='输出坐标系统EPSG ID，默认使用新版本的输入坐标系统')
+    parser.add_argument('--origin-is-max', '-om', action='store_true', help='将原点视为最大坐标（默认原点为最小坐标）')
+    args = parser.parse_args(argv)
+    return diff_versions(args.old, args.new, args.output, args.epsg, args.output_epsg, args.origin_is_max)
+
+
+if __name__ == '__main__':
+    diff_main()
@@ -0,0 +1,168 @@
+import os
+import re
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from osgb_tiles import TILE_PREFIX
+
+
+# 瓦片记录：名称、完整路径、统计信息（未启用统计时为None）
+TileEntry = namedtuple('TileEntry', ['name', 'path', 'stats'])
+
+
+# 外部纹理文件扩展名（多数OSGB导出将纹理内嵌在.osgb文件中，此时纹理字节数为0）
+TEXTURE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.dds', '.ktx', '.ktx2', '.tga', '.bmp', '.tif', '.tiff', '.webp')
+
+# LOD层级：文件名中的 _L<层级>_，例如 Tile_+001_+001_L18_0000.osgb
+LOD_PATTERN = re.compile(r'_L(\d+)_')
+
+# 瓦片存储统计的字段，依次为文件数、OSGB（LOD）文件数、总字节数、外部纹理字节数、最深LOD层级（没有LOD文件时为-1）
+TILE_STATS_FIELDS = ('files', 'osgb_files', 'bytes', 'tex_bytes', 'max_lod')
+
+
+def empty_tile_stats():
+    return {'files': 0, 'osgb_files': 0, 'bytes': 0, 'tex_bytes': 0, 'max_lod': -1}
+
+
+def count_tile_file(stats, name, size):
+    """
+    将瓦片文件夹中的一个文件计入统计，目录扫描与压缩包成员使用相同的规则
+    """
+    stats['files'] += 1
+    stats['bytes'] += size
+    lowered = name.lower()
+    if lowered.endswith('.osgb'):
+        stats['osgb_files'] += 1
+        match = LOD_PATTERN.search(name)
+        if match:
+            stats['max_lod'] = max(stats['max_lod'], int(match.group(1)))
+    elif lowered.endswith(TEXTURE_SUFFIXES):
+        stats['tex_bytes'] += size
+
+
+def tile_storage_stats(tile_path):
+    """
+    统计单个瓦片文件夹（含子目录）中的文件数、OSGB文件数、总字节数、外部纹理字节数与最深LOD层级
+    全程使用os.scandir，文件大小取自目录项缓存的stat结果
+    """
+    stats = empty_tile_stats()
+    pending = [tile_path]
+    while pending:
+        folder = pending.pop()
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        count_tile_file(stats, entry.name, entry.stat(follow_symlinks=False).st_size)
+        except OSError:
+            pass
+    return stats
+
+
+def tile_stats_report(stats):
+    """
+    由瓦片目录的存储统计数组（TILE_STATS_DTYPE）汇总总数，写入报告
+    """
+    report = {'tiles': len(stats)}
+    for field in TILE_STATS_FIELDS[:-1]:
+        report[field] = int(stats[field].sum()) if len(stats) else 0
+    report['max_lod'] = int(stats['max_lod'].max()) if len(stats) else -1
+    return report
+
+
+def merge_tile_stats_report(total, report):
+    """
+    累加两次汇总（流式模式的各个分块），total为None时直接返回report
+    """
+    if total is None:
+        return dict(report)
+    merged = {key: total[key] + report[key] for key in ('tiles',) + TILE_STATS_FIELDS[:-1]}
+    merged['max_lod'] = max(total['max_lod'], report['max_lod'])
+    return merged
+
+
+def format_tile_stats_report(report):
+    """
+    将瓦片存储统计的汇总格式化为一行文本
+    """
+    max_lod = f'L{report["max_lod"]}' if report['max_lod'] >= 0 else '无'
+    return (f'{report["tiles"]} 个瓦片，{report["files"]} 个文件，OSGB文件 {report["osgb_files"]} 个，'
+            f'共 {report["bytes"] / 1024 / 1024:.2f} MB，外部纹理 {report["tex_bytes"] / 1024 / 1024:.2f} MB，'
+            f'最深LOD层级 {max_lod}')
+
+
+def bounded_map(executor, func, iterable, max_pending):
+    """
+    与executor.map类似，按输入顺序产出结果，但同时提交的任务数不超过max_pending，
+    保证内存占用与输入规模无关，且可以边产出边消费
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(func, item))
+        while len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _scan_tile_dirs(tile_data_folder, prefix, report):
+    """
+    使用os.scandir列出瓦片文件夹，直接复用目录项中缓存的文件类型（d_type），
+    不再对每个瓦片额外调用os.path.isdir
+    """
+    with os.scandir(tile_data_folder) as it:
+        for entry in it:
+            report['entries'] += 1
+            if not entry.name.startswith(prefix):
+                continue
+            if entry.is_dir():
+                report['tile_dirs'] += 1
+                yield entry
+            else:
+                report['skipped'] += 1
+
+
+def iter_tile_entries(tile_data_folder, prefix=TILE_PREFIX, stat_func=None, workers=0, report=None):
+    """
+    边扫描边逐个产出瓦片记录，调用方可以在目录列举完成之前就开始解析
+
+    参数:
+    - tile_data_folder: 瓦片数据目录，也可以是zip/tar压缩包（只读取包内目录，统计信息取自成员头，忽略stat_func）
+    - prefix: 瓦片文件夹名称前缀
+    - stat_func: 可选的统计函数，参数为瓦片路径，返回值写入TileEntry.stats
+    - workers: 统计函数的线程数，大于0时在线程池中并发执行统计（按扫描顺序产出）
+    - report: 可选的字典，用于返回扫描的目录项数、瓦片数与耗时
+    """
+    if os.path.isfile(tile_data_folder):
+        from osgb_archive import iter_archive_entries
+        yield from iter_archive_entries(tile_data_folder, prefix, report)
+        return
+    if report is None:
+        report = {}
+    report.update({'entries': 0, 'tile_dirs': 0, 'skipped': 0, 'workers': workers, 'elapsed': 0.0})
+    start = time.perf_counter()
+    try:
+        if stat_func is None:
+            for entry in _scan_tile_dirs(tile_data_folder, prefix, report):
+                yield TileEntry(entry.name, entry.path, None)
+        elif workers <= 0:
+            for entry in _scan_tile_dirs(tile_data_folder, prefix, report):
+                yield TileEntry(entry.name, entry.path, stat_func(entry.path))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                entries = _scan_tile_dirs(tile_data_folder, prefix, report)
+                for entry, stats in bounded_map(executor, lambda e: (e, stat_func(e.path)), entries, workers * 4):
+                    yield TileEntry(entry.name, entry.path, stats)
+    finally:
+        report['elapsed'] = time.perf_counter() - start
+
+
+def format_discovery_report(report):
+    """
+    将瓦片发现阶段的统计信息格式化为一行文本
+    """
+    return (f'扫描目录项 {report["entries"]} 个，瓦片文件夹 {report["tile_dirs"]} 个，'
+            f'跳过非文件夹 {report["skipped"]} 个，耗时 {report["elapsed"]:.3f} 秒')
@@ -0,0 +1,337 @@
+import math
+import mmap
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from osgb_discovery import bounded_map
+
+
+# OpenSceneGraph二进制文件头的两个魔数（OSG_HEADER_LOW / OSG_HEADER_HIGH）
+OSG_HEADER_LOW = 0x6C910EA1
+OSG_HEADER_HIGH = 0x1AFB4545
+
+# 文件类型（OutputStream::WriteType）：WRITE_SCENE / WRITE_OBJECT
+_WRITE_TYPES = (1, 3)
+# 从该版本开始文件头带有属性位：0x1 自定义域版本，0x2 内嵌schema，0x4 二进制括号记录块大小
+_ATTRIBUTES_VERSION = 98
+_ATTR_DOMAINS = 0x1
+_ATTR_SCHEMA = 0x2
+_ATTR_BRACKETS = 0x4
+# 高于该版本时块大小为8字节，否则为4字节
+_INT64_BRACKET_VERSION = 148
+# 低于这些版本的文件还带有osg::PagedLOD的FrameNumberOfLastTraversal与osg::Node的Descriptions字段
+_FRAME_NUMBER_REMOVED_VERSION = 70
+_DESCRIPTIONS_REMOVED_VERSION = 77
+
+# osg::LOD::CenterMode中带用户中心点的两种取值
+_USER_DEFINED_CENTER = 1
+_UNION_OF_BOUNDING_SPHERE_AND_USER_DEFINED = 2
+
+# 能够直接读出范围的节点类型，其余节点（例如Geode）的范围需要解析几何数据
+_GROUP_CLASS = b'osg::Group'
+_LOD_CLASS = b'osg::LOD'
+_PAGED_LOD_CLASS = b'osg::PagedLOD'
+_NODE_CLASSES = (_GROUP_CLASS, _LOD_CLASS, _PAGED_LOD_CLASS)
+
+# zlib压缩的文件每次解压的输入字节数
+_INFLATE_CHUNK = 64 * 1024
+# 局部坐标的合理范围，用于排除损坏的包围球
+_MAX_ABS_COORD = 1.0e8
+# 没有子节点的Group的范围，与任何范围求并集都不改变结果
+_EMPTY_BOX = (math.inf, math.inf, -math.inf, -math.inf)
+
+
+def root_osgb_path(tile_path):
+    """
+    瓦片根节点文件路径：Tile_xxx_yyy/Tile_xxx_yyy.osgb
+    """
+    return os.path.join(tile_path, f'{os.path.basename(tile_path)}.osgb')
+
+
+class _OsgbStream:
+    """
+    OSG二进制流的顺序读取器，布局与osgDB::InputStream一致：
+    字符串为int32长度加内容，对象为类名、块大小（写出时启用二进制括号）、UniqueID与各字段
+
+    数据来自内存映射的文件，只访问实际读取的页；zlib压缩的文件按需分块解压
+    """
+
+    def __init__(self, data, byte_order):
+        self.data = data
+        self.pos = 0
+        self.byte_order = byte_order
+        self.version = 0
+        self.brackets = False
+        # 已读取的节点编号到范围的映射，共享的节点只写出编号
+        self.boxes = {}
+        self._source = None
+        self._source_pos = 0
+        self._inflater = None
+
+    def inflate(self):
+        """
+        之后的内容为zlib/gzip压缩流，块大小与位置都相对于解压后的数据
+        """
+        self._source = self.data
+        self._source_pos = self.pos
+        self._inflater = zlib.decompressobj(zlib.MAX_WBITS | 32)
+        self.data = bytearray()
+        self.pos = 0
+
+    def _ensure(self, size):
+        end = self.pos + size
+        while len(self.data) < end and self._inflater is not None and not self._inflater.eof:
+            chunk = self._source[self._source_pos:self._source_pos + _INFLATE_CHUNK]
+            if not chunk:
+                break
+            self._source_pos += len(chunk)
+            self.data += self._inflater.decompress(chunk)
+        if size < 0 or len(self.data) < end:
+            raise ValueError('OSG二进制流不完整')
+
+    def unpack(self, fmt):
+        layout = struct.Struct(self.byte_order + fmt)
+        self._ensure(layout.size)
+        values = layout.unpack_from(self.data, self.pos)
+        self.pos += layout.size
+        return values
+
+    def flag(self):
+        return self.unpack('?')[0]
+
+    def uint(self):
+        return self.unpack('I')[0]
+
+    def string(self):
+        size = self.unpack('i')[0]
+        self._ensure(size)
+        value = bytes(self.data[self.pos:self.pos + size])
+        self.pos += size
+        return value
+
+    def skip(self, size):
+        self._ensure(size)
+        self.pos += size
+
+    def begin_block(self):
+        """
+        读取BEGIN_BRACKET，启用二进制括号时返回块的结束位置，否则返回None
+        """
+        if not self.brackets:
+            return None
+        start = self.pos
+        size = self.unpack('q' if self.version > _INT64_BRACKET_VERSION else 'i')[0]
+        return start + size
+
+    def seek(self, end):
+        """
+        跳到块的结束位置；没有记录块大小时无法跳过未知内容
+        """
+        if end is None:
+            raise ValueError('OSG二进制流没有记录块大小，无法跳过对象')
+        self.skip(end - self.pos)
+
+    def skip_object_field(self):
+        """
+        跳过一个对象字段（ObjectSerializer：bool加对象）
+        """
+        if self.flag():
+            name = self.string()
+            if name != b'NULL':
+                self.seek(self.begin_block())
+
+
+def _open_stream(data):
+    """
+    解析文件头（魔数、文件类型、版本、属性位、自定义域、压缩方式与schema），返回位于根对象处的读取器
+    """
+    if struct.unpack_from('<II', data, 0) == (OSG_HEADER_LOW, OSG_HEADER_HIGH):
+        stream = _OsgbStream(data, '<')
+    elif struct.unpack_from('>II', data, 0) == (OSG_HEADER_LOW, OSG_HEADER_HIGH):
+        stream = _OsgbStream(data, '>')
+    else:
+        raise ValueError('不是OSG二进制文件')
+    stream.pos = 8
+    write_type, stream.version = stream.unpack('II')
+    if write_type not in _WRITE_TYPES:
+        raise ValueError(f'不支持的OSG文件类型: {write_type}')
+    attributes = stream.uint() if stream.version >= _ATTRIBUTES_VERSION else 0
+    stream.brackets = bool(attributes & _ATTR_BRACKETS)
+    if attributes & _ATTR_DOMAINS:
+        for _ in range(stream.uint()):
+            stream.string()
+            stream.unpack('i')
+    compressor = stream.string()
+    if compressor == b'zlib':
+        stream.inflate()
+    elif compressor != b'0':
+        raise ValueError(f'不支持的压缩方式: {compressor!r}')
+    if attributes & _ATTR_SCHEMA:
+        stream.string()
+    return stream
+
+
+def _sphere_box(center_x, center_y, center_z, radius):
+    """
+    包围球的水平范围，半径为负（无效的包围球）时返回None
+    """
+    if radius < 0:
+        return None
+    return center_x - radius, center_y - radius, center_x + radius, center_y + radius
+
+
+def _union(a, b):
+    if a is None or b is None:
+        return None
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def _children_box(stream):
+    """
+    osg::Group的Children字段，返回所有子节点范围的并集；有子节点的范围无法确定时返回None，但仍读完全部子节点
+    """
+    if not stream.flag():
+        return _EMPTY_BOX
+    count = stream.uint()
+    stream.begin_block()
+    box = _EMPTY_BOX
+    for _ in range(count):
+        box = _union(box, _node_box(stream, nested=True))
+    return box
+
+
+def _paged_children_box(stream):
+    """
+    从RangeMode开始读到osg::PagedLOD的Children字段，返回子节点范围的并集
+    """
+    # 1. osg::LOD：RangeMode、RangeList
+    stream.unpack('i')
+    if stream.flag():
+        count = stream.uint()
+        stream.begin_block()
+        stream.skip(count * 8)
+    # 2. osg::PagedLOD：DatabasePath、FrameNumberOfLastTraversal、NumChildrenThatCannotBeExpired、
+    # DisableExternalChildrenPaging、RangeDataList（文件名与PriorityList）
+    if stream.flag() and stream.flag():
+        stream.string()
+    if stream.version < _FRAME_NUMBER_REMOVED_VERSION:
+        stream.uint()
+    stream.unpack('I?')
+    if stream.flag():
+        count = stream.uint()
+        stream.begin_block()
+        for _ in range(count):
+            stream.string()
+        count = stream.uint()
+        stream.begin_block()
+        stream.skip(count * 8)
+    return _children_box(stream)
+
+
+def _node_fields(stream, class_name):
+    """
+    按关联类的顺序读取Group/LOD/PagedLOD的字段，返回节点范围，无法确定时返回None
+    与osg::Node::getBound一致：InitialBound与节点自身计算的范围求并集；
+    LOD使用USER_DEFINED_CENTER时为用户中心点与半径，否则为子节点范围（UNION模式再并上用户中心点）
+    """
+    # 1. osg::Object：Name、DataVariance、UserDataContainer
+    stream.string()
+    stream.unpack('i')
+    stream.skip_object_field()
+
+    # 2. osg::Node：InitialBound、四个回调、CullingActive、NodeMask、Descriptions（旧版本）、StateSet
+    initial = _EMPTY_BOX
+    if stream.flag():
+        stream.begin_block()
+        initial = _sphere_box(*stream.unpack('4d')) or _EMPTY_BOX
+    for _ in range(4):
+        stream.skip_object_field()
+    stream.unpack('?I')
+    if stream.version < _DESCRIPTIONS_REMOVED_VERSION and stream.flag():
+        count = stream.uint()
+        stream.begin_block()
+        for _ in range(count):
+            stream.string()
+    stream.skip_object_field()
+    if class_name == _GROUP_CLASS:
+        return _union(initial, _children_box(stream))
+
+    # 3. osg::LOD的关联类包含osg::Group，子节点位于中心点之前；osg::PagedLOD不记录Group的子节点，
+    # 它的子节点在自身字段的最后，只在用户中心点不能直接确定范围时才读到那里
+    children = _children_box(stream) if class_name == _LOD_CLASS else None
+    center_mode = stream.unpack('i')[0]
+    user = _sphere_box(*stream.unpack('4d')) if stream.flag() else None
+    if center_mode == _USER_DEFINED_CENTER and user is not None:
+        return _union(initial, user)
+    if class_name == _PAGED_LOD_CLASS:
+        children = _paged_children_box(stream)
+    if center_mode == _UNION_OF_BOUNDING_SPHERE_AND_USER_DEFINED and user is not None:
+        children = _union(children, user)
+    return _union(initial, children)
+
+
+def _node_box(stream, nested):
+    """
+    读取位于类名处的一个节点对象，返回局部坐标下的水平范围，无法确定时返回None
+    nested为True时读取完成后跳到对象末尾（需要块大小），根节点读到范围即可停止
+    """
+    class_name = stream.string()
+    if class_name == b'NULL':
+        return _EMPTY_BOX
+    end = stream.begin_block()
+    object_id = stream.uint()
+    if object_id in stream.boxes:
+        box = stream.boxes[object_id]
+    elif class_name in _NODE_CLASSES:
+        box = stream.boxes[object_id] = _node_fields(stream, class_name)
+    else:
+        box = stream.boxes[object_id] = None
+    if nested or class_name not in _NODE_CLASSES:
+        stream.seek(end)
+    return box
+
+
+def read_root_bound(osgb_file):
+    """
+    以内存映射方式读取OSGB根节点文件，按OSG二进制格式逐个字段解析根节点的包围球，
+    只访问文件头、根节点字段与需要跳过的子节点块大小所在的页，不加载网格与纹理
+
+    支持根节点为osg::PagedLOD、osg::LOD（子节点位于中心点之前，依靠块大小跳过）以及包含这些节点的osg::Group，
+    支持zlib压缩的文件（按需解压）
+
+    返回局部坐标下的包围盒 (min_x, min_y, max_x, max_y)；
+    文件不存在、不是OSG二进制格式、范围依赖几何数据（例如以包围球中心为LOD中心），或包围球无效时返回None
+    """
+    try:
+        with open(osgb_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            box = _node_box(_open_stream(data), nested=False)
+    except (OSError, ValueError, struct.error, zlib.error):
+        return None
+    if box is None or not all(math.isfinite(v) and abs(v) <= _MAX_ABS_COORD for v in box):
+        return None
+    if box[0] >= box[2] or box[1] >= box[3]:
+        return None
+    return box
+
+
+def read_tile_bounds(tile_paths, srs_origin=None, workers=8):
+    """
+    在线程池中批量读取瓦片根节点包围盒，并按SRSOrigin偏移到实际坐标
+
+    返回 (min_x, min_y, max_x, max_y, valid)，读取失败的瓦片valid为False，坐标为NaN
+    """
+    count = len(tile_paths)
+    bounds = np.full((count, 4), np.nan, dtype=np.float64)
+    offset_x, offset_y = (srs_origin[0], srs_origin[1]) if srs_origin else (0.0, 0.0)
+    osgb_files = (root_osgb_path(tile_path) for tile_path in tile_paths)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for i, bound in enumerate(bounded_map(executor, read_root_bound, osgb_files, max(1, workers) * 4)):
+            if bound is not None:
+                bounds[i] = bound
+    valid = ~np.isnan(bounds[:, 0])
+    return (bounds[:, 0] + offset_x, bounds[:, 1] + offset_y,
+            bounds[:, 2] + offset_x, bounds[:, 3] + offset_y, valid)
@@ -0,0 +1,287 @@
+import argparse
+import json
+import math
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+
+# 索引文件格式：
+# 文件头 (64字节): 魔数、版本、节点容量、瓦片数、层数、元数据JSON字节数、名称字节数
+# 各层节点数 (层数 x uint64，第0层为瓦片)
+# 各层包围盒 (节点总数 x 4 x float64，按层从瓦片到根依次存放)
+# 要素编号 (瓦片数 x int64)
+# 名称偏移 ((瓦片数 + 1) x uint64) 与 UTF-8 名称数据
+# 元数据JSON（坐标系统、瓦片数据目录）
+INDEX_MAGIC = b'OSGBTIDX'
+INDEX_VERSION = 1
+_HEADER = struct.Struct('<8sIIQIQQ')
+_HEADER_SIZE = 64
+DEFAULT_NODE_SIZE = 16
+
+
+def index_path(output_file):
+    """
+    空间索引文件路径：与输出文件同目录的 <输出名>_tiles.idx
+    """
+    return f'{os.path.splitext(output_file)[0]}_tiles.idx'
+
+
+def _str_order(boxes, node_size):
+    """
+    Sort-Tile-Recursive排序：先按中心X分为若干竖条，每个竖条内再按中心Y排序
+    """
+    count = len(boxes)
+    leaf_nodes = math.ceil(count / node_size)
+    slices = max(1, math.ceil(math.sqrt(leaf_nodes)))
+    center_x = (boxes[:, 0] + boxes[:, 2]) / 2
+    center_y = (boxes[:, 1] + boxes[:, 3]) / 2
+    rank_x = np.empty(count, dtype=np.int64)
+    rank_x[np.argsort(center_x, kind='stable')] = np.arange(count)
+    slice_id = rank_x // (slices * node_size)
+    return np.lexsort((center_y, slice_id))
+
+
+def _pack_levels(leaf_boxes, node_size):
+    """
+    自底向上每node_size个节点合并为一个父节点，返回从瓦片层到根的各层包围盒列表
+    """
+    levels = [leaf_boxes]
+    while len(levels[-1]) > 1:
+        boxes = levels[-1]
+        starts = np.arange(0, len(boxes), node_size)
+        parent = np.empty((len(starts), 4), dtype=np.float64)
+        parent[:, 0] = np.minimum.reduceat(boxes[:, 0], starts)
+        parent[:, 1] = np.minimum.reduceat(boxes[:, 1], starts)
+        parent[:, 2] = np.maximum.reduceat(boxes[:, 2], starts)
+        parent[:, 3] = np.maximum.reduceat(boxes[:, 3], starts)
+        levels.append(parent)
+    return levels
+
+
+def build_index(names, ids, boxes, epsg=None, tile_data_folder=None, node_size=DEFAULT_NODE_SIZE):
+    """
+    在内存中构建瓦片范围的打包R树（STR），返回与load_index结构相同的索引字典，可直接用于query_bbox查询
+
+    参数:
+    - names: 瓦片文件夹名称列表
+    - ids: 对应的输出要素编号
+    - boxes: (N, 4) 瓦片包围盒 (min_x, min_y, max_x, max_y)，坐标系统与输出文件一致
+    - epsg: 包围盒的坐标系统EPSG代码
+    - tile_data_folder: 瓦片数据目录，查询时可用于输出完整路径
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(boxes):
+        order = _str_order(boxes, node_size)
+        levels = _pack_levels(boxes[order], node_size)
+    else:
+        order = np.empty(0, dtype=np.int64)
+        levels = [boxes]
+    encoded = [names[i].encode('utf-8') for i in order]
+    name_offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    name_offsets[1:] = np.cumsum([len(name) for name in encoded], dtype=np.uint64)
+    return {
+        'node_size': node_size,
+        'count': len(encoded),
+        'levels': levels,
+        'ids': ids[order],
+        'name_offsets': name_offsets,
+        'names_blob': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        'epsg': epsg,
+        'tile_data_folder': tile_data_folder,
+    }
+
+
+def save_index(path, names, ids, boxes, epsg=None, tile_data_folder=None, node_size=DEFAULT_NODE_SIZE):
+    """
+    构建并保存瓦片范围的打包R树（STR）索引，参数同build_index
+    """
+    index = build_index(names, ids, boxes, epsg, tile_data_folder, node_size)
+    levels = index['levels']
+    name_blob = index['names_blob'].tobytes()
+    meta = json.dumps({'epsg': epsg, 'tile_data_folder': tile_data_folder}, ensure_ascii=False).encode('utf-8')
+
+    # 先写临时文件再替换，避免查询进程读到写了一半的索引
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        header = _HEADER.pack(INDEX_MAGIC, INDEX_VERSION, node_size, index['count'], len(levels), len(meta),
+                              len(name_blob))
+        f.write(header.ljust(_HEADER_SIZE, b'\x00'))
+        f.write(np.array([len(level) for level in levels], dtype=np.uint64).tobytes())
+        for level in levels:
+            f.write(np.ascontiguousarray(level, dtype='<f8').tobytes())
+        f.write(index['ids'].astype('<i8').tobytes())
+        f.write(index['name_offsets'].astype('<u8').tobytes())
+        f.write(name_blob)
+        f.write(meta)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_index(path):
+    """
+    以内存映射方式打开索引文件，不读取或重建树结构，只在查询时访问需要的节点
+
+    返回索引字典 {'node_size', 'count', 'levels', 'ids', 'name_offsets', 'names_blob', 'epsg', 'tile_data_folder'}
+    文件格式不正确时抛出ValueError
+    """
+    mm = np.memmap(path, dtype=np.uint8, mode='r')
+    if len(mm) < _HEADER_SIZE:
+        raise ValueError(f'不是有效的瓦片索引文件: {path}')
+    magic, version, node_size, count, level_count, meta_size, names_size = _HEADER.unpack_from(mm, 0)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        raise ValueError(f'不是有效的瓦片索引文件或版本不受支持: {path}')
+    offset = _HEADER_SIZE
+    level_sizes = np.frombuffer(mm, dtype='<u8', count=level_count, offset=offset).astype(np.int64)
+    offset += 8 * level_count
+    levels = []
+    for size in level_sizes:
+        levels.append(np.frombuffer(mm, dtype='<f8', count=int(size) * 4, offset=offset).reshape(-1, 4))
+        offset += int(size) * 32
+    ids = np.frombuffer(mm, dtype='<i8', count=count, offset=offset)
+    offset += 8 * count
+    name_offsets = np.frombuffer(mm, dtype='<u8', count=count + 1, offset=offset)
+    offset += 8 * (count + 1)
+    names_blob = mm[offset:offset + names_size]
+    offset += names_size
+    meta = json.loads(bytes(mm[offset:offset + meta_size]).decode('utf-8'))
+    return {
+        'node_size': node_size,
+        'count': count,
+        'levels': levels,
+        'ids': ids,
+        'name_offsets': name_offsets,
+        'names_blob': names_blob,
+        'epsg': meta.get('epsg'),
+        'tile_data_folder': meta.get('tile_data_folder'),
+    }
+
+
+def index_names(index, positions):
+    """
+    按瓦片在索引中的位置解码瓦片文件夹名称
+    """
+    offsets = index['name_offsets']
+    blob = index['names_blob']
+    return [bytes(blob[int(offsets[i]):int(offsets[i + 1])]).decode('utf-8') for i in positions]
+
+
+def query_bbox(index, bbox, strict=False):
+    """
+    查询与矩形范围 (min_x, min_y, max_x, max_y) 相交的瓦片
+
+    从根节点逐层向下，每层对候选节点的所有子节点做一次向量化的相交判断；
+    strict为True时排除只与查询范围边界接触的瓦片（例如与宗地共边的相邻瓦片）
+    返回瓦片在索引中的位置数组
+    """
+    levels = index['levels']
+    node_size = index['node_size']
+    if index['count'] == 0:
+        return np.empty(0, dtype=np.int64)
+    min_x, min_y, max_x, max_y = bbox
+
+    def intersects(boxes):
+        return (boxes[:, 0] <= max_x) & (boxes[:, 2] >= min_x) & (boxes[:, 1] <= max_y) & (boxes[:, 3] >= min_y)
+
+    candidates = np.nonzero(intersects(levels[-1]))[0]
+    for level in reversed(levels[:-1]):
+        if len(candidates) == 0:
+            break
+        children = (candidates[:, None] * node_size + np.arange(node_size)).ravel()
+        children = children[children < len(level)]
+        candidates = children[intersects(level[children])]
+    if strict and len(candidates):
+        boxes = levels[0][candidates]
+        candidates = candidates[(boxes[:, 0] < max_x) & (boxes[:, 2] > min_x)
+                                & (boxes[:, 1] < max_y) & (boxes[:, 3] > min_y)]
+    return candidates
+
+
+def query_geometry(index, geometry):
+    """
+    查询与任意几何对象（宗地、AOI多边形等）相交的瓦片：先按外包矩形查询索引，再对候选瓦片做精确相交判断，
+    只与几何对象边界接触的瓦片不计入
+    """
+    import shapely
+
+    candidates = query_bbox(index, geometry.bounds)
+    if len(candidates) == 0:
+        return candidates
+    boxes = index['levels'][0][candidates]
+    tile_boxes = shapely.box(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3])
+    shapely.prepare(geometry)
+    return candidates[shapely.intersects(geometry, tile_boxes) & ~shapely.touches(geometry, tile_boxes)]
+
+
+def _read_aoi(aoi_file, index_epsg):
+    """
+    读取AOI多边形文件（任意GDAL支持的矢量格式），合并为一个几何对象并转换到索引坐标系统
+    """
+    import geopandas as gpd
+    import shapely
+
+    aoi = gpd.read_file(aoi_file, engine='pyogrio')
+    if aoi.crs is not None and index_epsg:
+        aoi = aoi.to_crs(f'EPSG:{index_epsg}')
+    return shapely.union_all(aoi.geometry.values)
+
+
+def query_main(argv=None):
+    """
+    query子命令：查询覆盖指定范围或AOI多边形的瓦片文件夹，每行输出一个名称
+    """
+    parser = argparse.ArgumentParser(prog='osgb2shp.py query', description='查询覆盖指定范围的OSGB瓦片文件夹')
+    parser.add_argument('index', help='瓦片索引文件（<输出名>_tiles.idx），或提取时使用的输出文件路径')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--bbox', '-b', type=float, nargs=4, metavar=('MIN_X', 'MIN_Y', 'MAX_X', 'MAX_Y'),
+                        help='查询范围')
+    target.add_argument('--aoi', '-a', help='AOI多边形文件（.shp / .gpkg / .geojson等），自动转换到索引坐标系统')
+    parser.add_argument('--bbox-epsg', '-be', type=int, help='--bbox的坐标系统EPSG代码，默认与索引相同')
+    parser.add_argument('--full-path', '-fp', action='store_true', help='输出瓦片文件夹的完整路径')
+    parser.add_argument('--output', '-o', help='将结果写入文本文件，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    path = args.index
+    if not path.endswith('.idx'):
+        # 传入的是输出文件路径时，按提取工具的输出文件夹规则定位索引
+        output_folder = os.path.splitext(path)[0]
+        path = index_path(os.path.join(output_folder, os.path.basename(path)))
+    start = time.perf_counter()
+    index = load_index(path)
+    load_seconds = time.perf_counter() - start
+    # 读取AOI文件或转换查询范围的坐标系统需要加载geopandas/pyproj，不计入查询耗时
+    if args.bbox:
+        bbox = tuple(args.bbox)
+        if args.bbox_epsg and index['epsg'] and args.bbox_epsg != index['epsg']:
+            from osgb_reproject import get_transformer, transform_extent
+            bbox = transform_extent(bbox, get_transformer(args.bbox_epsg, index['epsg']))
+        # 有面积的查询范围排除只接触边界的瓦片，点或线状范围保留接触的瓦片
+        strict = bbox[2] > bbox[0] and bbox[3] > bbox[1]
+        start = time.perf_counter()
+        positions = query_bbox(index, bbox, strict)
+    else:
+        aoi = _read_aoi(args.aoi, index['epsg'])
+        start = time.perf_counter()
+        positions = query_geometry(index, aoi)
+    names = index_names(index, np.sort(positions))
+    if args.full_path and index['tile_data_folder']:
+        names = [os.path.join(index['tile_data_folder'], name) for name in names]
+    query_seconds = time.perf_counter() - start
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(''.join(f'{name}\n' for name in names))
+    else:
+        for name in names:
+            print(name)
+    print(f'共 {index["count"]} 个瓦片，匹配 {len(names)} 个，加载索引 {load_seconds * 1000:.1f} 毫秒，'
+          f'查询 {query_seconds * 1000:.1f} 毫秒', file=sys.stderr)
+    return names
+
+
+if __name__ == '__main__':
+    query_main()
@@ -0,0 +1,123 @@
+import glob
+import importlib.util
+import os
+import time
+from functools import lru_cache
+
+
+# 输出文件扩展名与格式的对应关系
+OUTPUT_FORMATS = {
+    '.shp': 'ESRI Shapefile',
+    '.gpkg': 'GPKG',
+    '.fgb': 'FlatGeobuf',
+    '.parquet': 'GeoParquet',
+    '.geoparquet': 'GeoParquet',
+}
+
+# 支持直接追加要素的格式
+APPENDABLE_FORMATS = ('ESRI Shapefile', 'GPKG')
+
+
+@lru_cache(maxsize=None)
+def has_pyarrow():
+    """
+    是否安装了pyarrow；只查找模块而不导入，避免在启动时加载pyarrow
+    """
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def output_format(output_file):
+    """
+    根据输出文件扩展名推断输出格式
+    """
+    ext = os.path.splitext(output_file)[1].lower()
+    if ext not in OUTPUT_FORMATS:
+        raise ValueError(f'不支持的输出格式: {ext or "(无扩展名)"}，支持: {", ".join(sorted(OUTPUT_FORMATS))}')
+    return OUTPUT_FORMATS[ext]
+
+
+def _output_size(output_file, fmt):
+    """
+    输出文件占用的字节数，Shapefile包含同名的.shx/.dbf/.prj等附属文件
+    """
+    if fmt == 'ESRI Shapefile':
+        stem = os.path.splitext(output_file)[0]
+        files = [path for path in glob.glob(f'{glob.escape(stem)}.*')
+                 if os.path.splitext(path)[1].lower() in ('.shp', '.shx', '.dbf', '.prj', '.cpg')]
+    else:
+        files = [output_file]
+    return sum(os.path.getsize(path) for path in files if os.path.exists(path))
+
+
+def write_geodataframe(gdf, output_file, append=False):
+    """
+    按输出文件扩展名写出GeoDataFrame，并返回写出统计
+
+    - .shp / .gpkg / .fgb 通过pyogrio写出，安装了pyarrow时使用Arrow批量写入
+    - .fgb 同时生成FlatGeobuf自带的空间索引
+    - .parquet / .geoparquet 写出GeoParquet（需要pyarrow）
+    - append为True时追加到已有文件，仅Shapefile与GeoPackage支持
+
+    返回字典 {'format', 'features', 'bytes', 'seconds', 'arrow'}
+    """
+    fmt = output_format(output_file)
+    if append and fmt not in APPENDABLE_FORMATS:
+        raise ValueError(f'{fmt} 格式不支持追加写入')
+    start = time.perf_counter()
+    if fmt == 'GeoParquet':
+        if not has_pyarrow():
+            raise ImportError('写出GeoParquet需要安装pyarrow: pip install pyarrow')
+        gdf.to_parquet(output_file)
+    else:
+        kwargs = {'driver': fmt, 'engine': 'pyogrio', 'use_arrow': has_pyarrow()}
+        if append:
+            kwargs['mode'] = 'a'
+        if fmt == 'FlatGeobuf':
+            kwargs['SPATIAL_INDEX'] = 'YES'
+        if not len(gdf) and not append:
+            # 空图层无法推断几何类型，按本工具的输出（瓦片范围与边界多边形）声明为Polygon，之后追加的多边形类型一致
+            kwargs['geometry_type'] = 'Polygon'
+        gdf.to_file(output_file, **kwargs)
+    seconds = time.perf_counter() - start
+    return {
+        'format': fmt,
+        'features': len(gdf),
+        'bytes': _output_size(output_file, fmt),
+        'seconds': seconds,
+        'arrow': fmt == 'GeoParquet' or has_pyarrow(),
+    }
+
+
+def merge_write_info(total, write_info):
+    """
+    累加分块写出的统计：要素数与耗时求和，文件大小取最后一次写出后的大小
+    """
+    if total is None:
+        return dict(write_info)
+    total['features'] += write_info['features']
+    total['seconds'] += write_info['seconds']
+    total['bytes'] = write_info['bytes']
+    return total
+
+
+def read_geodataframe(output_file):
+    """
+    读取write_geodataframe写出的文件
+    """
+    import geopandas as gpd
+
+    if output_format(output_file) == 'GeoParquet':
+        return gpd.read_parquet(output_file)
+    return gpd.read_file(output_file, engine='pyogrio', use_arrow=has_pyarrow())
+
+
+def format_write_report(write_info):
+    """
+    将写出统计格式化为一行文本，包含写出吞吐量
+    """
+    seconds = max(write_info['seconds'], 1e-9)
+    return (f'{write_info["format"]}，{write_info["features"]} 个要素，'
+            f'{write_info["bytes"] / 1024 / 1024:.2f} MB，耗时 {write_info["seconds"]:.3f} 秒，'
+            f'{write_info["features"] / seconds:.0f} 要素/秒，'
+            f'{write_info["bytes"] / 1024 / 1024 / seconds:.2f} MB/秒'
+            f'{"（Arrow批量写入）" if write_info["arrow"] else ""}')
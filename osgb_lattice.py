@@ -0,0 +1,322 @@
+import numpy as np
+import shapely
+from shapely.geometry import MultiPolygon, Polygon
+
+
+# 单位边方向：东、北、西、南
+_DX = np.array([1, 0, -1, 0], dtype=np.int64)
+_DY = np.array([0, 1, 0, -1], dtype=np.int64)
+
+# 位图单元数不超过 max(MIN_GRID_CELLS, 瓦片数 x MAX_GRID_CELLS_PER_TILE) 时直接栅格化整体范围；
+# 超过时（编号相距很远的稀疏瓦片）先按8邻接拆分连通块，每个连通块只栅格化自身的范围
+MIN_GRID_CELLS = 1 << 22
+MAX_GRID_CELLS_PER_TILE = 16
+
+
+def _split_pinched_ring(ring):
+    """
+    在重复经过的顶点处拆分环，保证输出的每个环都不自相接触
+    （孔洞与外环在一个角点相接时，GEOS同样输出为外环加孔洞）
+    """
+    if len(set(ring)) == len(ring):
+        return [ring]
+    rings = []
+    stack = []
+    position = {}
+    for vertex in ring:
+        if vertex in position:
+            start = position[vertex]
+            loop = stack[start:]
+            for v in loop[1:]:
+                del position[v]
+            rings.append(loop)
+            del stack[start + 1:]
+        else:
+            position[vertex] = len(stack)
+            stack.append(vertex)
+    if stack:
+        rings.append(stack)
+    return rings
+
+
+def _grid_cells(xs, ys):
+    """
+    栅格化xs, ys的范围（四周各留一格空白）所需的位图单元数
+    """
+    return (int(xs.max()) - int(xs.min()) + 3) * (int(ys.max()) - int(ys.min()) + 3)
+
+
+def _grid_fits(xs, ys):
+    return _grid_cells(xs, ys) <= max(MIN_GRID_CELLS, len(xs) * MAX_GRID_CELLS_PER_TILE)
+
+
+def trace_lattice_outline(xs, ys):
+    """
+    将整数格网上的单位瓦片直接描边为合并后的多边形，等价于对所有单位正方形执行unary_union
+    先把(x, y)编号栅格化为紧凑的位图，再在线性时间内追踪所有外环和孔洞
+
+    位图大小由编号范围决定；范围远大于瓦片数时（例如两个相距很远的测区），先按8邻接拆分连通块，
+    每个连通块只栅格化自身的范围，连通块自身仍然过于稀疏（例如沿对角线分布的瓦片）时改用shapely合并该连通块。
+    8邻接的不同连通块互不接触（角点也不相接），各自的结果直接组合即可
+
+    参数:
+    - xs, ys: 瓦片左下角的整数坐标数组，瓦片范围为 [x, x+1] x [y, y+1]
+
+    返回:
+    - 只有一个连通块时返回Polygon，否则返回MultiPolygon（与unary_union的返回类型一致）
+    """
+    xs = np.asarray(xs, dtype=np.int64)
+    ys = np.asarray(ys, dtype=np.int64)
+    if len(xs) == 0:
+        return MultiPolygon()
+    if _grid_fits(xs, ys):
+        polygons = _trace_grid(xs, ys)
+    else:
+        from osgb_tiles import box_polygons
+
+        labels, count = label_lattice_blocks(xs, ys, connectivity=8)
+        order = np.argsort(labels, kind='stable')
+        boundaries = np.searchsorted(labels[order], np.arange(1, count))
+        polygons = []
+        for group in np.split(order, boundaries):
+            block_xs = xs[group]
+            block_ys = ys[group]
+            if _grid_fits(block_xs, block_ys):
+                polygons.extend(_trace_grid(block_xs, block_ys))
+            else:
+                merged = shapely.union_all(box_polygons(block_xs, block_ys, block_xs + 1, block_ys + 1))
+                polygons.extend(shapely.get_parts(merged).tolist())
+    if len(polygons) == 1:
+        return polygons[0]
+    return MultiPolygon(polygons)
+
+
+def _trace_grid(xs, ys):
+    """
+    栅格化xs, ys的整体范围并描边，返回多边形列表
+    """
+    # 1. 栅格化为四周各留一格空白的位图
+    x0 = int(xs.min())
+    y0 = int(ys.min())
+    width = int(xs.max()) - x0 + 3
+    height = int(ys.max()) - y0 + 3
+    grid = np.zeros((height, width), dtype=bool)
+    grid[ys - y0 + 1, xs - x0 + 1] = True
+
+    # 2. 找出所有边界单位边，方向保证有瓦片的一侧在左边（外环逆时针，孔洞顺时针）
+    inner = grid[1:-1, 1:-1]
+    edge_x = []
+    edge_y = []
+    edge_d = []
+    for direction, (neighbor, dx, dy) in enumerate([
+        (grid[:-2, 1:-1], 0, 0),  # 下边，由(x, y)向东
+        (grid[1:-1, 2:], 1, 0),   # 右边，由(x+1, y)向北
+        (grid[2:, 1:-1], 1, 1),   # 上边，由(x+1, y+1)向西
+        (grid[1:-1, :-2], 0, 1),  # 左边，由(x, y+1)向南
+    ]):
+        cy, cx = np.nonzero(inner & ~neighbor)
+        edge_x.append(cx + 1 + dx)
+        edge_y.append(cy + 1 + dy)
+        edge_d.append(np.full(len(cx), direction, dtype=np.int64))
+    edge_x = np.concatenate(edge_x)
+    edge_y = np.concatenate(edge_y)
+    edge_d = np.concatenate(edge_d)
+
+    # 3. 计算每条边的后继边：在对角相接的角点处优先左转，使对角相接的瓦片分属不同的环
+    stride = width + 1
+    start_vertex = edge_y * stride + edge_x
+    end_vertex = (edge_y + _DY[edge_d]) * stride + (edge_x + _DX[edge_d])
+    keys = start_vertex * 4 + edge_d
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    successor = np.full(len(keys), -1, dtype=np.int64)
+    for turn in (1, 0, 3):
+        pending = successor < 0
+        wanted = end_vertex[pending] * 4 + (edge_d[pending] + turn) % 4
+        found = np.searchsorted(sorted_keys, wanted)
+        found[found >= len(sorted_keys)] = 0
+        hit = sorted_keys[found] == wanted
+        idx = np.nonzero(pending)[0][hit]
+        successor[idx] = order[found[hit]]
+
+    # 4. 沿后继关系追踪所有闭合环
+    successor = successor.tolist()
+    start_vertex = start_vertex.tolist()
+    visited = bytearray(len(successor))
+    rings = []
+    for first in range(len(successor)):
+        if visited[first]:
+            continue
+        ring = []
+        edge = first
+        while not visited[edge]:
+            visited[edge] = 1
+            ring.append(start_vertex[edge])
+            edge = successor[edge]
+        rings.extend(_split_pinched_ring(ring))
+
+    # 5. 按环方向区分外环与孔洞，并换算回原始瓦片坐标
+    shells = []
+    holes = []
+    for ring in rings:
+        vertices = np.asarray(ring, dtype=np.int64)
+        coords = np.empty((len(vertices) + 1, 2), dtype=np.float64)
+        coords[:-1, 0] = vertices % stride - 1 + x0
+        coords[:-1, 1] = vertices // stride - 1 + y0
+        coords[-1] = coords[0]
+        x = coords[:, 0]
+        y = coords[:, 1]
+        signed_area = np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])
+        if signed_area > 0:
+            shells.append(coords)
+        else:
+            holes.append(coords)
+
+    # 6. 将每个孔洞分配给包含它的最小外环
+    shell_holes = [[] for _ in shells]
+    if holes:
+        shell_polygons = np.array([Polygon(shell) for shell in shells])
+        shell_areas = shapely.area(shell_polygons)
+        # 孔洞第一条边左侧的瓦片中心必然属于包含该孔洞的连通块
+        probes = []
+        for coords in holes:
+            (ax, ay), (bx, by) = coords[0], coords[1]
+            probes.append(((ax + bx) / 2 - (by - ay) / 2, (ay + by) / 2 + (bx - ax) / 2))
+        tree = shapely.STRtree(shell_polygons)
+        probe_idx, shell_idx = tree.query(shapely.points(probes), predicate='within')
+        best_shell = np.full(len(holes), -1, dtype=np.int64)
+        best_area = np.full(len(holes), np.inf)
+        for p, s in zip(probe_idx.tolist(), shell_idx.tolist()):
+            if shell_areas[s] < best_area[p]:
+                best_area[p] = shell_areas[s]
+                best_shell[p] = s
+        for coords, s in zip(holes, best_shell.tolist()):
+            shell_holes[s].append(coords)
+
+    return [Polygon(shell, hole_list) for shell, hole_list in zip(shells, shell_holes)]
+
+
+def label_lattice_blocks(xs, ys, connectivity=4):
+    """
+    标记整数格网上瓦片的连通块，直接在行列号上执行并查集，不需要栅格化为位图
+    邻接瓦片通过排序键的二分查找定位；并查集按“较大的根挂到较小的根上”合并，再以指针跳跃压缩路径，
+    每一轮都对所有边批量执行，总耗时接近线性
+
+    参数:
+    - xs, ys: 瓦片的整数坐标数组
+    - connectivity: 4为上下左右相邻才连通，8时对角相接的瓦片也连通
+
+    返回:
+    - labels: 每个瓦片所属连通块的编号（0开始，按块内最小的(x, y)排序）
+    - count: 连通块数
+    """
+    if connectivity not in (4, 8):
+        raise ValueError(f'连通方式只能为4或8: {connectivity}')
+    xs = np.asarray(xs, dtype=np.int64)
+    ys = np.asarray(ys, dtype=np.int64)
+    count = len(xs)
+    if count == 0:
+        return np.empty(0, dtype=np.int64), 0
+
+    # 1. 编码为排序后的整数键，Y方向两侧各留一格，保证相邻编码不会跨列
+    span = int(ys.max()) - int(ys.min()) + 3
+    keys = (xs - int(xs.min()) + 1) * span + (ys - int(ys.min()) + 1)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    # 2. 找出所有相邻瓦片对（排序后的下标），每对只记录一次
+    offsets = [(1, 0), (0, 1)] + ([(1, 1), (1, -1)] if connectivity == 8 else [])
+    positions = np.arange(count)
+    edge_a = []
+    edge_b = []
+    for dx, dy in offsets:
+        wanted = sorted_keys + dx * span + dy
+        found = np.searchsorted(sorted_keys, wanted)
+        found[found >= count] = 0
+        hit = sorted_keys[found] == wanted
+        edge_a.append(positions[hit])
+        edge_b.append(found[hit])
+    edge_a = np.concatenate(edge_a)
+    edge_b = np.concatenate(edge_b)
+
+    # 3. 并查集：每个节点的父节点下标不大于自身，根节点只会挂到更小的根上，不会形成环
+    parent = positions.copy()
+    while len(edge_a):
+        root_a = parent[edge_a]
+        root_b = parent[edge_b]
+        pending = root_a != root_b
+        # 两端已在同一连通块的边不再参与之后的合并
+        edge_a = edge_a[pending]
+        edge_b = edge_b[pending]
+        if not len(edge_a):
+            break
+        root_a = root_a[pending]
+        root_b = root_b[pending]
+        np.minimum.at(parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    # 4. 根节点即块内最小键的位置，重新编号为连续的块编号并映射回输入顺序
+    roots, sorted_labels = np.unique(parent, return_inverse=True)
+    labels = np.empty(count, dtype=np.int64)
+    labels[order] = sorted_labels
+    return labels, len(roots)
+
+
+def trace_lattice_blocks(xs, ys, labels, count):
+    """
+    对整数格网瓦片描边一次，再把得到的每个多边形按其内部的一个瓦片归入所属连通块
+    4邻接时每个连通块恰好对应一个多边形；8邻接时对角相接的部分组成MultiPolygon
+
+    返回长度为count的几何对象数组，第i个元素为第i个连通块的合并边界
+    """
+    if count == 0:
+        return np.empty(0, dtype=object)
+    xs = np.asarray(xs, dtype=np.int64)
+    ys = np.asarray(ys, dtype=np.int64)
+    parts = shapely.get_parts(trace_lattice_outline(xs, ys))
+
+    # 外环逆时针，第一条边左侧的瓦片必然属于该多边形
+    exteriors = shapely.get_exterior_ring(parts)
+    first = shapely.get_coordinates(shapely.get_point(exteriors, 0))
+    second = shapely.get_coordinates(shapely.get_point(exteriors, 1))
+    direction = second - first
+    probe_x = np.floor((first[:, 0] + second[:, 0]) / 2 - direction[:, 1] / 2).astype(np.int64)
+    probe_y = np.floor((first[:, 1] + second[:, 1]) / 2 + direction[:, 0] / 2).astype(np.int64)
+
+    span = int(ys.max()) - int(ys.min()) + 1
+    keys = (xs - int(xs.min())) * span + (ys - int(ys.min()))
+    order = np.argsort(keys)
+    probe_keys = (probe_x - int(xs.min())) * span + (probe_y - int(ys.min()))
+    part_labels = labels[order[np.searchsorted(keys[order], probe_keys)]]
+
+    # 只有一个部分的连通块直接使用该多边形，其余组合为MultiPolygon
+    part_counts = np.bincount(part_labels, minlength=count)
+    sort = np.argsort(part_labels, kind='stable')
+    geometries = np.empty(count, dtype=object)
+    single = part_counts[part_labels[sort]] == 1
+    geometries[part_labels[sort][single]] = parts[sort][single]
+    multi = ~single
+    if multi.any():
+        multi_labels = np.unique(part_labels[sort][multi])
+        geometries[multi_labels] = shapely.multipolygons(parts[sort][multi],
+                                                         indices=np.searchsorted(multi_labels,
+                                                                                 part_labels[sort][multi]))
+    return geometries
+
+
+def union_lattice_blocks(polygons, labels, count):
+    """
+    按连通块编号分组，对每组多边形执行通用的并集运算（用于不在整数格网上的瓦片范围）
+    """
+    geometries = np.empty(count, dtype=object)
+    if count == 0:
+        return geometries
+    order = np.argsort(labels, kind='stable')
+    boundaries = np.searchsorted(labels[order], np.arange(1, count))
+    for label, group in enumerate(np.split(order, boundaries)):
+        geometries[label] = shapely.union_all(polygons[group])
+    return geometries
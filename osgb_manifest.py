@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+
+from osgb_metadata import locate_metadata
+
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path(output_file):
+    """
+    清单文件与输出文件放在同一目录：<输出文件名>_manifest.json
+    """
+    return f'{os.path.splitext(output_file)[0]}_manifest.json'
+
+
+def hash_metadata(osgb_folder):
+    """
+    计算metadata.xml内容的SHA1摘要，坐标系统或原点变化时用于判断清单失效
+    没有metadata.xml时返回None
+    """
+    if os.path.isfile(osgb_folder):
+        from osgb_archive import read_archive_listing
+        metadata_bytes = read_archive_listing(osgb_folder).metadata_bytes
+        return hashlib.sha1(metadata_bytes).hexdigest() if metadata_bytes is not None else None
+    metadata_path = locate_metadata(osgb_folder)
+    if metadata_path is None:
+        return None
+    digest = hashlib.sha1()
+    with open(metadata_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    """
+    读取清单文件，文件不存在、损坏或版本不匹配时返回None
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(path, params, metadata_hash, names, cols, rows, ids, bounds):
+    """
+    保存清单：瓦片名称、解析出的行列号、输出要素ID、元数据摘要、运行参数与输出范围
+    先写临时文件再替换，避免中断时留下不完整的清单
+    """
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'params': params,
+        'metadata_hash': metadata_hash,
+        'next_id': (int(max(ids)) + 1) if len(ids) else 1,
+        'bounds': [float(v) for v in bounds] if bounds is not None else None,
+        'tiles': {
+            'names': list(names),
+            'cols': [int(v) for v in cols],
+            'rows': [int(v) for v in rows],
+            'ids': [int(v) for v in ids],
+        },
+    }
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def manifest_matches(manifest, params, metadata_hash):
+    """
+    判断清单是否可用于增量更新：运行参数与元数据摘要都必须一致
+    """
+    return (manifest is not None
+            and manifest.get('params') == params
+            and manifest.get('metadata_hash') == metadata_hash)
+
+
+def diff_manifest(manifest, names):
+    """
+    比较当前瓦片列表与清单
+
+    返回:
+    - added: 当前列表中新增瓦片的下标列表
+    - removed_ids: 已删除瓦片在输出中的要素ID列表
+    - kept: 仍然存在的瓦片 {名称: (列号, 行号, 要素ID)}
+    """
+    tiles = manifest['tiles']
+    current = set(names)
+    kept = {}
+    removed_ids = []
+    for name, col, row, feature_id in zip(tiles['names'], tiles['cols'], tiles['rows'], tiles['ids']):
+        if name in current:
+            kept[name] = (col, row, feature_id)
+        else:
+            removed_ids.append(feature_id)
+    added = [i for i, name in enumerate(names) if name not in kept]
+    return added, removed_ids, kept
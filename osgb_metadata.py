@@ -0,0 +1,166 @@
+import os
+import re
+import xml.etree.ElementTree as ET
+
+from osgb_tiles import TILE_PREFIX
+
+
+METADATA_NAME = 'metadata.xml'
+
+_EPSG_PATTERN = re.compile(r'epsg:?(\d+)')
+# WKT中最后一个AUTHORITY["EPSG","xxxx"]对应坐标系本身
+_WKT_AUTHORITY_PATTERN = re.compile(r'AUTHORITY\s*\[\s*"EPSG"\s*,\s*"?(\d+)"?\s*\]\s*\]\s*$', re.IGNORECASE)
+
+# 解析结果缓存：{绝对路径: ((mtime_ns, size), 结果)}
+_metadata_cache = {}
+
+
+def locate_metadata(osgb_folder, max_depth=2):
+    """
+    查找metadata.xml文件路径，先检查已知位置，再进行有限深度的搜索
+
+    查找顺序:
+    1. 输入目录根目录
+    2. 输入目录本身是Data文件夹时，其上一级目录
+    3. 深度不超过max_depth的子目录（跳过Tile_*瓦片文件夹），找到即停止
+    """
+    candidate = os.path.join(osgb_folder, METADATA_NAME)
+    if os.path.isfile(candidate):
+        return candidate
+
+    folder = os.path.abspath(osgb_folder)
+    if os.path.basename(folder).lower() == 'data':
+        candidate = os.path.join(os.path.dirname(folder), METADATA_NAME)
+        if os.path.isfile(candidate):
+            return candidate
+
+    # 逐层搜索，瓦片文件夹中只有LOD文件，不会包含metadata.xml
+    current_level = [osgb_folder]
+    for _ in range(max_depth):
+        next_level = []
+        for parent in current_level:
+            try:
+                with os.scandir(parent) as it:
+                    for entry in it:
+                        if entry.name.startswith(TILE_PREFIX):
+                            continue
+                        if entry.is_dir():
+                            next_level.append(entry.path)
+            except OSError:
+                continue
+        for folder in next_level:
+            candidate = os.path.join(folder, METADATA_NAME)
+            if os.path.isfile(candidate):
+                return candidate
+        current_level = next_level
+    return None
+
+
+def parse_metadata(source):
+    """
+    使用iterparse流式解析metadata.xml，单次遍历同时提取EPSG、SRS/WKT文本和原点坐标
+
+    参数:
+    - source: 文件路径或二进制文件对象
+
+    返回字典 {'epsg': int或None, 'srs': str或None, 'origin': (x, y)或None}
+    匹配规则:
+    - EPSG优先取标签名包含epsg/crs/srs的元素文本，其次取任意元素文本，最后尝试WKT中的AUTHORITY
+    - 原点取标签名包含origin且能解析出两个坐标的最后一个元素
+    """
+    tag_epsg = None
+    text_epsg = None
+    srs_text = None
+    srs_origin = None
+    # 元素按文档先序编号，保证与逐元素遍历的匹配顺序一致
+    order = 0
+    open_elements = []
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            open_elements.append(order)
+            order += 1
+            continue
+        index = open_elements.pop()
+        tag = elem.tag.lower() if isinstance(elem.tag, str) else ''
+        text = elem.text
+        if text and text.strip():
+            lowered = text.lower()
+            match = _EPSG_PATTERN.search(lowered)
+            if match:
+                if text_epsg is None or index < text_epsg[0]:
+                    text_epsg = (index, int(match.group(1)))
+                if any(key in tag for key in ['epsg', 'crs', 'srs']):
+                    if tag_epsg is None or index < tag_epsg[0]:
+                        tag_epsg = (index, int(match.group(1)))
+            if 'origin' in tag:
+                coords = text.split(',')
+                if len(coords) >= 2:
+                    try:
+                        origin = (float(coords[0].strip()), float(coords[1].strip()))
+                        if srs_origin is None or index > srs_origin[0]:
+                            srs_origin = (index, origin)
+                    except ValueError:
+                        pass
+            elif any(key in tag for key in ['srs', 'crs', 'wkt']):
+                if srs_text is None or index < srs_text[0]:
+                    srs_text = (index, text.strip())
+        elem.clear()
+
+    epsg_code = None
+    if tag_epsg:
+        epsg_code = tag_epsg[1]
+    elif text_epsg:
+        epsg_code = text_epsg[1]
+    elif srs_text:
+        match = _WKT_AUTHORITY_PATTERN.search(srs_text[1])
+        if match:
+            epsg_code = int(match.group(1))
+    return {
+        'epsg': epsg_code,
+        'srs': srs_text[1] if srs_text else None,
+        'origin': srs_origin[1] if srs_origin else None,
+    }
+
+
+def read_metadata(metadata_path):
+    """
+    读取并解析metadata.xml，结果按路径和修改时间缓存，文件未变化时直接返回缓存
+    解析失败时返回None
+    """
+    try:
+        st = os.stat(metadata_path)
+    except OSError:
+        return None
+    key = os.path.abspath(metadata_path)
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _metadata_cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+    try:
+        result = parse_metadata(metadata_path)
+    except Exception:
+        result = None
+    _metadata_cache[key] = (signature, result)
+    return result
+
+
+def read_metadata_info(osgb_folder, metadata_path=None):
+    """
+    读取metadata.xml文件中的坐标系统和原点信息
+    输入为zip/tar压缩包时直接从包内读取metadata.xml
+    调用方已经通过locate_metadata找到文件时传入metadata_path，不再重复查找
+    """
+    if os.path.isfile(osgb_folder):
+        from osgb_archive import read_archive_metadata
+        metadata = read_archive_metadata(osgb_folder)
+        if metadata is None:
+            return None, None
+        return metadata['epsg'], metadata['origin']
+    if metadata_path is None:
+        metadata_path = locate_metadata(osgb_folder)
+    if metadata_path is None:
+        return None, None
+    metadata = read_metadata(metadata_path)
+    if metadata is None:
+        return None, None
+    return metadata['epsg'], metadata['origin']
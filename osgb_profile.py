@@ -0,0 +1,135 @@
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def peak_rss_mb():
+    """
+    当前进程的内存峰值（MB），不支持resource模块的平台返回None
+    ru_maxrss在macOS上以字节为单位，在Linux等平台上以KiB为单位
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return max_rss / 1024 / 1024
+    return max_rss / 1024
+
+
+class StageProfiler:
+    """
+    按名称记录各处理阶段的墙钟时间、CPU时间与内存峰值
+
+    未启用时stage()不做任何记录，对处理速度没有影响；
+    启用时使用tracemalloc统计每个阶段的Python内存分配峰值，同名阶段（如流式模式的每个分块）累加统计；
+    阶段不应嵌套
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        # 每个阶段单独开启内存跟踪，阶段结束即停止，阶段之外不产生跟踪开销
+        owns_tracing = not tracemalloc.is_tracing()
+        if owns_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            traced_peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            if owns_tracing:
+                tracemalloc.stop()
+            record = self.stages.setdefault(name, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                                   'traced_peak_mb': 0.0, 'rss_peak_mb': None})
+            record['calls'] += 1
+            record['wall_seconds'] += wall
+            record['cpu_seconds'] += cpu
+            record['traced_peak_mb'] = max(record['traced_peak_mb'], traced_peak)
+            record['rss_peak_mb'] = peak_rss_mb()
+
+    def summary(self, items=None):
+        """
+        返回可写出为JSON的统计：各阶段明细、总耗时，以及按items（瓦片数）计算的吞吐量
+        """
+        wall = time.perf_counter() - self.start
+        stages = {}
+        for name, record in self.stages.items():
+            stages[name] = dict(record)
+            if items and record['wall_seconds'] > 0:
+                stages[name]['tiles_per_second'] = items / record['wall_seconds']
+        return {
+            'enabled': self.enabled,
+            'wall_seconds': wall,
+            'cpu_seconds': time.process_time() - self.cpu_start,
+            'rss_peak_mb': peak_rss_mb(),
+            'tiles_per_second': items / wall if items and wall > 0 else None,
+            'stages': stages,
+        }
+
+
+def format_profile_report(summary):
+    """
+    将阶段统计格式化为多行文本
+    """
+    lines = [f'总耗时 {summary["wall_seconds"]:.3f} 秒，CPU {summary["cpu_seconds"]:.3f} 秒'
+             + (f'，{summary["tiles_per_second"]:.0f} 瓦片/秒' if summary['tiles_per_second'] else '')]
+    for name, record in summary['stages'].items():
+        lines.append(f'  {name}: {record["wall_seconds"]:.3f} 秒（CPU {record["cpu_seconds"]:.3f} 秒，'
+                     f'{record["calls"]} 次，内存分配峰值 {record["traced_peak_mb"]:.1f} MB）')
+    return '\n'.join(lines)
+
+
+class ThrottledPrinter:
+    """
+    按时间间隔限制进度输出：距上一次输出不足interval秒的消息被丢弃，force为True时总是输出
+    """
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self.last = None
+
+    def __call__(self, message, force=False):
+        now = time.perf_counter()
+        if force or self.last is None or now - self.last >= self.interval:
+            print(message)
+            self.last = now
+
+
+def _json_default(value):
+    """
+    将NumPy数值与数组转换为JSON可序列化的类型
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'无法序列化为JSON: {type(value).__name__}')
+
+
+def write_json_report(report_path, report):
+    """
+    写出机器可读的JSON报告
+    """
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=_json_default)
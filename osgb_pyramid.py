@@ -0,0 +1,416 @@
+import gzip
+import json
+import math
+import os
+import sqlite3
+import struct
+
+import numpy as np
+
+from osgb_tiles import tile_bounds
+
+
+# Web墨卡托（EPSG:3857）世界范围的一半
+WEB_MERCATOR_HALF = 20037508.342789244
+# 矢量瓦片的坐标精度与缓冲区（瓦片内坐标单位）
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+# 矢量瓦片中的图层名称
+LAYER_NAME = 'osgb_footprints'
+# 要素属性（固定顺序）：所在金字塔层级、单元内的瓦片数、单元填充率（瓦片数 / 4^层级）
+FIELDS = ('level', 'tiles', 'fill')
+# 每个缩放级别选用的金字塔层级：格网单元在屏幕上至少占这么多像素
+MIN_CELL_PIXELS = 4
+# 自动确定最大缩放级别时，单个OSGB瓦片在屏幕上占的像素数
+MAX_ZOOM_TILE_PIXELS = 32
+MAX_ZOOM_LIMIT = 22
+
+
+def mbtiles_path(output_file):
+    """
+    范围金字塔文件路径：与输出文件同目录的 <输出名>.mbtiles
+    """
+    return f'{os.path.splitext(output_file)[0]}.mbtiles'
+
+
+def pyramid_levels(cols, rows):
+    """
+    自底向上构建四叉树金字塔：第0层为瓦片本身，第k+1层由第k层的格网单元行列号右移一位合并得到，
+    同时累计每个单元包含的瓦片数，直到只剩一个单元
+    四叉树以最小行列号为起点，单元行列号均为相对起点的非负整数，保证逐层合并最终收敛到一个单元
+
+    返回 (各层列表, (起点列号, 起点行号))，每层为 (单元列号, 单元行号, 瓦片数) 三个int64数组
+    """
+    cols = np.asarray(cols, dtype=np.int64)
+    rows = np.asarray(rows, dtype=np.int64)
+    anchor = (int(cols.min()), int(rows.min()))
+    cols = cols - anchor[0]
+    rows = rows - anchor[1]
+    counts = np.ones(len(cols), dtype=np.int64)
+    levels = [(cols, rows, counts)]
+    while len(cols) > 1:
+        parent_cols = cols >> 1
+        parent_rows = rows >> 1
+        col_min = int(parent_cols.min())
+        row_min = int(parent_rows.min())
+        row_span = int(parent_rows.max()) - row_min + 1
+        keys = (parent_cols - col_min) * row_span + (parent_rows - row_min)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse.ravel(), weights=counts, minlength=len(unique_keys)).astype(np.int64)
+        cols = unique_keys // row_span + col_min
+        rows = unique_keys % row_span + row_min
+        levels.append((cols, rows, counts))
+    return levels, anchor
+
+
+def _level_quads(level, cell_cols, cell_rows, anchor, tile_size, srs_origin, origin_is_max, transformer):
+    """
+    计算第level层格网单元的四个角点，并转换到Web墨卡托坐标
+    单元范围由其覆盖的首尾瓦片按tile_bounds计算，与标准版瓦片多边形的坐标计算方式一致
+    """
+    first = tile_bounds((cell_cols << level) + anchor[0], (cell_rows << level) + anchor[1],
+                        tile_size, srs_origin, origin_is_max)
+    last = tile_bounds(((cell_cols + 1) << level) - 1 + anchor[0], ((cell_rows + 1) << level) - 1 + anchor[1],
+                       tile_size, srs_origin, origin_is_max)
+    min_x = np.minimum(first[0], last[0])
+    min_y = np.minimum(first[1], last[1])
+    max_x = np.maximum(first[2], last[2])
+    max_y = np.maximum(first[3], last[3])
+    xs = np.stack([min_x, max_x, max_x, min_x], axis=1)
+    ys = np.stack([min_y, min_y, max_y, max_y], axis=1)
+    tx, ty = transformer.transform(xs.ravel(), ys.ravel())
+    return np.stack([np.asarray(tx).reshape(-1, 4), np.asarray(ty).reshape(-1, 4)], axis=2)
+
+
+def _resolution(zoom):
+    """
+    缩放级别zoom下每个像素对应的Web墨卡托米数（256像素瓦片）
+    """
+    return 2 * WEB_MERCATOR_HALF / (256 * 2 ** zoom)
+
+
+def _zoom_for_pixels(size, pixels):
+    """
+    使size米在屏幕上至少占pixels像素的最小缩放级别
+    """
+    if size <= 0:
+        return MAX_ZOOM_LIMIT
+    return int(min(MAX_ZOOM_LIMIT, max(0, math.ceil(math.log2(2 * WEB_MERCATOR_HALF * pixels / (256 * size))))))
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number, wire_type, payload):
+    """
+    protobuf字段：wire_type为0时payload为整数（varint），为1时为双精度浮点数，为2时为字节串（length-delimited）
+    """
+    key = _varint((number << 3) | wire_type)
+    if wire_type == 0:
+        return key + _varint(payload)
+    if wire_type == 1:
+        return key + struct.pack('<d', payload)
+    return key + _varint(len(payload)) + payload
+
+
+def _packed(values):
+    return b''.join(_varint(v) for v in values)
+
+
+def _varint_sizes(values):
+    """
+    每个uint64值编码为varint后的字节数
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(values.shape, dtype=np.int64)
+    for shift in range(7, 64, 7):
+        sizes += values >= np.uint64(1 << shift)
+    return sizes
+
+
+def _varint_array(values):
+    """
+    将uint64数组按行优先顺序向量化编码为连续的varint字节，返回 (uint8数组, 与values同形状的字节数数组)
+    """
+    flat = np.asarray(values, dtype=np.uint64).ravel()
+    sizes = _varint_sizes(flat)
+    starts = np.cumsum(sizes) - sizes
+    out = np.empty(int(sizes.sum()), dtype=np.uint8)
+    for k in range(int(sizes.max()) if len(flat) else 0):
+        mask = sizes > k
+        byte = (flat[mask] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (sizes[mask] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[mask] + k] = (byte | more).astype(np.uint8)
+    return out, sizes.reshape(np.shape(values))
+
+
+def _ring_geometry(ring):
+    """
+    将一个闭合环编码为MVT几何命令（MoveTo、LineTo、ClosePath），外环按规范调整为瓦片坐标下的正面积方向
+    环退化（量化后不足3个不同顶点或面积为0）时返回None
+    """
+    points = []
+    for x, y in ring:
+        if not points or points[-1] != (x, y):
+            points.append((x, y))
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    if len(points) < 3:
+        return None
+    area = sum(points[i - 1][0] * points[i][1] - points[i][0] * points[i - 1][1] for i in range(len(points)))
+    if area == 0:
+        return None
+    if area < 0:
+        points.reverse()
+    commands = [(1 & 7) | (1 << 3)]
+    cursor_x, cursor_y = 0, 0
+    for i, (x, y) in enumerate(points):
+        if i == 1:
+            commands.append((2 & 7) | ((len(points) - 1) << 3))
+        commands.append(_zigzag(x - cursor_x))
+        commands.append(_zigzag(y - cursor_y))
+        cursor_x, cursor_y = x, y
+    commands.append((7 & 7) | (1 << 3))
+    return commands
+
+
+def _quad_features(rings, feature_ids, tags):
+    """
+    向量化编码四边形要素：每个要素都是固定的27个varint（图层features字段头、要素长度、编号、标签、类型、几何命令），
+    先计算各部分的字节数填入长度字段，再一次性编码
+    rings应已是正面积方向且没有重复顶点
+
+    返回 (所有要素的字节, 每个要素的字节数)
+    """
+    count = len(rings)
+    x = rings[:, :, 0]
+    y = rings[:, :, 1]
+    dx = np.diff(x, axis=1, prepend=0)
+    dy = np.diff(y, axis=1, prepend=0)
+    params = np.stack([dx, dy], axis=2).reshape(count, 8)
+    params = ((params << 1) ^ (params >> 63)).view(np.uint64)
+
+    tokens = np.zeros((count, 27), dtype=np.uint64)
+    tokens[:, 0] = 0x12                       # Layer.features
+    tokens[:, 2] = 0x08                       # Feature.id
+    tokens[:, 3] = feature_ids
+    tokens[:, 4] = 0x12                       # Feature.tags（packed）
+    tokens[:, 6:12] = tags
+    tokens[:, 12] = 0x18                      # Feature.type = POLYGON
+    tokens[:, 13] = 3
+    tokens[:, 14] = 0x22                      # Feature.geometry（packed）
+    tokens[:, 16] = (1 & 7) | (1 << 3)        # MoveTo(1)
+    tokens[:, 17:19] = params[:, 0:2]
+    tokens[:, 19] = (2 & 7) | (3 << 3)        # LineTo(3)
+    tokens[:, 20:26] = params[:, 2:8]
+    tokens[:, 26] = (7 & 7) | (1 << 3)        # ClosePath
+
+    sizes = _varint_sizes(tokens)
+    tokens[:, 5] = sizes[:, 6:12].sum(axis=1)
+    tokens[:, 15] = sizes[:, 16:27].sum(axis=1)
+    sizes[:, 5] = _varint_sizes(tokens[:, 5])
+    sizes[:, 15] = _varint_sizes(tokens[:, 15])
+    tokens[:, 1] = sizes[:, 2:27].sum(axis=1)
+    data, sizes = _varint_array(tokens)
+    return data, sizes.sum(axis=1)
+
+
+def _layer_tile(feature_bytes, values):
+    """
+    由已编码的要素与值表组装一个只有一个图层的矢量瓦片
+    """
+    layer = (_field(15, 0, 2) + _field(1, 2, LAYER_NAME.encode('utf-8')) + feature_bytes
+             + b''.join(_field(3, 2, key.encode('utf-8')) for key in FIELDS)
+             + b''.join(_field(4, 2, value) for value in values)
+             + _field(5, 0, MVT_EXTENT))
+    return _field(3, 2, layer)
+
+
+def _zoom_tiles(zoom, quads, level, counts):
+    """
+    将一层格网单元分配到缩放级别zoom的各个Web瓦片，产出 (瓦片列号, 瓦片行号(XYZ), 瓦片数据)
+    跨越多个瓦片的单元在每个瓦片中各出现一次，坐标限制在瓦片缓冲区内
+    """
+    tiles_per_side = 2 ** zoom
+    tile_meters = 2 * WEB_MERCATOR_HALF / tiles_per_side
+    # 像素坐标：X向右、Y向下，单位为瓦片
+    px = (quads[:, :, 0] + WEB_MERCATOR_HALF) / tile_meters
+    py = (WEB_MERCATOR_HALF - quads[:, :, 1]) / tile_meters
+    tx0 = np.clip(np.floor(px.min(axis=1)), 0, tiles_per_side - 1).astype(np.int64)
+    tx1 = np.clip(np.floor(px.max(axis=1)), 0, tiles_per_side - 1).astype(np.int64)
+    ty0 = np.clip(np.floor(py.min(axis=1)), 0, tiles_per_side - 1).astype(np.int64)
+    ty1 = np.clip(np.floor(py.max(axis=1)), 0, tiles_per_side - 1).astype(np.int64)
+    span_x = tx1 - tx0 + 1
+    span_y = ty1 - ty0 + 1
+
+    # 1. 展开为 (单元, 瓦片) 对，按瓦片与单元瓦片数排序
+    cell = np.repeat(np.arange(len(quads)), span_x * span_y)
+    local = np.arange(len(cell)) - np.repeat(np.cumsum(span_x * span_y) - span_x * span_y, span_x * span_y)
+    tile_x = tx0[cell] + local % span_x[cell]
+    tile_y = ty0[cell] + local // span_x[cell]
+    keys = tile_y * tiles_per_side + tile_x
+    cell_counts = counts[cell]
+    order = np.lexsort((cell_counts, keys))
+    cell, tile_x, tile_y, keys, cell_counts = cell[order], tile_x[order], tile_y[order], keys[order], cell_counts[order]
+    ring_x = np.rint((px[cell] - tile_x[:, None]) * MVT_EXTENT)
+    ring_y = np.rint((py[cell] - tile_y[:, None]) * MVT_EXTENT)
+    rings = np.stack([ring_x, ring_y], axis=2).clip(-MVT_BUFFER, MVT_EXTENT + MVT_BUFFER).astype(np.int64)
+
+    # 2. 每个瓦片的值表为 [层级, 各不同的瓦片数..., 对应的填充率...]，计算每个要素的标签
+    tile_start = np.r_[True, keys[1:] != keys[:-1]]
+    new_value = tile_start | np.r_[True, cell_counts[1:] != cell_counts[:-1]]
+    value_id = np.cumsum(new_value) - 1
+    tile_id = np.cumsum(tile_start) - 1
+    first_value = value_id[tile_start]
+    value_totals = np.diff(np.r_[first_value, value_id[-1] + 1])
+    rank = value_id - first_value[tile_id]
+    tags = np.zeros((len(cell), 6), dtype=np.int64)
+    tags[:, 2] = 1
+    tags[:, 3] = 1 + rank
+    tags[:, 4] = 2
+    tags[:, 5] = 1 + value_totals[tile_id] + rank
+    unique_counts = cell_counts[new_value]
+
+    # 3. 按量化后的环分类：正常四边形向量化编码，有重复顶点的环逐个编码，面积为0的环丢弃
+    x = rings[:, :, 0]
+    y = rings[:, :, 1]
+    next_x = np.roll(x, -1, axis=1)
+    next_y = np.roll(y, -1, axis=1)
+    area = (x * next_y - next_x * y).sum(axis=1)
+    repeated = ((x == next_x) & (y == next_y)).any(axis=1)
+    rings[area < 0] = rings[area < 0][:, ::-1]
+    simple = ~repeated & (area != 0)
+    feature_data, feature_sizes = _quad_features(rings[simple], cell[simple] + 1, tags[simple])
+    feature_ends = np.cumsum(feature_sizes)
+    simple_tiles = tile_id[simple]
+    tile_bounds_in_simple = np.searchsorted(simple_tiles, np.arange(len(first_value) + 1))
+    irregular = {}
+    for i in np.flatnonzero(repeated & (area != 0)):
+        geometry = _ring_geometry(rings[i].tolist())
+        if geometry is not None:
+            feature = (_field(1, 0, int(cell[i]) + 1) + _field(2, 2, _packed(tags[i].tolist()))
+                       + _field(3, 0, 3) + _field(4, 2, _packed(geometry)))
+            irregular.setdefault(int(tile_id[i]), []).append(_field(2, 2, feature))
+
+    # 4. 逐瓦片组装图层
+    fill_scale = float(4 ** level)
+    starts = np.flatnonzero(tile_start)
+    for t, start in enumerate(starts):
+        lo, hi = tile_bounds_in_simple[t], tile_bounds_in_simple[t + 1]
+        byte_lo = int(feature_ends[lo - 1]) if lo else 0
+        byte_hi = int(feature_ends[hi - 1]) if hi else 0
+        feature_bytes = feature_data[byte_lo:byte_hi].tobytes() + b''.join(irregular.get(t, []))
+        if not feature_bytes:
+            continue
+        tile_counts = unique_counts[first_value[t]:first_value[t] + value_totals[t]].tolist()
+        values = ([_field(5, 0, level)] + [_field(5, 0, c) for c in tile_counts]
+                  + [_field(3, 1, c / fill_scale) for c in tile_counts])
+        yield int(tile_x[start]), int(tile_y[start]), _layer_tile(feature_bytes, values)
+
+
+def build_pyramid_mbtiles(mbtiles_path, cols, rows, tile_size, srs_origin, origin_is_max, input_crs,
+                          min_zoom=None, max_zoom=None, name=None):
+    """
+    由瓦片整数格网构建多分辨率范围金字塔，并写出为MBTiles矢量瓦片（gzip压缩的MVT）
+
+    - 每个Web缩放级别选用格网单元在屏幕上至少占MIN_CELL_PIXELS像素的最细金字塔层级，
+      客户端在每个缩放级别只需读取当前视野内的瓦片
+    - min_zoom / max_zoom 默认根据整个数据集与单个瓦片的大小自动确定
+    - input_crs: 行列号计算坐标所在坐标系统的EPSG代码
+
+    返回统计字典 {'zooms', 'levels', 'tiles', 'bytes', 'zoom_levels'}
+    """
+    from osgb_reproject import get_transformer, transform_extent
+
+    levels, anchor = pyramid_levels(cols, rows)
+    transformer = get_transformer(input_crs, 3857)
+    quads = [_level_quads(level, level_cols, level_rows, anchor, tile_size, srs_origin, origin_is_max, transformer)
+             for level, (level_cols, level_rows, _) in enumerate(levels)]
+    cell_size = float(np.median(quads[0][:, :, 0].max(axis=1) - quads[0][:, :, 0].min(axis=1)))
+    # 整体范围取自第0层（上层单元可能超出数据范围）
+    extent = (float(quads[0][:, :, 0].min()), float(quads[0][:, :, 1].min()),
+              float(quads[0][:, :, 0].max()), float(quads[0][:, :, 1].max()))
+    extent_size = max(extent[2] - extent[0], extent[3] - extent[1])
+    if max_zoom is None:
+        max_zoom = _zoom_for_pixels(cell_size, MAX_ZOOM_TILE_PIXELS)
+    if min_zoom is None:
+        min_zoom = min(max_zoom, _zoom_for_pixels(extent_size, MIN_CELL_PIXELS))
+
+    # 先写临时文件再替换，避免预览服务读到写了一半的文件
+    tmp_path = f'{mbtiles_path}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    connection = sqlite3.connect(tmp_path)
+    zoom_levels = {}
+    tiles_written = 0
+    try:
+        connection.execute('CREATE TABLE metadata (name TEXT, value TEXT)')
+        connection.execute('CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, '
+                           'tile_data BLOB)')
+        connection.execute('CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)')
+        for zoom in range(min_zoom, max_zoom + 1):
+            # 选择格网单元不小于MIN_CELL_PIXELS像素的最细层级
+            wanted = MIN_CELL_PIXELS * _resolution(zoom) / cell_size if cell_size > 0 else 1
+            level = min(len(levels) - 1, max(0, math.ceil(math.log2(wanted)) if wanted > 1 else 0))
+            zoom_levels[zoom] = level
+            # MBTiles的tile_row采用TMS方向（自下而上）
+            rows_to_insert = [(zoom, tile_x, 2 ** zoom - 1 - tile_y, sqlite3.Binary(gzip.compress(data, 6)))
+                              for tile_x, tile_y, data in _zoom_tiles(zoom, quads[level], level, levels[level][2])]
+            connection.executemany('INSERT INTO tiles VALUES (?, ?, ?, ?)', rows_to_insert)
+            tiles_written += len(rows_to_insert)
+
+        lon_lat = transform_extent(extent, get_transformer(3857, 4326))
+        metadata = {
+            'name': name or os.path.splitext(os.path.basename(mbtiles_path))[0],
+            'format': 'pbf',
+            'type': 'overlay',
+            'version': '1',
+            'description': 'OSGB瓦片范围金字塔',
+            'minzoom': str(min_zoom),
+            'maxzoom': str(max_zoom),
+            'bounds': ','.join(f'{v:.8f}' for v in lon_lat),
+            'center': f'{(lon_lat[0] + lon_lat[2]) / 2:.8f},{(lon_lat[1] + lon_lat[3]) / 2:.8f},{min_zoom}',
+            'json': json.dumps({
+                'vector_layers': [{
+                    'id': LAYER_NAME,
+                    'description': '按四叉树合并的OSGB瓦片格网单元',
+                    'minzoom': min_zoom,
+                    'maxzoom': max_zoom,
+                    'fields': {key: 'Number' for key in FIELDS},
+                }],
+                'pyramid_levels': {str(zoom): level for zoom, level in zoom_levels.items()},
+            }, ensure_ascii=False),
+        }
+        connection.executemany('INSERT INTO metadata VALUES (?, ?)', list(metadata.items()))
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, mbtiles_path)
+    return {
+        'zooms': (min_zoom, max_zoom),
+        'levels': len(levels),
+        'tiles': tiles_written,
+        'bytes': os.path.getsize(mbtiles_path),
+        'zoom_levels': zoom_levels,
+    }
+
+
+def format_pyramid_report(pyramid_info):
+    """
+    将金字塔构建统计格式化为一行文本
+    """
+    return (f'缩放级别 {pyramid_info["zooms"][0]}-{pyramid_info["zooms"][1]}，金字塔 {pyramid_info["levels"]} 层，'
+            f'{pyramid_info["tiles"]} 个矢量瓦片，{pyramid_info["bytes"] / 1024 / 1024:.2f} MB')
@@ -0,0 +1,146 @@
+from functools import lru_cache
+
+import numpy as np
+from pyproj import CRS, Transformer
+
+
+@lru_cache(maxsize=None)
+def get_crs(epsg):
+    """
+    按EPSG代码缓存CRS对象，避免每次运行重复构建
+    """
+    return CRS.from_epsg(epsg)
+
+
+@lru_cache(maxsize=None)
+def get_transformer(src_epsg, dst_epsg):
+    """
+    按(源, 目标)坐标系统缓存pyproj Transformer，统一使用x/y（经度/纬度）轴顺序
+    """
+    return Transformer.from_crs(get_crs(src_epsg), get_crs(dst_epsg), always_xy=True)
+
+
+def _transform_xy(transformer, xy):
+    """
+    批量转换(n, 2)坐标数组
+    """
+    x, y = transformer.transform(xy[:, 0], xy[:, 1])
+    return np.column_stack([x, y])
+
+
+def reproject_geometries(geometries, transformer):
+    """
+    一次性转换一组几何对象的所有顶点
+    """
+    import shapely
+
+    return shapely.transform(geometries, lambda coords: _transform_xy(transformer, coords))
+
+
+def reproject_lattice_footprints(cols, rows, tile_size, srs_origin, origin_is_max, transformer):
+    """
+    只转换瓦片格网上的唯一角点，再由转换结果重建瓦片多边形
+    相邻瓦片共享的角点只转换一次；角点坐标与tile_bounds的计算方式相同，结果与逐顶点转换一致
+
+    返回转换后的多边形数组，顶点顺序与box_polygons相同
+    """
+    from osgb_tiles import ring_polygons
+
+    return ring_polygons(reproject_lattice_rings(cols, rows, tile_size, srs_origin, origin_is_max, transformer))
+
+
+def reproject_lattice_rings(cols, rows, tile_size, srs_origin, origin_is_max, transformer):
+    """
+    与reproject_lattice_footprints相同，但返回 (n, 5, 2) 的闭合外环坐标数组，不创建几何对象
+    """
+    cols = np.asarray(cols, dtype=np.int64)
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(cols) == 0:
+        return np.empty((0, 5, 2), dtype=np.float64)
+
+    # 每个瓦片四个角点的格网编号，顺序为 (min_x, min_y), (max_x, min_y), (max_x, max_y), (min_x, max_y)
+    if srs_origin and origin_is_max:
+        corner_k = np.stack([cols + 1, cols, cols, cols + 1], axis=1)
+        corner_j = np.stack([rows + 1, rows + 1, rows, rows], axis=1)
+    else:
+        corner_k = np.stack([cols, cols + 1, cols + 1, cols], axis=1)
+        corner_j = np.stack([rows, rows, rows + 1, rows + 1], axis=1)
+
+    # 编码为单个整数后去重
+    k_min = int(corner_k.min())
+    j_min = int(corner_j.min())
+    j_span = int(corner_j.max()) - j_min + 1
+    keys = (corner_k - k_min) * j_span + (corner_j - j_min)
+    unique_keys, inverse = np.unique(keys.ravel(), return_inverse=True)
+    unique_k = unique_keys // j_span + k_min
+    unique_j = unique_keys % j_span + j_min
+
+    if srs_origin:
+        if origin_is_max:
+            corner_x = srs_origin[0] - unique_k * tile_size
+            corner_y = srs_origin[1] - unique_j * tile_size
+        else:
+            corner_x = srs_origin[0] + unique_k * tile_size
+            corner_y = srs_origin[1] + unique_j * tile_size
+    else:
+        corner_x = unique_k * tile_size
+        corner_y = unique_j * tile_size
+    corner_x, corner_y = transformer.transform(corner_x, corner_y)
+    corner_x = np.asarray(corner_x, dtype=np.float64)
+    corner_y = np.asarray(corner_y, dtype=np.float64)
+
+    inverse = inverse.reshape(-1, 4)
+    coords = np.empty((len(cols), 5, 2), dtype=np.float64)
+    coords[:, :4, 0] = corner_x[inverse]
+    coords[:, :4, 1] = corner_y[inverse]
+    coords[:, 4] = coords[:, 0]
+    return coords
+
+
+def _densify_ring(ring_coords, transformer, max_error, max_depth):
+    """
+    转换一个闭合环，并在转换后偏离直线超过max_error的线段中点处插入顶点，逐层细分直到满足精度
+    """
+    src = np.asarray(ring_coords, dtype=np.float64)[:, :2]
+    dst = _transform_xy(transformer, src)
+    for _ in range(max_depth):
+        mid_src = (src[:-1] + src[1:]) / 2
+        mid_dst = _transform_xy(transformer, mid_src)
+        chord_mid = (dst[:-1] + dst[1:]) / 2
+        error = np.hypot(mid_dst[:, 0] - chord_mid[:, 0], mid_dst[:, 1] - chord_mid[:, 1])
+        split = np.nonzero(error > max_error)[0]
+        if len(split) == 0:
+            break
+        src = np.insert(src, split + 1, mid_src[split], axis=0)
+        dst = np.insert(dst, split + 1, mid_dst[split], axis=0)
+    return dst
+
+
+def reproject_densified(geometry, transformer, max_error, max_depth=16):
+    """
+    转换合并后的边界多边形，按最大误差自动加密边界，避免大范围多边形转换后直边产生变形
+
+    参数:
+    - geometry: Polygon或MultiPolygon
+    - max_error: 允许的最大偏差（输出坐标系统单位）
+    - max_depth: 每条边的最大细分层数
+    """
+    import shapely
+    from shapely.geometry import MultiPolygon, Polygon
+
+    polygons = []
+    for part in shapely.get_parts(geometry):
+        shell = _densify_ring(part.exterior.coords, transformer, max_error, max_depth)
+        holes = [_densify_ring(ring.coords, transformer, max_error, max_depth) for ring in part.interiors]
+        polygons.append(Polygon(shell, holes))
+    if isinstance(geometry, Polygon) and len(polygons) == 1:
+        return polygons[0]
+    return MultiPolygon(polygons)
+
+
+def transform_extent(bounds, transformer, densify_points=21):
+    """
+    转换矩形范围 (min_x, min_y, max_x, max_y)，每条边加密densify_points个点后取转换结果的外包矩形，
+    只依赖pyproj，不需要创建几何对象
+    """
+    return tuple(float(v) for v in transformer.transform_bounds(*bounds, densify_pts=densify_points))
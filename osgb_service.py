@@ -0,0 +1,454 @@
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+import numpy as np
+
+from osgb_tiles import parse_tile_names, tile_bounds, TILE_GEO_SIZE
+from osgb_discovery import iter_tile_entries
+from osgb_metadata import locate_metadata, read_metadata_info
+from osgb_bounds import grid_extent
+from osgb_index import build_index, query_bbox, index_names
+
+
+DEFAULT_PORT = 8765
+DEFAULT_INTERVAL = 2.0
+# 增量更新累计的新增/删除瓦片超过 max(MIN_PENDING_TILES, 索引瓦片数 / PENDING_FRACTION_DIVISOR) 时全量重建索引
+MIN_PENDING_TILES = 4096
+PENDING_FRACTION_DIVISOR = 8
+
+
+def _mtime(path):
+    """
+    文件或目录的修改时间（纳秒），不存在时返回None
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class DatasetWatcher:
+    """
+    单个OSGB数据集的内存瓦片目录
+
+    常驻内存的内容：瓦片名称到行列号的目录、read_metadata_info的结果，以及由它们生成的快照
+    （整体范围、合并边界、瓦片范围R树索引和预先序列化的响应）。
+    poll()只检查数据目录、输入目录与metadata.xml的修改时间，未变化时不扫描目录；
+    瓦片文件夹增删时只解析新增的名称、删除已移除的名称，并把增删的瓦片应用到现有快照：
+    合并边界在格网坐标下与增删的瓦片做并集/差集，R树索引保持不变，新增的瓦片暂存在线性扫描的小数组中、
+    删除的瓦片在查询时过滤，累计的增删超过阈值或metadata变化时才全量重建。
+    瓦片目录与快照都整体替换而不原地修改，HTTP处理线程读取的始终是完整的一份。
+    """
+
+    def __init__(self, osgb_folder, epsg_id=4326, output_epsg=None, origin_is_max=False, name=None):
+        self.osgb_folder = osgb_folder
+        self.name = name or os.path.basename(os.path.abspath(osgb_folder))
+        self.epsg_id = epsg_id
+        self.output_epsg = output_epsg
+        self.origin_is_max = origin_is_max
+        data_folder = os.path.join(osgb_folder, 'Data')
+        self.tile_data_folder = data_folder if os.path.isdir(data_folder) else osgb_folder
+        self.catalog = {}
+        self.metadata_path = None
+        self.metadata_info = (None, None)
+        self.signature = None
+        self.snapshot = None
+        self.version = 0
+
+    def _signature(self):
+        """
+        变化检测只使用几次stat：瓦片文件夹增删会改变数据目录的修改时间，
+        metadata.xml被替换或新增时会改变其自身或所在目录的修改时间
+        """
+        return (_mtime(self.tile_data_folder), _mtime(self.osgb_folder),
+                _mtime(self.metadata_path) if self.metadata_path else None)
+
+    def poll(self):
+        """
+        检查数据集是否变化，有变化时增量更新并返回True
+        """
+        signature = self._signature()
+        if signature == self.signature:
+            return False
+        return self.refresh(signature)
+
+    def refresh(self, signature=None):
+        """
+        增量更新瓦片目录与metadata信息，并更新快照；返回快照是否发生变化
+        记录的是扫描之前取得的修改时间，扫描期间发生的增删会在下一次poll()时被发现
+        """
+        start = time.perf_counter()
+        signature = signature or self._signature()
+
+        # 1. metadata.xml（read_metadata按修改时间缓存解析结果，只在输入目录变化或文件消失时重新查找，
+        # 找到的路径直接传给read_metadata_info，每次更新最多查找一次）
+        previous = self.signature or (None, None, None)
+        if self.metadata_path is None or signature[1] != previous[1] or not os.path.isfile(self.metadata_path):
+            self.metadata_path = locate_metadata(self.osgb_folder)
+            # metadata.xml的路径变化后，按新路径在读取之前取修改时间
+            signature = signature[:2] + (_mtime(self.metadata_path) if self.metadata_path else None,)
+        if self.metadata_path or os.path.isfile(self.osgb_folder):
+            metadata_info = read_metadata_info(self.osgb_folder, self.metadata_path)
+        else:
+            metadata_info = (None, None)
+        metadata_changed = metadata_info != self.metadata_info
+        self.metadata_info = metadata_info
+
+        # 2. 只在数据目录变化时重新扫描，并只解析新增的瓦片名称
+        added_names = []
+        removed = []
+        if self.signature is None or signature[0] != previous[0]:
+            current = {entry.name for entry in iter_tile_entries(self.tile_data_folder)}
+            removed = [(name, lattice) for name, lattice in self.catalog.items() if name not in current]
+            catalog = dict(self.catalog)
+            for name, _ in removed:
+                del catalog[name]
+            added_names, cols, rows, _ = parse_tile_names(name for name in current if name not in catalog)
+            # 与标准版一致，行列号减1使其从0开始
+            catalog.update(zip(added_names, zip((cols - 1).tolist(), (rows - 1).tolist())))
+            self.catalog = catalog
+        self.signature = signature
+
+        if self.snapshot is not None and not (added_names or removed or metadata_changed):
+            return False
+        # 3. metadata变化（原点或坐标系统改变了所有瓦片的范围）或累计增删过多时全量重建，否则增量更新
+        full = self.snapshot is None or metadata_changed
+        if not full:
+            pending = len(self.snapshot['pending']) + len(self.snapshot['removed']) + len(added_names) + len(removed)
+            full = pending > max(MIN_PENDING_TILES, self.snapshot['index']['count'] // PENDING_FRACTION_DIVISOR)
+        if full:
+            self.snapshot = self._build_snapshot()
+        else:
+            self.snapshot = self._update_snapshot(added_names, removed)
+        self.version += 1
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f'[{self.name}] 已{"全量" if full else "增量"}更新: {len(self.catalog)} 个瓦片'
+              f'（新增 {len(added_names)}，删除 {len(removed)}'
+              f'{"，metadata已变化" if metadata_changed and self.version > 1 else ""}），耗时 {elapsed:.1f} 毫秒')
+        return True
+
+    def _build_snapshot(self):
+        """
+        由内存中的行列号全量生成R树索引与格网坐标下的合并边界
+        瓦片范围与标准版相同，合并边界通过格网描边得到，与所有瓦片多边形的并集一致
+        """
+        from osgb_lattice import trace_lattice_outline
+
+        metadata_epsg, srs_origin = self.metadata_info
+        input_crs = metadata_epsg or self.epsg_id
+        catalog = self.catalog
+        names = list(catalog)
+        lattice = np.array(list(catalog.values()), dtype=np.int64).reshape(-1, 2)
+        cols, rows = lattice[:, 0], lattice[:, 1]
+
+        # 1. 瓦片范围与R树索引（输入坐标系统）
+        boxes = np.column_stack(tile_bounds(cols, rows, TILE_GEO_SIZE, srs_origin, self.origin_is_max))
+        index = build_index(names, np.arange(1, len(names) + 1), boxes, input_crs,
+                            os.path.abspath(self.tile_data_folder))
+
+        # 2. 合并边界（格网坐标）
+        return self._assemble_snapshot({
+            'catalog': catalog,
+            'index': index,
+            # 按索引顺序预先解码的瓦片名称，大范围查询时不再逐个解码
+            'index_names': index_names(index, range(index['count'])),
+            # 索引之后新增的瓦片（名称到行列号）与索引中已删除的瓦片名称
+            'pending': {},
+            'removed': frozenset(),
+            'input_crs': input_crs,
+            'srs_origin': srs_origin,
+            'lattice_outline': trace_lattice_outline(cols, rows),
+        })
+
+    def _update_snapshot(self, added_names, removed):
+        """
+        把增删的瓦片应用到现有快照，不重建R树索引，也不重新描边全部瓦片
+
+        参数:
+        - added_names: 新增的瓦片名称，行列号已写入self.catalog
+        - removed: 删除的 (瓦片名称, 行列号) 列表
+        """
+        import shapely
+        from osgb_tiles import box_polygons
+
+        previous = self.snapshot
+        catalog = self.catalog
+        pending = dict(previous['pending'])
+        removed_names = set(previous['removed'])
+
+        # 1. 新增的瓦片：之前从索引中删除的直接恢复，其余暂存；删除的瓦片：暂存的直接丢弃，其余在查询时过滤
+        for name in added_names:
+            if name in removed_names:
+                removed_names.discard(name)
+            else:
+                pending[name] = catalog[name]
+        for name, _ in removed:
+            if pending.pop(name, None) is None:
+                removed_names.add(name)
+
+        # 2. 合并边界在格网坐标下与增删的瓦片做并集/差集；仍被其他同号瓦片占用的格子不做差集
+        outline = previous['lattice_outline']
+        if added_names:
+            added = np.array([catalog[name] for name in added_names], dtype=np.int64).reshape(-1, 2)
+            outline = shapely.union(outline, shapely.union_all(
+                box_polygons(added[:, 0], added[:, 1], added[:, 0] + 1, added[:, 1] + 1)))
+        removed_cells = {lattice for _, lattice in removed}
+        if removed_cells:
+            removed_cells -= {lattice for lattice in catalog.values() if lattice in removed_cells}
+        if removed_cells:
+            cells = np.array(sorted(removed_cells), dtype=np.int64).reshape(-1, 2)
+            outline = shapely.difference(outline, shapely.union_all(
+                box_polygons(cells[:, 0], cells[:, 1], cells[:, 0] + 1, cells[:, 1] + 1)))
+        # 并集/差集会留下共线的中间顶点，容差为0的化简只去掉这些顶点
+        outline = shapely.simplify(outline, 0)
+
+        return self._assemble_snapshot(dict(previous, catalog=catalog, pending=pending,
+                                            removed=frozenset(removed_names), lattice_outline=outline))
+
+    def _assemble_snapshot(self, snapshot):
+        """
+        由格网坐标下的合并边界生成整体范围、输出坐标系统下的边界与预先序列化的响应，
+        并为暂存的新增瓦片计算范围
+        """
+        import shapely
+
+        input_crs = snapshot['input_crs']
+        srs_origin = snapshot['srs_origin']
+        output_crs = self.output_epsg or input_crs
+        tiles = len(snapshot['catalog'])
+        pending = np.array(list(snapshot['pending'].values()), dtype=np.int64).reshape(-1, 2)
+        snapshot['pending_names'] = list(snapshot['pending'])
+        snapshot['pending_boxes'] = np.column_stack(
+            tile_bounds(pending[:, 0], pending[:, 1], TILE_GEO_SIZE, srs_origin, self.origin_is_max))
+
+        # 1. 整体范围：格网坐标下合并边界的范围就是行列号的最小/最大值（加1）
+        outline = snapshot['lattice_outline']
+        bounds = None
+        if tiles:
+            min_col, min_row, max_col, max_row = (int(v) for v in outline.bounds)
+            bounds = grid_extent(np.array([min_col, max_col - 1]), np.array([min_row, max_row - 1]),
+                                 TILE_GEO_SIZE, srs_origin, self.origin_is_max)
+
+        # 2. 合并边界：按瓦片大小与原点换算（原点为最大坐标时两轴同时取反，环方向不变）
+        origin = srs_origin or (0.0, 0.0)
+        sign = -1.0 if srs_origin and self.origin_is_max else 1.0
+        outline = shapely.transform(outline, lambda coords: np.asarray(origin) + sign * TILE_GEO_SIZE * coords)
+        output_bounds = bounds
+        if output_crs != input_crs and bounds is not None:
+            from osgb_reproject import get_transformer, reproject_geometries, transform_extent
+            transformer = get_transformer(input_crs, output_crs)
+            outline = reproject_geometries(outline, transformer)
+            output_bounds = transform_extent(bounds, transformer)
+
+        summary = {
+            'name': self.name,
+            'input_path': self.osgb_folder,
+            'tile_data_folder': self.tile_data_folder,
+            'input_crs': input_crs,
+            'output_crs': output_crs,
+            'srs_origin': list(srs_origin) if srs_origin else None,
+            'origin_is_max': self.origin_is_max,
+            'tiles': tiles,
+            'bounds': list(output_bounds) if output_bounds else None,
+            'version': self.version + 1,
+            'updated_at': time.time(),
+        }
+        boundary = {
+            'type': 'FeatureCollection',
+            'crs': {'type': 'name', 'properties': {'name': f'urn:ogc:def:crs:EPSG::{output_crs}'}},
+            'features': [{
+                'type': 'Feature',
+                'properties': {'name': self.name, 'tiles': tiles},
+                'geometry': json.loads(shapely.to_geojson(outline)) if tiles else None,
+            }],
+        }
+        snapshot['responses'] = {
+            'summary': _json_bytes(summary),
+            'bounds': _json_bytes({'name': self.name, 'crs': output_crs, 'bounds': summary['bounds'],
+                                   'tiles': tiles}),
+            'boundary': _json_bytes(boundary),
+        }
+        return snapshot
+
+    def lookup_tile(self, tile_name):
+        """
+        按名称查找单个瓦片的行列号与范围（输入坐标系统），不存在时返回None
+        """
+        snapshot = self.snapshot
+        lattice = snapshot['catalog'].get(tile_name)
+        if lattice is None:
+            return None
+        col, row = lattice
+        bounds = tile_bounds([col], [row], TILE_GEO_SIZE, snapshot['srs_origin'], self.origin_is_max)
+        return {
+            'name': tile_name,
+            'col': col,
+            'row': row,
+            'crs': snapshot['input_crs'],
+            'bounds': [float(v[0]) for v in bounds],
+            'path': os.path.join(os.path.abspath(self.tile_data_folder), tile_name),
+        }
+
+    def query_tiles(self, bbox, bbox_epsg=None):
+        """
+        查询与矩形范围相交的瓦片名称；bbox_epsg与数据集坐标系统不同时先转换查询范围
+        """
+        snapshot = self.snapshot
+        if bbox_epsg and bbox_epsg != snapshot['input_crs']:
+            from osgb_reproject import get_transformer, transform_extent
+            bbox = transform_extent(bbox, get_transformer(bbox_epsg, snapshot['input_crs']))
+        strict = bbox[2] > bbox[0] and bbox[3] > bbox[1]
+        positions = query_bbox(snapshot['index'], bbox, strict)
+        names = snapshot['index_names']
+        result = [names[i] for i in np.sort(positions).tolist()]
+        if snapshot['removed']:
+            result = [name for name in result if name not in snapshot['removed']]
+        # 索引之后新增的瓦片数量有上限，直接线性扫描
+        boxes = snapshot['pending_boxes']
+        if len(boxes):
+            min_x, min_y, max_x, max_y = bbox
+            if strict:
+                hits = (boxes[:, 0] < max_x) & (boxes[:, 2] > min_x) & (boxes[:, 1] < max_y) & (boxes[:, 3] > min_y)
+            else:
+                hits = (boxes[:, 0] <= max_x) & (boxes[:, 2] >= min_x) & (boxes[:, 1] <= max_y) & (boxes[:, 3] >= min_y)
+            result.extend(snapshot['pending_names'][i] for i in np.nonzero(hits)[0].tolist())
+        return result
+
+
+def _json_bytes(value):
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+class BoundaryRequestHandler(BaseHTTPRequestHandler):
+    """
+    只读HTTP接口：
+    - GET /datasets                          所有数据集的概要
+    - GET /datasets/<名称>                    单个数据集的概要
+    - GET /datasets/<名称>/bounds             整体范围（输出坐标系统）
+    - GET /datasets/<名称>/boundary           合并边界GeoJSON（输出坐标系统）
+    - GET /datasets/<名称>/tiles?bbox=...&epsg=...  与矩形范围相交的瓦片名称
+    - GET /datasets/<名称>/tiles/<瓦片名称>    单个瓦片的行列号与范围
+    """
+
+    server_version = 'OSGBBoundaryService/1.0'
+
+    def log_message(self, format, *args):
+        # 不逐条输出访问日志，避免拖慢响应
+        pass
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Response-Time-Ms', f'{(time.perf_counter() - self.request_start) * 1000:.2f}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, _json_bytes({'error': message}))
+
+    def do_GET(self):
+        self.request_start = time.perf_counter()
+        url = urlparse(self.path)
+        parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+        watchers = self.server.watchers
+        if not parts or parts == ['datasets']:
+            self._send(200, b'[' + b','.join(w.snapshot['responses']['summary'] for w in watchers.values()) + b']')
+            return
+        if len(parts) < 2 or parts[0] != 'datasets' or parts[1] not in watchers:
+            self._error(404, f'未找到: {url.path}')
+            return
+        watcher = watchers[parts[1]]
+        if len(parts) == 2:
+            self._send(200, watcher.snapshot['responses']['summary'])
+        elif len(parts) == 3 and parts[2] in ('bounds', 'boundary'):
+            self._send(200, watcher.snapshot['responses'][parts[2]])
+        elif len(parts) == 3 and parts[2] == 'tiles':
+            params = parse_qs(url.query)
+            try:
+                bbox = tuple(float(v) for v in params['bbox'][0].split(','))
+                bbox_epsg = int(params['epsg'][0]) if 'epsg' in params else None
+                if len(bbox) != 4:
+                    raise ValueError
+            except (KeyError, ValueError):
+                self._error(400, '需要bbox=min_x,min_y,max_x,max_y参数，可选epsg=查询范围的EPSG代码')
+                return
+            names = watcher.query_tiles(bbox, bbox_epsg)
+            self._send(200, _json_bytes({'name': watcher.name, 'count': len(names), 'tiles': names}))
+        elif len(parts) == 4 and parts[2] == 'tiles':
+            tile = watcher.lookup_tile(parts[3])
+            if tile is None:
+                self._error(404, f'未找到瓦片: {parts[3]}')
+            else:
+                self._send(200, _json_bytes(tile))
+        else:
+            self._error(404, f'未找到: {url.path}')
+
+
+def _poll_loop(watchers, interval, stop_event):
+    """
+    后台轮询线程：按时间间隔检查所有数据集，单个数据集更新失败不影响其他数据集
+    """
+    while not stop_event.wait(interval):
+        for watcher in watchers.values():
+            try:
+                watcher.poll()
+            except Exception as e:
+                print(f'[{watcher.name}] 更新失败: {e}')
+
+
+def serve(osgb_folders, epsg_id=4326, output_epsg=None, origin_is_max=False, host='127.0.0.1',
+          port=DEFAULT_PORT, interval=DEFAULT_INTERVAL):
+    """
+    常驻服务：加载所有数据集到内存，启动轮询线程，并在本地HTTP端口提供边界、范围与瓦片查询
+    """
+    watchers = {}
+    for folder in osgb_folders:
+        watcher = DatasetWatcher(folder, epsg_id, output_epsg, origin_is_max)
+        # 同名数据集追加序号
+        base_name = watcher.name
+        suffix = 2
+        while watcher.name in watchers:
+            watcher.name = f'{base_name}_{suffix}'
+            suffix += 1
+        watcher.refresh()
+        watchers[watcher.name] = watcher
+
+    server = ThreadingHTTPServer((host, port), BoundaryRequestHandler)
+    server.watchers = watchers
+    stop_event = threading.Event()
+    poller = threading.Thread(target=_poll_loop, args=(watchers, interval, stop_event), daemon=True)
+    poller.start()
+    print(f'边界服务已启动: http://{host}:{server.server_address[1]}/datasets（轮询间隔 {interval} 秒，Ctrl+C 退出）')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('正在停止服务...')
+    finally:
+        stop_event.set()
+        server.server_close()
+
+
+def serve_main(argv=None):
+    """
+    serve子命令：以常驻服务方式监视一个或多个OSGB数据集
+    """
+    parser = argparse.ArgumentParser(prog='osgb2shp.py serve', description='OSGB边界常驻服务')
+    parser.add_argument('inputs', nargs='+', help='OSGB数据输入路径（可指定多个）')
+    parser.add_argument('--epsg', '-e', type=int, default=4326, help='输入坐标系统EPSG ID（metadata.xml优先）')
+    parser.add_argument('--output-epsg', '-oe', type=int, help='边界与范围的输出坐标系统EPSG ID，默认使用输入坐标系统')
+    parser.add_argument('--origin-is-max', '-om', action='store_true', help='将原点视为最大坐标（默认原点为最小坐标）')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址，默认只接受本机访问')
+    parser.add_argument('--port', '-P', type=int, default=DEFAULT_PORT, help='监听端口')
+    parser.add_argument('--interval', '-n', type=float, default=DEFAULT_INTERVAL, help='检查数据集变化的间隔（秒）')
+    args = parser.parse_args(argv)
+    serve(args.inputs, args.epsg, args.output_epsg, args.origin_is_max, args.host, args.port, args.interval)
+
+
+if __name__ == '__main__':
+    serve_main()
@@ -0,0 +1,504 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import socket
+import time
+import traceback
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from osgb_tiles import box_rings, ring_polygons, TILE_GEO_SIZE
+from osgb_catalog import TileCatalog, CATALOG_BATCH_SIZE, catalog_report, format_catalog_report
+from osgb_discovery import iter_tile_entries, format_discovery_report
+from osgb_metadata import read_metadata_info
+from osgb_io import output_format, write_geodataframe, format_write_report, merge_write_info, APPENDABLE_FORMATS
+
+
+# 部分结果格式版本，合并时要求所有分片一致
+PARTIAL_VERSION = 1
+
+# 分片方式：range按(列号, 行号)排序后等分为连续的格网范围，hash按瓦片名称的CRC32取模
+SHARD_METHODS = ('range', 'hash')
+
+# 合并时必须在所有分片之间一致的运行参数
+SHARED_SETTINGS = ('input_crs', 'output_crs', 'srs_origin', 'origin_is_max', 'tile_geo_size', 'footprint_source')
+
+
+def assign_shards(catalog, shard_count, shard_by='range'):
+    """
+    为目录中的每个瓦片分配分片编号（0 ~ shard_count-1），结果只取决于瓦片集合，不取决于扫描顺序，
+    不同节点各自扫描同一数据目录时得到相同的分配
+
+    - range: 按(列号, 行号)排序后等分，每个分片是一段连续的列，局部边界紧凑，合并时只有分片之间的接缝
+    - hash: 按瓦片名称的CRC32取模，不需要排序，各分片的瓦片数大致相同但在空间上交错
+    """
+    count = len(catalog)
+    if shard_by == 'hash':
+        data = catalog.names_blob.tobytes()
+        offsets = catalog.name_offsets.tolist()
+        hashes = np.fromiter((zlib.crc32(data[offsets[i]:offsets[i + 1]]) for i in range(count)),
+                             dtype=np.int64, count=count)
+        return hashes % shard_count
+    if shard_by != 'range':
+        raise ValueError(f'不支持的分片方式: {shard_by}，可选 {", ".join(SHARD_METHODS)}')
+    order = np.lexsort((catalog.rows, catalog.cols))
+    shards = np.empty(count, dtype=np.int64)
+    shards[order] = np.arange(count, dtype=np.int64) * shard_count // max(count, 1)
+    return shards
+
+
+def partial_paths(parts_dir, shard_index, shard_count):
+    """
+    分片部分结果的文件路径：(<名称>.json 描述信息, <名称>.npz 数组数据)
+    """
+    base = os.path.join(parts_dir, f'shard_{shard_index:04d}_of_{shard_count:04d}')
+    return f'{base}.json', f'{base}.npz'
+
+
+def open_dataset(osgb_folder, epsg_id, output_epsg=None, origin_is_max=False, footprint_source='grid',
+                 header_workers=8):
+    """
+    与标准版提取相同地确定瓦片数据目录、坐标系统与原点，并扫描全部瓦片文件夹
+
+    返回 (运行参数字典, 瓦片目录, 瓦片发现统计)
+    """
+    # 1. 检查是否存在Data子文件夹
+    data_folder = os.path.join(osgb_folder, 'Data')
+    if os.path.isdir(data_folder):
+        tile_data_folder = data_folder
+    elif os.path.isfile(osgb_folder):
+        if footprint_source == 'osgb':
+            raise ValueError('压缩包输入只支持按行列号计算瓦片范围，请使用 --footprint-source grid')
+        tile_data_folder = osgb_folder
+    else:
+        tile_data_folder = osgb_folder
+    print(f'瓦片数据目录: {tile_data_folder}')
+
+    # 2. 读取坐标系统和原点信息，确定输出坐标系统
+    metadata_epsg, srs_origin = read_metadata_info(osgb_folder)
+    input_crs = metadata_epsg or epsg_id
+    output_crs = output_epsg or input_crs
+    print(f'输入坐标系统: EPSG:{input_crs}（{"metadata.xml" if metadata_epsg else "用户指定"}），'
+          f'输出坐标系统: EPSG:{output_crs}')
+    if srs_origin:
+        print(f'原点坐标: {srs_origin}')
+
+    # 3. 扫描全部瓦片文件夹
+    discovery_report = {}
+    catalog, _ = TileCatalog.from_names(
+        entry.name for entry in iter_tile_entries(tile_data_folder, report=discovery_report)
+    )
+    print(f'瓦片发现: {format_discovery_report(discovery_report)}')
+    print(f'瓦片目录: {format_catalog_report(catalog_report(catalog))}')
+    settings = {
+        'input_path': osgb_folder,
+        'tile_data_folder': os.path.abspath(tile_data_folder),
+        'input_crs': input_crs,
+        'crs_source': 'metadata.xml' if metadata_epsg else 'user_input',
+        'output_crs': output_crs,
+        'output_crs_source': 'user_input' if output_epsg else 'same_as_input',
+        'srs_origin': list(srs_origin) if srs_origin else None,
+        'origin_is_max': origin_is_max,
+        'tile_geo_size': TILE_GEO_SIZE,
+        'footprint_source': footprint_source,
+        'header_workers': header_workers,
+    }
+    return settings, catalog, discovery_report
+
+
+def map_shard(catalog, settings, shard_index, shard_count, shard_by, total_tiles, discovery_report, parts_dir):
+    """
+    处理一个分片并写出可合并的部分结果：
+    - 瓦片目录（行列号、状态标记与名称）
+    - 输出坐标系统下的瓦片范围外环坐标（n, 5, 2），合并时直接批量创建多边形
+    - 输入坐标系统下的局部合并边界（WKB），按行列号计算范围时由格网描边得到，相邻分片的接缝坐标逐位相同
+    - 瓦片数、输出范围、范围来源统计与耗时（JSON）
+
+    数组先写出，JSON最后写出，JSON存在即表示该分片已完整完成
+
+    返回部分结果的描述信息字典
+    """
+    import shapely
+    from osgb2shp import tile_footprints
+    from osgb_lattice import trace_lattice_outline
+
+    start = time.perf_counter()
+    srs_origin = tuple(settings['srs_origin']) if settings['srs_origin'] else None
+    origin_is_max = settings['origin_is_max']
+    tile_geo_size = settings['tile_geo_size']
+    input_crs = settings['input_crs']
+    output_crs = settings['output_crs']
+    footprint_source = settings['footprint_source']
+    print(f'分片 {shard_index + 1}/{shard_count}: {len(catalog)} 个瓦片')
+
+    # 1. 瓦片范围（输入坐标系统）
+    footprint_info = {'source': footprint_source, 'header_hits': 0, 'fallbacks': 0}
+    min_x, min_y, max_x, max_y = tile_footprints(catalog, settings['tile_data_folder'], tile_geo_size, srs_origin,
+                                                 origin_is_max, footprint_source, settings['header_workers'],
+                                                 footprint_info)
+    cols = catalog.cols.astype(np.int64) - 1
+    rows = catalog.rows.astype(np.int64) - 1
+
+    # 2. 局部合并边界（输入坐标系统）：格网坐标下描边后按瓦片大小与原点换算
+    if footprint_source == 'grid':
+        outline = trace_lattice_outline(cols, rows)
+        origin = np.asarray(srs_origin or (0.0, 0.0))
+        sign = -1.0 if srs_origin and origin_is_max else 1.0
+        outline = shapely.transform(outline, lambda coords: origin + sign * tile_geo_size * coords)
+    else:
+        outline = shapely.union_all(ring_polygons(box_rings(min_x, min_y, max_x, max_y)))
+
+    # 3. 输出坐标系统下的瓦片范围外环坐标
+    if output_crs != input_crs and len(catalog):
+        from osgb_reproject import get_transformer, reproject_lattice_rings
+        transformer = get_transformer(input_crs, output_crs)
+        if footprint_source == 'grid':
+            rings = reproject_lattice_rings(cols, rows, tile_geo_size, srs_origin, origin_is_max, transformer)
+        else:
+            rings = box_rings(min_x, min_y, max_x, max_y)
+            x, y = transformer.transform(rings[:, :, 0].ravel(), rings[:, :, 1].ravel())
+            rings[:, :, 0] = np.asarray(x).reshape(-1, 5)
+            rings[:, :, 1] = np.asarray(y).reshape(-1, 5)
+    else:
+        rings = box_rings(min_x, min_y, max_x, max_y)
+    bounds = None
+    if len(rings):
+        bounds = [float(rings[:, :, 0].min()), float(rings[:, :, 1].min()),
+                  float(rings[:, :, 0].max()), float(rings[:, :, 1].max())]
+
+    # 4. 写出部分结果
+    os.makedirs(parts_dir, exist_ok=True)
+    json_path, npz_path = partial_paths(parts_dir, shard_index, shard_count)
+    temp_path = f'{npz_path}.tmp.npz'
+    np.savez(temp_path, tiles=catalog.tiles, names_blob=catalog.names_blob, name_offsets=catalog.name_offsets,
+             rings=rings, outline=np.frombuffer(shapely.to_wkb(outline), dtype=np.uint8))
+    os.replace(temp_path, npz_path)
+    partial = {
+        'version': PARTIAL_VERSION,
+        'shard': shard_index,
+        'shard_count': shard_count,
+        'shard_by': shard_by,
+        'total_tiles': total_tiles,
+        'tiles': len(catalog),
+        'settings': settings,
+        'discovery': discovery_report,
+        'footprint': footprint_info,
+        'bounds': bounds,
+        'outline_vertices': int(shapely.get_num_coordinates(outline)),
+        'node': socket.gethostname(),
+        'seconds': time.perf_counter() - start,
+    }
+    with open(f'{json_path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(partial, f, ensure_ascii=False, indent=2)
+    os.replace(f'{json_path}.tmp', json_path)
+    print(f'分片 {shard_index + 1}/{shard_count} 完成: {npz_path}，耗时 {partial["seconds"]:.3f} 秒')
+    return partial
+
+
+def _run_shard(task):
+    """
+    在工作进程中处理一个分片，输出重定向到分片自己的日志文件；异常写入日志后继续抛出
+    """
+    catalog, settings, shard_index, shard_count, shard_by, total_tiles, discovery_report, parts_dir = task
+    log_path = f'{os.path.splitext(partial_paths(parts_dir, shard_index, shard_count)[0])[0]}_log.txt'
+    with open(log_path, 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        try:
+            return map_shard(catalog, settings, shard_index, shard_count, shard_by, total_tiles, discovery_report,
+                             parts_dir)
+        except Exception:
+            log.write(traceback.format_exc())
+            raise
+
+
+def default_parts_dir(output_path):
+    """
+    默认的部分结果目录：<输出名>/<输出名>_shards
+    """
+    stem = os.path.splitext(os.path.basename(output_path))[0]
+    return os.path.join(os.path.splitext(output_path)[0], f'{stem}_shards')
+
+
+def extract_sharded(osgb_folder, output_path, epsg_id, output_epsg=None, origin_is_max=False,
+                    footprint_source='grid', header_workers=8, shard_count=None, shard_by='range', workers=None,
+                    shard=None, parts_dir=None):
+    """
+    分片提取一个超大数据集：扫描一次瓦片目录后按格网范围或名称哈希分为shard_count个分片，
+    每个分片在独立的工作进程中计算瓦片范围、坐标转换与局部合并边界，写出可合并的部分结果，
+    最后由合并步骤拼接为最终图层与报告
+
+    参数:
+    - shard_count: 分片数，默认使用CPU核数
+    - shard_by: 分片方式，'range'（默认）或'hash'
+    - workers: 进程数，默认使用CPU核数
+    - shard: 只处理指定编号（从0开始）的分片并写出部分结果，不执行合并；
+      用于在不同节点上分别运行各分片，之后在本地以reduce子命令合并
+    - parts_dir: 部分结果目录，默认为<输出名>/<输出名>_shards
+
+    处理全部分片时返回 reduce_shards 的结果 (TileCatalog, 报告路径)；只处理一个分片时返回 (部分结果描述, JSON路径)；
+    没有发现瓦片时返回None
+    """
+    shard_count = shard_count or os.cpu_count()
+    if shard_count < 1:
+        raise ValueError(f'分片数必须大于0: {shard_count}')
+    if shard_by not in SHARD_METHODS:
+        raise ValueError(f'不支持的分片方式: {shard_by}，可选 {", ".join(SHARD_METHODS)}')
+    if shard is not None and not 0 <= shard < shard_count:
+        raise ValueError(f'分片编号超出范围: {shard}（共 {shard_count} 个分片，编号从0开始）')
+    output_format(output_path)
+    parts_dir = parts_dir or default_parts_dir(output_path)
+
+    # 1. 扫描全部瓦片并分配分片
+    start = time.perf_counter()
+    settings, catalog, discovery_report = open_dataset(osgb_folder, epsg_id, output_epsg, origin_is_max,
+                                                       footprint_source, header_workers)
+    if not len(catalog):
+        print('未发现可处理的瓦片')
+        return None
+    shards = assign_shards(catalog, shard_count, shard_by)
+    order = np.argsort(shards, kind='stable')
+    splits = np.searchsorted(shards[order], np.arange(shard_count + 1))
+    print(f'分片方式: {shard_by}，共 {shard_count} 个分片，每个分片 {int(np.diff(splits).min())} ~ '
+          f'{int(np.diff(splits).max())} 个瓦片')
+
+    def shard_task(index):
+        return (catalog.take(order[splits[index]:splits[index + 1]]), settings, index, shard_count, shard_by,
+                len(catalog), discovery_report, parts_dir)
+
+    # 2. 只处理一个分片（多节点运行）
+    if shard is not None:
+        partial = map_shard(*shard_task(shard))
+        return partial, partial_paths(parts_dir, shard, shard_count)[0]
+
+    # 3. 在进程池中处理全部分片
+    os.makedirs(parts_dir, exist_ok=True)
+    print(f'使用 {workers or os.cpu_count()} 个进程处理分片，部分结果目录: {parts_dir}')
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_run_shard, shard_task(index)): index for index in range(shard_count)}
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                partial = future.result()
+                print(f'[{done}/{shard_count}] 分片 {index}: {partial["tiles"]} 个瓦片，'
+                      f'耗时 {partial["seconds"]:.3f} 秒')
+            except Exception as e:
+                failed.append(index)
+                print(f'[{done}/{shard_count}] 分片 {index}: 失败（{type(e).__name__}: {e}）')
+    if failed:
+        raise RuntimeError(f'{len(failed)} 个分片处理失败: {failed}，详见部分结果目录中的日志: {parts_dir}')
+    print(f'全部分片完成，耗时 {time.perf_counter() - start:.3f} 秒')
+
+    # 4. 合并部分结果
+    return reduce_shards(parts_dir, output_path)
+
+
+def load_partials(parts_dir):
+    """
+    读取并检查部分结果目录中所有分片的描述信息：格式版本、分片数、分片方式与运行参数必须一致，
+    所有分片都必须存在且只出现一次，各分片瓦片数之和必须等于扫描到的瓦片总数（不同节点看到的瓦片集合相同）
+
+    返回按分片编号排序的描述信息列表
+    """
+    partials = []
+    for json_path in sorted(glob.glob(os.path.join(parts_dir, 'shard_*_of_*.json'))):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            partial = json.load(f)
+        if partial.get('version') != PARTIAL_VERSION:
+            raise ValueError(f'部分结果格式版本不受支持: {json_path}')
+        partials.append(partial)
+    if not partials:
+        raise ValueError(f'部分结果目录中没有分片结果: {parts_dir}')
+
+    first = partials[0]
+    for partial in partials[1:]:
+        for key in ('shard_count', 'shard_by', 'total_tiles'):
+            if partial[key] != first[key]:
+                raise ValueError(f'分片 {partial["shard"]} 的{key}与分片 {first["shard"]} 不一致: '
+                                 f'{partial[key]} != {first[key]}')
+        for key in SHARED_SETTINGS:
+            if partial['settings'][key] != first['settings'][key]:
+                raise ValueError(f'分片 {partial["shard"]} 的运行参数{key}与分片 {first["shard"]} 不一致: '
+                                 f'{partial["settings"][key]} != {first["settings"][key]}')
+    present = set()
+    for partial in partials:
+        if partial['shard'] in present:
+            raise ValueError(f'分片 {partial["shard"]} 有多个部分结果: {parts_dir}')
+        if not 0 <= partial['shard'] < first['shard_count']:
+            raise ValueError(f'分片编号 {partial["shard"]} 超出分片数 {first["shard_count"]}')
+        present.add(partial['shard'])
+    missing = sorted(set(range(first['shard_count'])) - present)
+    if missing:
+        raise ValueError(f'缺少 {len(missing)} 个分片的部分结果: {missing}')
+    tiles = sum(partial['tiles'] for partial in partials)
+    if tiles != first['total_tiles']:
+        raise ValueError(f'各分片瓦片数之和 {tiles} 与扫描到的瓦片总数 {first["total_tiles"]} 不一致，'
+                         f'各节点扫描到的瓦片集合可能不同')
+    return sorted(partials, key=lambda partial: partial['shard'])
+
+
+def reduce_shards(parts_dir, output_path):
+    """
+    合并各分片的部分结果：按分片顺序拼接瓦片范围并分块写出最终图层（字段与标准版相同，编号连续），
+    将各分片的局部边界合并为整体边界写出到<输出名>_outline，并生成报告
+
+    返回 (TileCatalog, 报告路径)，目录的crs与total_bounds属性为输出坐标系统与输出范围
+    """
+    import geopandas as gpd
+    import shapely
+    from osgb_reproject import get_crs, get_transformer, reproject_geometries
+
+    start = time.perf_counter()
+    output_folder = os.path.splitext(output_path)[0]
+    stem = os.path.splitext(os.path.basename(output_path))[0]
+    output_file = os.path.join(output_folder, os.path.basename(output_path))
+    outline_file = os.path.join(output_folder, f'{stem}_outline{os.path.splitext(output_path)[1]}')
+    report_path = os.path.join(output_folder, f'{stem}_report.txt')
+    output_format(output_file)
+
+    # 1. 读取并检查所有分片
+    partials = load_partials(parts_dir)
+    settings = partials[0]['settings']
+    input_crs = settings['input_crs']
+    output_crs = settings['output_crs']
+    print(f'正在合并 {len(partials)} 个分片的部分结果: {parts_dir}')
+    catalogs = []
+    rings = []
+    outlines = []
+    for partial in partials:
+        with np.load(partial_paths(parts_dir, partial['shard'], partial['shard_count'])[1]) as data:
+            catalogs.append(TileCatalog(data['tiles'], data['names_blob'], data['name_offsets']))
+            rings.append(data['rings'])
+            outlines.append(shapely.from_wkb(data['outline'].tobytes()))
+    catalog = TileCatalog.concat(catalogs)
+    rings = np.concatenate(rings)
+    load_seconds = time.perf_counter() - start
+
+    # 2. 分块创建多边形并写出最终图层，格式不支持追加时一次写出
+    os.makedirs(output_folder, exist_ok=True)
+    write_start = time.perf_counter()
+    batch_size = CATALOG_BATCH_SIZE if output_format(output_file) in APPENDABLE_FORMATS else max(len(rings), 1)
+    crs = get_crs(output_crs)
+    print(f'正在保存{output_format(output_file)}: {output_file}')
+    write_info = None
+    for batch_start in range(0, len(rings), batch_size):
+        batch = rings[batch_start:batch_start + batch_size]
+        gdf = gpd.GeoDataFrame(
+            {'id': np.arange(batch_start + 1, batch_start + len(batch) + 1), 'name': ['tile'] * len(batch)},
+            geometry=ring_polygons(batch),
+            crs=crs
+        )
+        write_info = merge_write_info(write_info, write_geodataframe(gdf, output_file, append=batch_start > 0))
+    write_seconds = time.perf_counter() - write_start
+    print(f'写出完成: {format_write_report(write_info)}')
+
+    # 3. 合并各分片的局部边界（输入坐标系统，接缝坐标逐位相同），再转换到输出坐标系统
+    outline_start = time.perf_counter()
+    outline = shapely.union_all(outlines)
+    vertices_before = int(shapely.get_num_coordinates(outline))
+    if output_crs != input_crs:
+        outline = reproject_geometries(outline, get_transformer(input_crs, output_crs))
+    outline_gdf = gpd.GeoDataFrame({'id': [1], 'name': ['merged_boundary'], 'tiles': [len(catalog)]},
+                                   geometry=[outline], crs=crs)
+    outline_write_info = write_geodataframe(outline_gdf, outline_file)
+    outline_seconds = time.perf_counter() - outline_start
+    parts = int(shapely.get_num_geometries(outline))
+    print(f'已保存合并边界: {outline_file}（{parts} 个多边形，{vertices_before} 个顶点）')
+
+    bounds = None
+    for partial in partials:
+        if partial['bounds']:
+            other = partial['bounds']
+            bounds = other if bounds is None else [min(bounds[0], other[0]), min(bounds[1], other[1]),
+                                                   max(bounds[2], other[2]), max(bounds[3], other[3])]
+    catalog.crs = crs
+    catalog.total_bounds = np.asarray(bounds, dtype=np.float64)
+
+    # 4. 生成报告
+    footprint_info = {'header_hits': sum(p['footprint']['header_hits'] for p in partials),
+                      'fallbacks': sum(p['footprint']['fallbacks'] for p in partials)}
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write('OSGB分片边界提取报告\n')
+        f.write('=' * 50 + '\n')
+        f.write(f'输入路径: {settings["input_path"]}\n')
+        f.write(f'瓦片数据路径: {settings["tile_data_folder"]}\n')
+        f.write(f'输出路径: {output_file}\n')
+        f.write(f'合并边界: {outline_file}\n')
+        f.write(f'部分结果目录: {parts_dir}\n')
+        f.write(f'输入坐标系统: EPSG:{input_crs}\n')
+        f.write(f'输入坐标系统来源: {settings["crs_source"]}\n')
+        f.write(f'输出坐标系统: EPSG:{output_crs}\n')
+        f.write(f'输出坐标系统来源: {settings["output_crs_source"]}\n')
+        f.write(f'处理瓦片数: {len(catalog)}\n')
+        f.write(f'生成多边形数: {len(catalog)}\n')
+        f.write(f'瓦片大小: {settings["tile_geo_size"]} 度\n')
+        f.write(f'瓦片发现: {format_discovery_report(partials[0]["discovery"])}\n')
+        f.write(f'瓦片目录: {format_catalog_report(catalog_report(catalog))}\n')
+        if settings['footprint_source'] == 'osgb':
+            f.write(f'瓦片范围来源: OSGB根节点包围球（成功 {footprint_info["header_hits"]} 个，'
+                    f'回退 {footprint_info["fallbacks"]} 个）\n')
+        else:
+            f.write('瓦片范围来源: 行列号与固定瓦片大小\n')
+        f.write(f'分片: {partials[0]["shard_by"]}，共 {len(partials)} 个分片\n')
+        for partial in partials:
+            f.write(f'  分片 {partial["shard"]}: {partial["tiles"]} 个瓦片，'
+                    f'局部边界 {partial["outline_vertices"]} 个顶点，节点 {partial["node"]}，'
+                    f'耗时 {partial["seconds"]:.3f} 秒\n')
+        f.write(f'合并边界: {parts} 个多边形，{vertices_before} 个顶点\n')
+        f.write(f'输出格式: {write_info["format"]}\n')
+        f.write(f'写出统计: {format_write_report(write_info)}\n')
+        f.write(f'合并边界写出统计: {format_write_report(outline_write_info)}\n')
+        f.write(f'合并耗时: 读取部分结果 {load_seconds:.3f} 秒，写出图层 {write_seconds:.3f} 秒，'
+                f'合并边界 {outline_seconds:.3f} 秒，共 {time.perf_counter() - start:.3f} 秒\n')
+        f.write('\n边界范围:\n')
+        f.write(f'最小X: {bounds[0]:.6f}\n')
+        f.write(f'最小Y: {bounds[1]:.6f}\n')
+        f.write(f'最大X: {bounds[2]:.6f}\n')
+        f.write(f'最大Y: {bounds[3]:.6f}\n')
+        f.write(f'宽度: {bounds[2] - bounds[0]:.6f}\n')
+        f.write(f'高度: {bounds[3] - bounds[1]:.6f}\n')
+        f.write('\n提取完成!\n')
+    print(f'生成报告: {report_path}')
+    return catalog, report_path
+
+
+def shard_main(argv=None):
+    """
+    shard子命令：分片提取一个超大数据集；指定--shard时只处理一个分片，供多节点分别运行
+    """
+    parser = argparse.ArgumentParser(prog='osgb2shp.py shard', description='分片提取超大OSGB数据集的瓦片范围')
+    parser.add_argument('--input', '-i', default='Data', help='OSGB数据输入路径')
+    parser.add_argument('--output', '-o', default='osgb_boundary.shp',
+                        help='输出文件路径和名称，按扩展名确定格式：.shp / .gpkg / .fgb / .parquet')
+    parser.add_argument('--epsg', '-e', type=int, default=4326, help='输入坐标系统EPSG ID')
+    parser.add_argument('--output-epsg', '-oe', type=int, help='输出坐标系统EPSG ID，默认使用输入坐标系统')
+    parser.add_argument('--origin-is-max', '-om', action='store_true', help='将原点视为最大坐标（默认原点为最小坐标）')
+    parser.add_argument('--footprint-source', '-fs', choices=['grid', 'osgb'], default='grid',
+                        help='瓦片范围来源：grid按行列号计算（默认），osgb读取根节点OSGB文件中的包围球')
+    parser.add_argument('--header-workers', '-hw', type=int, default=8, help='每个分片读取OSGB根节点文件的线程数')
+    parser.add_argument('--shards', '-n', type=int, help='分片数，默认使用CPU核数')
+    parser.add_argument('--shard-by', '-sb', choices=SHARD_METHODS, default='range',
+                        help='分片方式：range按格网范围等分（默认），hash按瓦片名称哈希')
+    parser.add_argument('--workers', '-w', type=int, help='进程数，默认使用CPU核数')
+    parser.add_argument('--shard', '-k', type=int,
+                        help='只处理指定编号（从0开始）的分片并写出部分结果，不执行合并（多节点运行）')
+    parser.add_argument('--parts-dir', '-pd', help='部分结果目录，默认为<输出名>/<输出名>_shards')
+    args = parser.parse_args(argv)
+    return extract_sharded(args.input, args.output, args.epsg, args.output_epsg, args.origin_is_max,
+                           args.footprint_source, args.header_workers, args.shards, args.shard_by, args.workers,
+                           args.shard, args.parts_dir)
+
+
+def reduce_main(argv=None):
+    """
+    reduce子命令：合并各节点写出的分片部分结果，生成最终图层、合并边界与报告
+    """
+    parser = argparse.ArgumentParser(prog='osgb2shp.py reduce', description='合并分片提取的部分结果')
+    parser.add_argument('parts_dir', help='部分结果目录（包含所有分片的shard_*_of_*.json与.npz）')
+    parser.add_argument('--output', '-o', default='osgb_boundary.shp',
+                        help='输出文件路径和名称，按扩展名确定格式：.shp / .gpkg / .fgb / .parquet')
+    args = parser.parse_args(argv)
+    return reduce_shards(args.parts_dir, args.output)
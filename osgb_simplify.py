@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+
+
+# 按顶点数上限搜索简化容差时的二分次数
+BUDGET_SEARCH_STEPS = 32
+
+
+def count_vertices(geometries):
+    """
+    一组几何对象的顶点总数
+    """
+    import shapely
+
+    return int(np.sum(shapely.get_num_coordinates(geometries)))
+
+
+def collapse_collinear(geometries):
+    """
+    精确删除共线顶点：格网描边得到的边界在每个瓦片边长处都有一个顶点，直线段上的中间顶点不改变形状
+    容差为0的简化只删除到相邻顶点连线距离恰好为0的顶点，轴对齐的格网边界上这类顶点的坐标分量完全相同，
+    结果与原边界的形状逐点一致
+    """
+    import shapely
+
+    return shapely.simplify(geometries, 0.0, preserve_topology=True)
+
+
+def simplify_geometries(geometries, tolerance):
+    """
+    保持拓扑的简化：所有几何对象作为一个几何集合一起简化，环之间（包括不同要素之间）不会因简化而相交
+    """
+    import shapely
+
+    geometries = np.asarray(geometries, dtype=object)
+    simplified = shapely.get_parts(shapely.simplify(shapely.geometrycollections(geometries), tolerance,
+                                                    preserve_topology=True))
+    if len(simplified) != len(geometries):
+        # 简化后要素数发生变化时（例如要素退化为空），退回逐个要素简化
+        simplified = shapely.simplify(geometries, tolerance, preserve_topology=True)
+    return simplified
+
+
+def simplify_to_vertex_budget(geometries, max_vertices, min_tolerance=0.0):
+    """
+    在不小于min_tolerance的范围内二分查找满足顶点数上限的最小容差
+
+    返回 (简化结果, 使用的容差, 是否满足上限)；最大容差（整体范围的宽高中的较大值）仍不满足时返回最大容差的结果
+    """
+    import shapely
+
+    geometries = np.asarray(geometries, dtype=object)
+    best = simplify_geometries(geometries, min_tolerance) if min_tolerance else geometries
+    if count_vertices(best) <= max_vertices:
+        return best, min_tolerance, True
+    bounds = shapely.total_bounds(geometries)
+    high = float(max(bounds[2] - bounds[0], bounds[3] - bounds[1], min_tolerance))
+    best = simplify_geometries(geometries, high)
+    if count_vertices(best) > max_vertices:
+        return best, high, False
+    low = min_tolerance
+    for _ in range(BUDGET_SEARCH_STEPS):
+        middle = (low + high) / 2
+        simplified = simplify_geometries(geometries, middle)
+        if count_vertices(simplified) <= max_vertices:
+            high = middle
+            best = simplified
+        else:
+            low = middle
+    return best, high, True
+
+
+def simplify_outlines(geometries, tolerance=None, max_vertices=None):
+    """
+    合并边界的简化阶段：先精确删除共线顶点，再可选地按容差或顶点数上限做保持拓扑的简化
+
+    参数:
+    - geometries: 多边形数组（合并边界为单个元素，分块输出为每个连通块一个元素）
+    - tolerance: 简化容差（几何对象所在坐标系统的单位），为None时不做容差简化
+    - max_vertices: 所有要素的顶点总数上限，指定时从tolerance（默认为0）开始增大容差，直到满足上限
+
+    返回 (简化后的多边形数组, 统计字典)
+    """
+    start = time.perf_counter()
+    geometries = np.asarray(geometries, dtype=object)
+    info = {'input_vertices': count_vertices(geometries), 'tolerance': tolerance, 'max_vertices': max_vertices,
+            'budget_met': None}
+    geometries = collapse_collinear(geometries)
+    info['collinear_vertices'] = count_vertices(geometries)
+    if max_vertices:
+        geometries, info['tolerance'], info['budget_met'] = simplify_to_vertex_budget(geometries, max_vertices,
+                                                                                     tolerance or 0.0)
+    elif tolerance:
+        geometries = simplify_geometries(geometries, tolerance)
+    info['output_vertices'] = count_vertices(geometries)
+    info['seconds'] = time.perf_counter() - start
+    return geometries, info
+
+
+def format_simplify_report(info):
+    """
+    将简化阶段的统计信息格式化为一行文本
+    """
+    text = f'{info["input_vertices"]} -> {info["collinear_vertices"]} 个顶点（删除共线顶点）'
+    if info['tolerance'] or info['max_vertices']:
+        text += f' -> {info["output_vertices"]} 个顶点（容差 {info["tolerance"] or 0:g}'
+        if info['max_vertices']:
+            text += f'，顶点数上限 {info["max_vertices"]}{"" if info["budget_met"] else "，未能满足"}'
+        text += '）'
+    return text + f'，耗时 {info["seconds"]:.3f} 秒'
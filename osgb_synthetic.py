@@ -0,0 +1,208 @@
+import argparse
+import math
+import os
+import struct
+
+import numpy as np
+
+from osgb_header import OSG_HEADER_LOW, OSG_HEADER_HIGH
+from osgb_metadata import METADATA_NAME
+from osgb_tiles import TILE_PREFIX
+
+
+# 合成数据集支持的瓦片布局与metadata.xml变体
+LAYOUTS = ('dense', 'sparse', 'holey')
+METADATA_VARIANTS = ('epsg', 'wkt', 'no_origin', 'none')
+
+# 默认的坐标系统与原点（与README中的metadata.xml示例一致）
+DEFAULT_EPSG = 4544
+DEFAULT_ORIGIN = (380812.0, 4040114.0, 1820.0)
+# 稀疏布局的占用率
+SPARSE_DENSITY = 0.3
+# 带孔洞布局的初始占用率，其余格网由随机矩形孔洞挖去
+HOLEY_DENSITY = 0.85
+# 合成根节点文件的OSG二进制版本（OpenSceneGraph 3.6.5）与文件头属性位（二进制括号记录块大小）
+OSG_BINARY_VERSION = 161
+OSG_BINARY_ATTRIBUTES = 0x4
+# 根节点PagedLOD的两级可见范围（PIXEL_SIZE_ON_SCREEN）：较小时显示根节点自身，较大时加载下一层文件
+LOD_RANGES = ((0.0, 40.0), (40.0, 1.0e30))
+
+
+def layout_indices(tiles, layout='dense', signed=False, seed=0):
+    """
+    生成瓦片行列号
+
+    参数:
+    - tiles: 瓦片数
+    - layout: 'dense'为接近正方形的连续格网，'sparse'为随机稀疏分布，'holey'为带内部孔洞的格网
+    - signed: 为True时编号以0为中心，同时包含+和-编号
+    - seed: 随机种子，相同参数生成相同的数据集
+
+    返回 (xs, ys) 两个int64数组，长度恰好为tiles
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f'不支持的瓦片布局: {layout}，支持: {", ".join(LAYOUTS)}')
+    rng = np.random.default_rng(seed)
+    if layout == 'dense':
+        width = max(1, math.ceil(math.sqrt(tiles)))
+        cells = np.arange(tiles, dtype=np.int64)
+    elif layout == 'sparse':
+        width = max(1, math.ceil(math.sqrt(tiles / SPARSE_DENSITY)))
+        cells = np.sort(rng.choice(width * width, size=tiles, replace=False)).astype(np.int64)
+    else:
+        width = max(3, math.ceil(math.sqrt(tiles / HOLEY_DENSITY)))
+        occupied = np.ones((width, width), dtype=bool)
+        extra = width * width - tiles
+        # 先挖随机矩形孔洞，剩余数量不足一个孔洞时逐个挖去单个内部格网，孔洞不接触外边界
+        while extra > 0:
+            size = int(rng.integers(1, 6)) if extra >= 25 else 1
+            size = min(size, width - 2)
+            x0 = int(rng.integers(1, width - size))
+            y0 = int(rng.integers(1, width - size))
+            block = occupied[y0:y0 + size, x0:x0 + size]
+            count = int(block.sum())
+            if count == 0 or count > extra:
+                if size == 1 and not occupied[1:-1, 1:-1].any():
+                    # 内部已经全部挖空，从外边界继续删除
+                    border = np.flatnonzero(occupied.ravel())[:extra]
+                    occupied.ravel()[border] = False
+                    break
+                continue
+            block[:] = False
+            extra -= count
+        cells = np.flatnonzero(occupied.ravel()).astype(np.int64)
+    xs = cells % width
+    ys = cells // width
+    if signed:
+        xs = xs - width // 2
+        ys = ys - width // 2
+    return xs, ys
+
+
+def tile_name(x, y):
+    """
+    按Tile_+xxx_+yyy格式生成瓦片文件夹名称
+    """
+    return f'{TILE_PREFIX}{x:+04d}_{y:+04d}'
+
+
+def metadata_xml(variant='epsg', epsg=DEFAULT_EPSG, origin=DEFAULT_ORIGIN):
+    """
+    生成metadata.xml文本
+
+    - 'epsg': <SRS>EPSG:xxxx</SRS> 与 <SRSOrigin>
+    - 'wkt': <SRS>为WKT文本（仅通过AUTHORITY给出EPSG）与 <SRSOrigin>
+    - 'no_origin': 只有<SRS>，没有原点
+    """
+    if variant not in METADATA_VARIANTS or variant == 'none':
+        raise ValueError(f'不支持的metadata.xml变体: {variant}')
+    if variant == 'wkt':
+        from pyproj import CRS
+        srs = CRS.from_epsg(epsg).to_wkt('WKT1_GDAL')
+    else:
+        srs = f'EPSG:{epsg}'
+    lines = ['<?xml version="1.0" encoding="utf-8"?>', '<ModelMetadata version="1">', f'    <SRS>{srs}</SRS>']
+    if variant != 'no_origin':
+        lines.append(f'    <SRSOrigin>{origin[0]:.6f},{origin[1]:.6f},{origin[2]:.6f}</SRSOrigin>')
+    lines.append('    <Texture><ColorSource>Visible</ColorSource></Texture>')
+    lines.append('</ModelMetadata>')
+    return '\n'.join(lines) + '\n'
+
+
+def _osg_string(value):
+    data = value.encode('utf-8')
+    return struct.pack('<i', len(data)) + data
+
+
+def _osg_block(payload):
+    # 块大小从大小字段自身的起点量到块结束
+    return struct.pack('<q', 8 + len(payload)) + payload
+
+
+def root_osgb_bytes(center, radius, tile='Tile_+000_+000'):
+    """
+    按OpenSceneGraph 3.6.5写出的二进制格式生成瓦片根节点文件内容：根节点为osg::PagedLOD，
+    CenterMode为USER_DEFINED_CENTER，两级可见范围中第二级指向下一层文件，不带子节点（网格）
+    与OSG读取tests/data/paged_lod_no_children.osgt后写出的.osgb逐字节相同
+    """
+    fields = b''.join([
+        struct.pack('<I', 1),
+        # osg::Object：Name、DataVariance(UNSPECIFIED)、UserDataContainer
+        _osg_string(tile),
+        struct.pack('<i?', 2, False),
+        # osg::Node：InitialBound、四个回调、CullingActive、NodeMask、StateSet
+        struct.pack('<5??I?', False, False, False, False, False, True, 0xFFFFFFFF, False),
+        # osg::LOD：CenterMode(USER_DEFINED_CENTER)、UserCenter、RangeMode(PIXEL_SIZE_ON_SCREEN)、RangeList
+        struct.pack('<i?4di?I', 1, True, center[0], center[1], center[2], radius, 1, True, len(LOD_RANGES)),
+        _osg_block(b''.join(struct.pack('<2f', *lod_range) for lod_range in LOD_RANGES)),
+        # osg::PagedLOD：DatabasePath（空）、NumChildrenThatCannotBeExpired、DisableExternalChildrenPaging、
+        # RangeDataList（根节点自身没有文件名，第二级为下一层文件）与PriorityList、Children（不带子节点）
+        struct.pack('<??I??I', True, False, 0, False, True, len(LOD_RANGES)),
+        _osg_block(_osg_string('') + _osg_string(f'{tile}_L16_0.osgb')),
+        struct.pack('<I', len(LOD_RANGES)),
+        _osg_block(struct.pack('<2f', 0.0, 1.0) * len(LOD_RANGES)),
+        struct.pack('<?', False),
+    ])
+    header = struct.pack('<IIIII', OSG_HEADER_LOW, OSG_HEADER_HIGH, 1, OSG_BINARY_VERSION, OSG_BINARY_ATTRIBUTES)
+    return header + _osg_string('0') + _osg_string('osg::PagedLOD') + _osg_block(fields)
+
+
+def generate_dataset(root, tiles, layout='dense', signed=False, metadata='epsg', osgb_files=False,
+                     tile_size=100.0, seed=0):
+    """
+    在root下生成合成OSGB数据集：root/metadata.xml 与 root/Data/Tile_xxx_yyy 文件夹
+
+    参数:
+    - root: 输出目录
+    - tiles: 瓦片数
+    - layout / signed / seed: 见layout_indices
+    - metadata: metadata.xml变体，'none'时不生成
+    - osgb_files: 是否为每个瓦片生成根节点文件Tile_xxx_yyy.osgb（包围球按tile_size计算的局部坐标）
+    - tile_size: 根节点包围球使用的瓦片边长（局部坐标单位）
+
+    返回数据集信息字典
+    """
+    if metadata not in METADATA_VARIANTS:
+        raise ValueError(f'不支持的metadata.xml变体: {metadata}，支持: {", ".join(METADATA_VARIANTS)}')
+    xs, ys = layout_indices(tiles, layout, signed, seed)
+    data_folder = os.path.join(root, 'Data')
+    os.makedirs(data_folder, exist_ok=True)
+    if metadata != 'none':
+        with open(os.path.join(root, METADATA_NAME), 'w', encoding='utf-8') as f:
+            f.write(metadata_xml(metadata))
+    radius = tile_size / 2 * math.sqrt(2)
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        name = tile_name(x, y)
+        tile_path = os.path.join(data_folder, name)
+        os.makedirs(tile_path, exist_ok=True)
+        if osgb_files:
+            center = ((x + 0.5) * tile_size, (y + 0.5) * tile_size, 0.0)
+            with open(os.path.join(tile_path, f'{name}.osgb'), 'wb') as f:
+                f.write(root_osgb_bytes(center, radius, name))
+    return {
+        'root': root,
+        'tiles': len(xs),
+        'layout': layout,
+        'signed': signed,
+        'metadata': metadata,
+        'osgb_files': osgb_files,
+        'seed': seed,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='合成OSGB测试数据集生成工具')
+    parser.add_argument('--output', '-o', required=True, help='数据集输出目录')
+    parser.add_argument('--tiles', '-n', type=int, default=1000, help='瓦片数')
+    parser.add_argument('--layout', '-l', choices=LAYOUTS, default='dense',
+                        help='瓦片布局：dense为连续格网，sparse为随机稀疏，holey为带内部孔洞的格网')
+    parser.add_argument('--signed', '-s', action='store_true', help='编号以0为中心，同时包含+和-编号')
+    parser.add_argument('--metadata', '-m', choices=METADATA_VARIANTS, default='epsg',
+                        help='metadata.xml变体：epsg、wkt、no_origin（无原点）、none（不生成）')
+    parser.add_argument('--osgb-files', action='store_true', help='为每个瓦片生成包含包围球的根节点OSGB文件')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    info = generate_dataset(args.output, args.tiles, args.layout, args.signed, args.metadata, args.osgb_files,
+                            seed=args.seed)
+    print(f'已生成 {info["tiles"]} 个瓦片: {args.output}')
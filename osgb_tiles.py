@@ -0,0 +1,122 @@
+import numpy as np
+
+
+TILE_PREFIX = 'Tile_'
+
+# 标准版使用的固定瓦片大小（地理单位）：1/3600度，约30米精度
+TILE_GEO_SIZE = 0.0002777777777777778
+
+
+def parse_tile_name(tile_name, exact_pairs=True):
+    """
+    解析单个瓦片文件夹名称，返回(x, y)；编号段数不符合要求时返回None，编号不是整数时抛出ValueError
+    """
+    tile_info = tile_name.split('_')[1:]
+    if len(tile_info) < 2 or (exact_pairs and len(tile_info) != 2):
+        return None
+    # 处理带+号的情况
+    return int(tile_info[0].replace('+', '')), int(tile_info[1].replace('+', ''))
+
+
+def parse_tile_names(tile_names, exact_pairs=True):
+    """
+    批量解析瓦片文件夹名称（格式 Tile_+xxx_+yyy）为整数行列号数组
+
+    参数:
+    - tile_names: 瓦片文件夹名称的可迭代对象（可以是生成器）
+    - exact_pairs: 是否要求名称中恰好包含两段编号（False时允许多余的段）
+
+    返回:
+    - names: 解析成功的瓦片名称列表
+    - xs: 第一段编号（列号/X）的int64数组
+    - ys: 第二段编号（行号/Y）的int64数组
+    - skipped: 解析失败的(名称, 错误)列表
+    """
+    names = []
+    xs = []
+    ys = []
+    skipped = []
+    for tile_name in tile_names:
+        try:
+            parsed = parse_tile_name(tile_name, exact_pairs)
+        except ValueError as e:
+            skipped.append((tile_name, e))
+            continue
+        if parsed is None:
+            continue
+        x, y = parsed
+        names.append(tile_name)
+        xs.append(x)
+        ys.append(y)
+
+    return names, np.array(xs, dtype=np.int64), np.array(ys, dtype=np.int64), skipped
+
+
+def tile_bounds(cols, rows, tile_size, srs_origin=None, origin_is_max=False):
+    """
+    按行列号数组批量计算瓦片的地理范围
+    计算顺序与逐瓦片的浮点运算保持一致，保证结果逐位相同
+
+    返回 (min_x, min_y, max_x, max_y) 四个float64数组
+    """
+    cols = np.asarray(cols, dtype=np.int64)
+    rows = np.asarray(rows, dtype=np.int64)
+    if srs_origin:
+        if origin_is_max:
+            # 原点作为最大坐标
+            max_x = srs_origin[0] - cols * tile_size
+            min_x = srs_origin[0] - (cols + 1) * tile_size
+            max_y = srs_origin[1] - rows * tile_size
+            min_y = srs_origin[1] - (rows + 1) * tile_size
+        else:
+            # 原点作为最小坐标
+            min_x = srs_origin[0] + cols * tile_size
+            max_x = srs_origin[0] + (cols + 1) * tile_size
+            min_y = srs_origin[1] + rows * tile_size
+            max_y = srs_origin[1] + (rows + 1) * tile_size
+    else:
+        # 不考虑原点偏移
+        min_x = cols * tile_size
+        max_x = (cols + 1) * tile_size
+        min_y = rows * tile_size
+        max_y = (rows + 1) * tile_size
+    return min_x, min_y, max_x, max_y
+
+
+def box_polygons(min_x, min_y, max_x, max_y):
+    """
+    一次性批量创建矩形多边形数组
+    顶点顺序与 Polygon([(min_x, min_y), (max_x, min_y), (max_x, max_y), (min_x, max_y)]) 相同
+    """
+    return ring_polygons(box_rings(min_x, min_y, max_x, max_y))
+
+
+def box_rings(min_x, min_y, max_x, max_y):
+    """
+    由矩形范围数组生成 (n, 5, 2) 的闭合外环坐标，顶点顺序与box_polygons相同，不创建几何对象
+    """
+    coords = np.empty((len(min_x), 5, 2), dtype=np.float64)
+    coords[:, 0, 0] = min_x
+    coords[:, 0, 1] = min_y
+    coords[:, 1, 0] = max_x
+    coords[:, 1, 1] = min_y
+    coords[:, 2, 0] = max_x
+    coords[:, 2, 1] = max_y
+    coords[:, 3, 0] = min_x
+    coords[:, 3, 1] = max_y
+    coords[:, 4] = coords[:, 0]
+    return coords
+
+
+def ring_polygons(coords):
+    """
+    由 (n, 5, 2) 的闭合外环坐标数组批量创建多边形
+    使用shapely的ragged array构造接口，直接以连续的坐标与偏移量数组创建，比逐个外环构造快约一倍
+    """
+    import shapely
+
+    count = len(coords)
+    ring_offsets = np.arange(0, count * 5 + 1, 5, dtype=np.int64)
+    polygon_offsets = np.arange(count + 1, dtype=np.int64)
+    return shapely.from_ragged_array(shapely.GeometryType.POLYGON, coords.reshape(-1, 2),
+                                     (ring_offsets, polygon_offsets))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 工具为顶层模块，测试时从仓库根目录导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
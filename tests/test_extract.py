@@ -0,0 +1,127 @@
+import os
+import shutil
+import tarfile
+
+import numpy as np
+import pytest
+import shapely
+
+from osgb2shp import extract_osgb_boundary
+from osgb2shp_original_coords import extract_osgb_boundary_original_coords
+from osgb_bounds import extract_tile_extent
+from osgb_shard import extract_sharded, reduce_shards
+from osgb_synthetic import generate_dataset
+
+
+def _dataset(root, tiles=600, layout='holey', signed=True, metadata='epsg', osgb_files=False):
+    generate_dataset(str(root), tiles, layout, signed, metadata, osgb_files, seed=5)
+    return str(root)
+
+
+def _sorted_bounds(gdf):
+    # 目录扫描顺序与压缩包内顺序不同，按瓦片范围排序后比较
+    bounds = gdf.geometry.bounds.to_numpy()
+    return bounds[np.lexsort(bounds.T[::-1])]
+
+
+@pytest.mark.parametrize('metadata', ['epsg', 'no_origin'])
+@pytest.mark.parametrize('origin_is_max', [False, True])
+def test_bounds_only_matches_full_run(tmp_path, metadata, origin_is_max):
+    dataset = _dataset(tmp_path / 'project', metadata=metadata)
+    gdf, _ = extract_osgb_boundary(dataset, str(tmp_path / 'full.gpkg'), 4544, origin_is_max=origin_is_max)
+    info, _ = extract_tile_extent(dataset, str(tmp_path / 'extent.shp'), 4544, origin_is_max=origin_is_max,
+                                  coords='grid')
+    assert info['tiles'] == len(gdf)
+    assert info['bounds'] == list(gdf.total_bounds)
+
+
+@pytest.mark.parametrize('metadata', ['epsg', 'no_origin'])
+def test_bounds_only_matches_original_coords_run(tmp_path, metadata):
+    dataset = _dataset(tmp_path / 'project', metadata=metadata)
+    gdf, _ = extract_osgb_boundary_original_coords(dataset, str(tmp_path / 'full.gpkg'), 4544)
+    info, _ = extract_tile_extent(dataset, str(tmp_path / 'extent.shp'), 4544, coords='original')
+    assert info['bounds'] == list(gdf.total_bounds)
+
+
+@pytest.mark.parametrize('shard_by', ['range', 'hash'])
+def test_reduce_matches_unsharded(tmp_path, shard_by):
+    import geopandas as gpd
+
+    dataset = _dataset(tmp_path / 'project')
+    expected, _ = extract_osgb_boundary(dataset, str(tmp_path / 'full.gpkg'), 4544, 3857)
+    extract_sharded(dataset, str(tmp_path / 'sharded.gpkg'), 4544, 3857, shard_count=3, shard_by=shard_by,
+                    workers=1)
+    parts_dir = str(tmp_path / 'sharded' / 'sharded_shards')
+    catalog, _ = reduce_shards(parts_dir, str(tmp_path / 'reduced.gpkg'))
+    reduced = gpd.read_file(str(tmp_path / 'reduced' / 'reduced.gpkg'))
+    assert len(catalog) == len(expected) == len(reduced)
+    np.testing.assert_array_equal(_sorted_bounds(reduced), _sorted_bounds(expected))
+    outline = gpd.read_file(str(tmp_path / 'reduced' / 'reduced_outline.gpkg')).geometry[0]
+    assert outline.equals(shapely.union_all(np.asarray(expected.geometry.array)))
+
+
+def test_reduce_rejects_missing_shard(tmp_path):
+    dataset = _dataset(tmp_path / 'project')
+    parts_dir = str(tmp_path / 'parts')
+    extract_sharded(dataset, str(tmp_path / 'sharded.gpkg'), 4544, shard_count=3, shard=0, parts_dir=parts_dir)
+    with pytest.raises(ValueError):
+        reduce_shards(parts_dir, str(tmp_path / 'reduced.gpkg'))
+
+
+@pytest.mark.parametrize('archive_format', ['zip', 'gztar'])
+def test_archive_input_matches_directory(tmp_path, archive_format):
+    dataset = _dataset(tmp_path / 'project')
+    archive = shutil.make_archive(str(tmp_path / 'delivery'), archive_format, str(tmp_path), 'project')
+    expected, _ = extract_osgb_boundary(dataset, str(tmp_path / 'from_dir.gpkg'), 4326, tile_stats=True)
+    actual, _ = extract_osgb_boundary(archive, str(tmp_path / 'from_archive.gpkg'), 4326, tile_stats=True)
+    assert actual.crs == expected.crs
+    assert len(actual) == len(expected)
+    np.testing.assert_array_equal(_sorted_bounds(actual), _sorted_bounds(expected))
+    assert actual[['files', 'bytes']].sum().tolist() == expected[['files', 'bytes']].sum().tolist()
+
+
+def test_tar_listing_matches_directory_stats(tmp_path):
+    from osgb_archive import iter_archive_entries
+    from osgb_discovery import iter_tile_entries, tile_storage_stats
+
+    dataset = _dataset(tmp_path / 'project', tiles=50, osgb_files=True)
+    archive = str(tmp_path / 'delivery.tar')
+    with tarfile.open(archive, 'w') as tf:
+        tf.add(dataset, arcname='project')
+    expected = {entry.name: entry.stats
+                for entry in iter_tile_entries(os.path.join(dataset, 'Data'), stat_func=tile_storage_stats)}
+    actual = {entry.name: entry.stats for entry in iter_archive_entries(archive)}
+    assert actual == expected
+
+
+@pytest.mark.parametrize('extension', ['gpkg', 'shp'])
+def test_incremental_rerun_after_all_tiles_removed(tmp_path, extension):
+    import json
+    import geopandas as gpd
+    from osgb_index import load_index
+
+    dataset = _dataset(tmp_path / 'project', tiles=50)
+    output_path = str(tmp_path / f'out.{extension}')
+    output_file = str(tmp_path / 'out' / f'out.{extension}')
+    extract_osgb_boundary(dataset, output_path, 4544, incremental=True, spatial_index=True)
+    shutil.rmtree(os.path.join(dataset, 'Data'))
+    os.makedirs(os.path.join(dataset, 'Data'))
+
+    gdf, report_path = extract_osgb_boundary(dataset, output_path, 4544, incremental=True, spatial_index=True)
+    assert len(gdf) == 0 and os.path.exists(report_path)
+    assert len(gpd.read_file(output_file)) == 0
+    with open(str(tmp_path / 'out' / 'out_manifest.json'), encoding='utf-8') as f:
+        assert json.load(f)['bounds'] is None
+    assert load_index(str(tmp_path / 'out' / 'out_tiles.idx'))['count'] == 0
+
+    # 之后新增的瓦片追加到空图层，几何类型保持为多边形
+    generate_dataset(dataset, 20, seed=1)
+    gdf, _ = extract_osgb_boundary(dataset, output_path, 4544, incremental=True, spatial_index=True)
+    written = gpd.read_file(output_file)
+    assert len(written) == 20 and set(written.geom_type) == {'Polygon'}
+
+
+def test_no_tiles_returns_report(tmp_path):
+    os.makedirs(str(tmp_path / 'project' / 'Data'))
+    result, report_path = extract_osgb_boundary(str(tmp_path / 'project'), str(tmp_path / 'out.gpkg'), 4544)
+    assert result is None and os.path.exists(report_path)
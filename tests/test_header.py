@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from osgb_header import read_root_bound
+from osgb_synthetic import root_osgb_bytes
+
+# tests/data中的.osgb由OpenSceneGraph 3.6.5读取同名.osgt后以osgDB::writeNodeFile写出
+DATA = os.path.join(os.path.dirname(__file__), 'data')
+PAGED_LOD_BOX = (-22.25, -22.75, 122.75, 122.25)
+
+
+def _fixture(name):
+    return os.path.join(DATA, name)
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize('name', ['paged_lod_root.osgb', 'paged_lod_root_zlib.osgb', 'paged_lod_no_children.osgb'])
+def test_reads_paged_lod_root(name):
+    # 根节点PagedLOD的中心点位于网格子节点之前，zlib压缩的文件按需解压
+    assert read_root_bound(_fixture(name)) == PAGED_LOD_BOX
+
+
+def test_reads_lod_root_after_children():
+    # osg::LOD的子节点位于中心点之前，依靠块大小跳过网格
+    assert read_root_bound(_fixture('lod_root.osgb')) == (5.0, 15.0, 15.0, 25.0)
+
+
+def test_reads_group_of_paged_lods():
+    assert read_root_bound(_fixture('group_root.osgb')) == (-10.0, -10.0, 120.0, 70.0)
+
+
+def test_bounding_sphere_center_falls_back():
+    # 以包围球中心为LOD中心时范围取决于网格，不解析几何数据
+    assert read_root_bound(_fixture('paged_lod_bound_center.osgb')) is None
+
+
+def test_synthetic_writer_matches_osg_output(tmp_path):
+    with open(_fixture('paged_lod_no_children.osgb'), 'rb') as f:
+        assert root_osgb_bytes((50.25, 49.75, 12.0), 72.5, 'Tile_+000_+000') == f.read()
+    path = _write(tmp_path, 'root.osgb', root_osgb_bytes((10.0, 20.0, 0.0), 5.0))
+    assert read_root_bound(path) == (5.0, 15.0, 15.0, 25.0)
+
+
+def test_invalid_files_fall_back(tmp_path):
+    with open(_fixture('paged_lod_root.osgb'), 'rb') as f:
+        paged = f.read()
+    with open(_fixture('lod_root.osgb'), 'rb') as f:
+        lod = f.read()
+    # 截断在中心点记录中、截断在需要跳过的子节点中、魔数错误、空文件、半径无效与文件不存在
+    assert read_root_bound(_write(tmp_path, 'cut.osgb', paged[:0x70])) is None
+    assert read_root_bound(_write(tmp_path, 'cut_lod.osgb', lod[:len(lod) // 2])) is None
+    assert read_root_bound(_write(tmp_path, 'magic.osgb', b'\x00' * 8 + paged[8:])) is None
+    assert read_root_bound(_write(tmp_path, 'empty.osgb', b'')) is None
+    assert read_root_bound(_write(tmp_path, 'radius.osgb', root_osgb_bytes((10.0, 20.0, 0.0), -1.0))) is None
+    assert read_root_bound(str(tmp_path / 'missing.osgb')) is None
@@ -0,0 +1,85 @@
+from collections import deque
+
+import numpy as np
+import pytest
+import shapely
+
+from osgb_lattice import trace_lattice_outline, label_lattice_blocks
+from osgb_synthetic import layout_indices
+from osgb_tiles import box_polygons
+
+
+def _bfs_labels(xs, ys, connectivity):
+    """
+    参考实现：按(x, y)顺序广度优先遍历，连通块编号按块内最小的(x, y)排序
+    """
+    if connectivity == 4:
+        steps = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+    else:
+        steps = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+    position = {(x, y): i for i, (x, y) in enumerate(zip(xs.tolist(), ys.tolist()))}
+    labels = np.full(len(xs), -1, dtype=np.int64)
+    count = 0
+    for tile in sorted(position):
+        if labels[position[tile]] >= 0:
+            continue
+        labels[position[tile]] = count
+        queue = deque([tile])
+        while queue:
+            x, y = queue.popleft()
+            for dx, dy in steps:
+                neighbour = position.get((x + dx, y + dy))
+                if neighbour is not None and labels[neighbour] < 0:
+                    labels[neighbour] = count
+                    queue.append((x + dx, y + dy))
+        count += 1
+    return labels, count
+
+
+@pytest.mark.parametrize('layout', ['dense', 'sparse', 'holey'])
+@pytest.mark.parametrize('signed', [False, True])
+def test_trace_outline_equals_union(layout, signed):
+    xs, ys = layout_indices(2000, layout, signed, seed=3)
+    outline = trace_lattice_outline(xs, ys)
+    expected = shapely.union_all(box_polygons(xs, ys, xs + 1, ys + 1))
+    assert outline.is_valid
+    assert outline.equals(expected)
+
+
+def test_trace_outline_diagonal_contact():
+    # 只在角点相接的两个瓦片不能合并为一个自相交的环
+    xs = np.array([0, 1, 5], dtype=np.int64)
+    ys = np.array([0, 1, 5], dtype=np.int64)
+    outline = trace_lattice_outline(xs, ys)
+    assert outline.is_valid
+    assert outline.equals(shapely.union_all(box_polygons(xs, ys, xs + 1, ys + 1)))
+
+
+@pytest.mark.parametrize('layout', ['sparse', 'holey'])
+@pytest.mark.parametrize('connectivity', [4, 8])
+def test_label_blocks_matches_bfs(layout, connectivity):
+    xs, ys = layout_indices(3000, layout, signed=True, seed=7)
+    labels, count = label_lattice_blocks(xs, ys, connectivity)
+    expected_labels, expected_count = _bfs_labels(xs, ys, connectivity)
+    assert count == expected_count
+    np.testing.assert_array_equal(labels, expected_labels)
+
+
+def test_trace_outline_far_apart_tiles():
+    # 编号相距很远时按连通块栅格化，不能按整体范围分配位图
+    xs = np.array([0, 1, 200000, 5000000], dtype=np.int64)
+    ys = np.array([0, 0, 200000, 5000000], dtype=np.int64)
+    outline = trace_lattice_outline(xs, ys)
+    assert outline.is_valid
+    assert outline.equals(shapely.union_all(box_polygons(xs, ys, xs + 1, ys + 1)))
+
+
+@pytest.mark.parametrize('layout', ['sparse', 'holey'])
+def test_trace_outline_per_block_equals_union(layout, monkeypatch):
+    # 把阈值压到最小，强制走按连通块栅格化和shapely回退的路径
+    monkeypatch.setattr('osgb_lattice.MIN_GRID_CELLS', 0)
+    monkeypatch.setattr('osgb_lattice.MAX_GRID_CELLS_PER_TILE', 1)
+    xs, ys = layout_indices(2000, layout, signed=True, seed=5)
+    outline = trace_lattice_outline(xs, ys)
+    assert outline.is_valid
+    assert outline.equals(shapely.union_all(box_polygons(xs, ys, xs + 1, ys + 1)))
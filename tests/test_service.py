@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+
+import pytest
+import shapely
+
+import osgb_service
+from osgb_service import DatasetWatcher
+from osgb_synthetic import generate_dataset
+
+
+def _boundary(watcher):
+    boundary = json.loads(watcher.snapshot['responses']['boundary'])
+    return shapely.from_geojson(json.dumps(boundary['features'][0]['geometry']))
+
+
+def _refresh(watcher):
+    # 测试中文件夹增删可能落在同一个修改时间精度内，直接调用refresh而不依赖poll()的修改时间比较
+    watcher.signature = None
+    return watcher.refresh()
+
+
+@pytest.mark.parametrize('origin_is_max', [False, True])
+def test_incremental_update_matches_full_rebuild(tmp_path, origin_is_max):
+    dataset = str(tmp_path / 'project')
+    generate_dataset(dataset, 800, 'holey', signed=True, metadata='epsg', seed=9)
+    data = os.path.join(dataset, 'Data')
+    watcher = DatasetWatcher(dataset, origin_is_max=origin_is_max)
+    watcher.refresh()
+    names = sorted(os.listdir(data))
+
+    # 删除一批瓦片、恢复其中一部分，再新增远处的瓦片，全程不触发全量重建
+    for name in names[::7]:
+        os.rename(os.path.join(data, name), os.path.join(tmp_path, name))
+    assert _refresh(watcher)
+    for name in names[::14]:
+        os.rename(os.path.join(tmp_path, name), os.path.join(data, name))
+    for name in ('Tile_+050_+050', 'Tile_+051_+050', 'Tile_-040_+020'):
+        os.mkdir(os.path.join(data, name))
+    assert _refresh(watcher)
+    shutil.rmtree(os.path.join(data, 'Tile_+051_+050'))
+    assert _refresh(watcher)
+    assert watcher.snapshot['pending'] and watcher.snapshot['removed']
+
+    expected = DatasetWatcher(dataset, origin_is_max=origin_is_max)
+    expected.refresh()
+    assert json.loads(watcher.snapshot['responses']['bounds']) == json.loads(expected.snapshot['responses']['bounds'])
+    assert _boundary(watcher).equals(_boundary(expected))
+    for bbox in ((-1e9, -1e9, 1e9, 1e9), (0, 0, 1500, 1500), (5000, 5000, 5100, 5000), (-3000, 0, 0, 3000)):
+        assert sorted(watcher.query_tiles(bbox)) == sorted(expected.query_tiles(bbox))
+    assert watcher.lookup_tile('Tile_+050_+050') == expected.lookup_tile('Tile_+050_+050')
+    assert watcher.lookup_tile('Tile_+051_+050') is None
+
+
+def test_tile_added_during_scan_is_found_by_next_poll(tmp_path, monkeypatch):
+    dataset = str(tmp_path / 'project')
+    generate_dataset(dataset, 50, 'dense', metadata='epsg', seed=1)
+    data = os.path.join(dataset, 'Data')
+    watcher = DatasetWatcher(dataset)
+    watcher.refresh()
+
+    # 第二次扫描列出目录之后再新增一个瓦片，模拟扫描期间发生的变化
+    original = osgb_service.iter_tile_entries
+
+    def scan_then_add(folder):
+        entries = list(original(folder))
+        os.mkdir(os.path.join(data, 'Tile_+090_+090'))
+        stat = os.stat(data)
+        os.utime(data, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        return entries
+
+    os.mkdir(os.path.join(data, 'Tile_+080_+080'))
+    monkeypatch.setattr(osgb_service, 'iter_tile_entries', scan_then_add)
+    assert watcher.poll()
+    assert 'Tile_+090_+090' not in watcher.catalog
+    monkeypatch.setattr(osgb_service, 'iter_tile_entries', original)
+    assert watcher.poll()
+    assert 'Tile_+090_+090' in watcher.catalog
+    assert not watcher.poll()